@@ -3,24 +3,62 @@
 # run with uvicorn api_main:app --reload
 
 from datetime import date
-from typing import List, Optional, Tuple, Dict, Any
-import math
+from typing import List, Literal, Optional, Tuple, Dict, Any, Union
+import json
 import logging
+import math
+import os
+import threading
+import time
+
+# cold-start accounting: the imports below are what a new instance pays for
+_import_t0 = time.perf_counter()
 
-from fastapi import FastAPI, HTTPException
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field, field_validator, model_validator
 
+from utils.batch import iter_batch_features
+from utils.cache import hazard_cache, make_key
+from utils.compute_pool import compute_pool, PoolSaturated
+from utils.firms_index import hotspot_tables
+from utils.geometry import bbox_area_km2, polygon_area_km2, polygon_centroid
+from utils.singleflight import AsyncSingleFlight
+from utils.tiles import TILE_LAYERS, default_chirps_window, etag, get_tile
+from utils.metrics import REQUEST_SECONDS, new_request_timings, registry, server_timing_header
+from utils.jobs import JOBS_DB_PATH, JOBS_RETENTION_S, JobQueueFull, JobRunner, JobStore
+from utils.watchlist import WATCHLIST_ENABLED, WATCHLIST_PATH, CacheWarmer, Watchlist, WatchlistFull
 from utils.fetch_hazard_data import (
-    init_ee,
+    ensure_ee,
+    ee_status,
+    add_anomaly_features,
     build_hazard_features,
-    fetch_nasa_power,
-    fetch_chirps_rainfall,
-    fetch_firms_area,
+    climate_features,
+    drought_features,
+    fire_features,
+    GROUP_SOURCES,
+    fetch_hazard_sources,
+    fetch_start_for_windows,
+    frames_since,
+    iter_hazard_sources,
+    iter_records,
+    iter_timeseries_rows,
     FEATURE_UNITS,
     dataframe_to_timeseries,
+    dataframe_to_columns,
+    records_to_columns,
+    summarize_windows,
 )
 
+try:
+    import orjson
+except ImportError:  # optional fast encoder; stdlib json is the fallback
+    orjson = None
+
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI(
@@ -39,17 +77,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ---------- Startup: initialize Earth Engine once ----------
+# ---------- Metrics / Server-Timing ----------
 
-@app.on_event("startup")
-async def startup_event():
+# Adds a Server-Timing header with per-source fetch time, cache hits/misses and
+# upstream call counts. Off by default: it exposes internals to clients.
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+registry.gauge_func("hazard_compute_pending", "Compute requests running or queued",
+                    lambda: compute_pool.pending)
+registry.gauge_func("hazard_cache_local_entries", "Entries in the in-process result cache",
+                    lambda: len(hazard_cache.local))
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    timings = new_request_timings()
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    # for streaming responses this covers time to first byte only
+    elapsed = time.perf_counter() - t0
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(elapsed, route=getattr(route, "path", "unmatched"))
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
+# ---------- Startup: Earth Engine off the critical path ----------
+
+# background : start EE import + init in a thread at startup (default)
+# lazy       : initialize on the first CHIRPS fetch
+# eager      : block startup until EE is initialized (previous behaviour)
+EE_INIT_MODE = os.environ.get("EE_INIT_MODE", "background")
+
+
+def warm_up_ee():
     try:
-        init_ee()
+        ensure_ee()
     except Exception as e:
-        # Log and fail loudly; you can also set a flag instead.
+        # CHIRPS fetches retry; /ready reports the failure meanwhile
         logging.error("Failed to initialize Earth Engine: %s", e)
 
 
+@app.on_event("startup")
+async def startup_event():
+    t0 = time.perf_counter()
+    if EE_INIT_MODE == "eager":
+        warm_up_ee()
+    elif EE_INIT_MODE == "background":
+        threading.Thread(target=warm_up_ee, name="ee-init", daemon=True).start()
+
+    if hotspot_tables is not None:
+        hotspot_tables.start()
+
+    job_store.purge(JOBS_RETENTION_S)
+    if WATCHLIST_ENABLED:
+        cache_warmer.start()
+    logging.info("Startup hook finished in %.2fs (imports took %.2fs, EE init %s)",
+                 time.perf_counter() - t0, IMPORT_S, EE_INIT_MODE)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    cache_warmer.stop()
+    compute_pool.shutdown()
+    job_runner.shutdown()
+    if hotspot_tables is not None:
+        hotspot_tables.stop()
+
+
 # ---------- Pydantic models ----------
 
 class LocationPayload(BaseModel):
@@ -114,18 +209,136 @@ class LocationPayload(BaseModel):
         return value
 
 
+# Bounds of the `windows` option: at most this many windows, none longer
+WINDOWS_MAX_COUNT = int(os.environ.get("WINDOWS_MAX_COUNT", "8"))
+WINDOWS_MAX_DAYS = int(os.environ.get("WINDOWS_MAX_DAYS", "3660"))
+
+
+def check_windows(value: Optional[List[int]]) -> Optional[List[int]]:
+    if value is None:
+        return value
+    if any(not 1 <= days <= WINDOWS_MAX_DAYS for days in value):
+        raise ValueError(f"windows must be within 1..{WINDOWS_MAX_DAYS} days")
+    return sorted(set(value))
+
+
 class HazardComputeRequest(LocationPayload):
     start: date = Field(..., description="Start date (YYYY-MM-DD)")
     end: date = Field(..., description="End date (YYYY-MM-DD)")
     firms_days: int = Field(
         7, ge=1, le=365, description="Lookback window for fires (days)"
     )
+    chirps_mode: Literal["point", "area"] = Field(
+        "point",
+        description="CHIRPS at the centroid ('point') or reduced over the bbox/polygon ('area')",
+    )
+    firms_sources: List[Literal["VIIRS_SNPP_NRT", "VIIRS_NOAA20_NRT", "VIIRS_NOAA21_NRT", "MODIS_NRT"]] = Field(
+        ["VIIRS_SNPP_NRT"], min_length=1,
+        description="FIRMS sensors; several are fetched in parallel and de-duplicated into fires",
+    )
+    anomalies: bool = Field(
+        False,
+        description="Add anomaly / percentile features vs the same window in the climatology reference years",
+    )
+    windows: Optional[List[int]] = Field(
+        None, min_length=1, max_length=WINDOWS_MAX_COUNT,
+        description="Trailing windows in days (e.g. [7, 30, 90, 365]) ending at `end`, "
+                    "summarised from one fetch. Window n starts n days before `end`, so "
+                    "POWER covers n + 1 days and CHIRPS (end exclusive) n days",
+    )
+
+    @field_validator("firms_sources")
+    @classmethod
+    def dedupe_firms_sources(cls, value: List[str]):
+        return list(dict.fromkeys(value))
+
+    @field_validator("windows")
+    @classmethod
+    def validate_windows(cls, value: Optional[List[int]]):
+        return check_windows(value)
+
+
+class HazardQueryRequest(HazardComputeRequest):
+    groups: List[Literal["climate", "drought", "fire"]] = Field(
+        ["climate", "drought", "fire"], min_length=1,
+        description="Feature groups to compute; sources of other groups are not fetched",
+    )
+    include: List[Literal["features", "series", "fires"]] = Field(
+        ["features"], min_length=1,
+        description="Outputs: group summaries, daily series (climate/rainfall), fire records",
+    )
+    layout: Literal["rows", "columns"] = Field(
+        "rows", description="Layout of series and fire records, as in /hazards/raw"
+    )
+
+
+BATCH_MAX_LOCATIONS = int(os.environ.get("BATCH_MAX_LOCATIONS", "5000"))
+
+
+class BatchLocation(LocationPayload):
+    id: Optional[str] = Field(None, description="Caller-supplied id echoed in the result")
+
+
+class HazardBatchRequest(BaseModel):
+    locations: List[BatchLocation] = Field(
+        ..., min_length=1, max_length=BATCH_MAX_LOCATIONS,
+        description="Points, bboxes or polygons to score",
+    )
+    start: date = Field(..., description="Start date (YYYY-MM-DD)")
+    end: date = Field(..., description="End date (YYYY-MM-DD)")
+    firms_days: int = Field(
+        7, ge=1, le=365, description="Lookback window for fires (days)"
+    )
+
+
+class WindowFeatureGroups(BaseModel):
+    days: int
+    start: date
+    end: date
+    climate: Dict[str, Any]
+    drought: Dict[str, Any]
+
+
+class WatchlistEntry(LocationPayload):
+    """An AOI kept warm in the cache (utils/watchlist.py), with the windows users ask for."""
+
+    id: Optional[str] = Field(None, description="Entry id; taken from the URL on PUT")
+    windows: List[int] = Field(
+        [7, 30, 90, 365], min_length=1, max_length=WINDOWS_MAX_COUNT,
+        description="Trailing windows in days; each is kept warm as start = end - n days",
+    )
+    end_lag_days: int = Field(
+        1, ge=0, le=60, description="Windows end this many days before today (UTC)"
+    )
+    firms_days: int = Field(
+        7, ge=1, le=365, description="Lookback window for fires (days)"
+    )
+    chirps_mode: Literal["point", "area"] = "point"
+    firms_sources: List[Literal["VIIRS_SNPP_NRT", "VIIRS_NOAA20_NRT", "VIIRS_NOAA21_NRT", "MODIS_NRT"]] = Field(
+        ["VIIRS_SNPP_NRT"], min_length=1
+    )
+
+    @field_validator("windows")
+    @classmethod
+    def validate_windows(cls, value: List[int]):
+        return check_windows(value)
+
+    @field_validator("firms_sources")
+    @classmethod
+    def dedupe_firms_sources(cls, value: List[str]):
+        return list(dict.fromkeys(value))
 
 
 class HazardFeatureGroups(BaseModel):
     climate: Dict[str, Any]
     drought: Dict[str, Any]
     fire: Dict[str, Any]
+    errors: Dict[str, str] = Field(
+        default_factory=dict, description="Sources that failed or timed out"
+    )
+    windows: Optional[List[WindowFeatureGroups]] = Field(
+        None, description="Per-window climate / drought groups when `windows` was requested"
+    )
 
 
 class HazardComputeResponse(BaseModel):
@@ -146,6 +359,52 @@ class RawTimeseriesResponse(BaseModel):
     rainfall_timeseries: List[Dict[str, Any]]
     fires: List[Dict[str, Any]]
     units: Dict[str, Dict[str, str]]
+    errors: Dict[str, str] = Field(
+        default_factory=dict, description="Sources that failed or timed out"
+    )
+
+
+class HazardQueryResponse(BaseModel):
+    """Body of POST /hazards; only the parts selected by `groups` / `include` are present."""
+
+    lat: float
+    lon: float
+    bbox: List[float]
+    start: date
+    end: date
+    features: Optional[Dict[str, Any]] = Field(
+        None, description="Group summaries (include 'features'), plus `windows` when requested"
+    )
+    climate_timeseries: Optional[Union[List[Dict[str, Any]], Dict[str, List[Any]]]] = Field(
+        None, description="POWER series (include 'series'); rows, or columns with layout=columns"
+    )
+    rainfall_timeseries: Optional[Union[List[Dict[str, Any]], Dict[str, List[Any]]]] = Field(
+        None, description="CHIRPS series (include 'series'); rows, or columns with layout=columns"
+    )
+    fires: Optional[Union[List[Dict[str, Any]], Dict[str, List[Any]]]] = Field(
+        None, description="FIRMS records (include 'fires'); rows, or columns with layout=columns"
+    )
+    units: Dict[str, Dict[str, str]]
+    errors: Dict[str, str] = Field(
+        default_factory=dict, description="Sources that failed or timed out"
+    )
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, done or failed")
+    created_at: float
+    updated_at: float
+    progress: Dict[str, str] = Field(
+        ..., description="Per-source state: pending, running, done or failed"
+    )
+    result: Optional[HazardComputeResponse] = None
+    error: Optional[str] = None
 
 
 class LocationPreviewResponse(BaseModel):
@@ -157,29 +416,17 @@ class LocationPreviewResponse(BaseModel):
 
 # ---------- Helper functions ----------
 
-def bbox_area_km2(bbox: Tuple[float, float, float, float]) -> float:
-    west, south, east, north = bbox
-    mean_lat = (south + north) / 2
-    width_km = (east - west) * 111.32 * math.cos(math.radians(mean_lat))
-    height_km = (north - south) * 110.57
-    return max(width_km * height_km, 0)
-
-
 def polygon_bbox(coords: List[List[float]]) -> Tuple[float, float, float, float]:
     lons = [c[0] for c in coords]
     lats = [c[1] for c in coords]
     return (min(lons), min(lats), max(lons), max(lats))
 
 
-def polygon_centroid(coords: List[List[float]]) -> Tuple[float, float]:
-    lons = [c[0] for c in coords]
-    lats = [c[1] for c in coords]
-    return (sum(lons) / len(lons), sum(lats) / len(lats))
-
-
 def normalize_location(payload: LocationPayload) -> Dict[str, Any]:
     """
     Convert any accepted location payload into a centroid + bbox representation.
+    Polygons get their area-weighted centroid and ellipsoidal area; other
+    payloads the area of their bbox.
     """
     if payload.point:
         lat, lon = payload.point
@@ -195,41 +442,102 @@ def normalize_location(payload: LocationPayload) -> Dict[str, Any]:
     else:
         raise HTTPException(status_code=400, detail="No location provided")
 
-    area = bbox_area_km2(bbox)
+    area = polygon_area_km2(payload.polygon) if payload.polygon else bbox_area_km2(bbox)
     return {
         "lat": lat,
         "lon": lon,
         "bbox": list(bbox),
         "area_km2": area,
+        "polygon": payload.polygon,
     }
 
 
-# ---------- Routes ----------
+# ---------- Blocking pipeline (runs on compute_pool, off the event loop) ----------
 
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+async def run_blocking(fn, *args):
+    """
+    Run a blocking pipeline function on the bounded compute pool.
+    Sheds load with 503 + Retry-After when the pool and its queue are full.
+    """
+    try:
+        return await compute_pool.run(fn, *args)
+    except PoolSaturated as e:
+        logging.warning("Rejecting request: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry shortly",
+            headers={"Retry-After": "5"},
+        )
 
 
-@app.get("/units")
-async def units():
-    """Return metric units for all hazard feature fields."""
-    return FEATURE_UNITS
+# Identical requests in flight at the same time share one computation.
+# Sources are additionally coalesced per cache key in the loaders.
+inflight_requests = AsyncSingleFlight()
 
 
-@app.post("/locations/preview", response_model=LocationPreviewResponse)
-async def location_preview(payload: LocationPayload):
-    normalized = normalize_location(payload)
-    return {
-        "centroid": {"lat": normalized["lat"], "lon": normalized["lon"]},
+def request_key(kind: str, req: HazardComputeRequest, **options) -> str:
+    """Coalescing key: normalized location + dates + options."""
+    normalized = normalize_location(req)
+    return make_key(kind, json.dumps({
+        **options,
+        "lat": normalized["lat"],
+        "lon": normalized["lon"],
         "bbox": normalized["bbox"],
-        "area_km2": normalized["area_km2"],
-        "message": "Normalized location payload",
-    }
+        "polygon": normalized["polygon"],
+        "start": req.start.isoformat(),
+        "end": req.end.isoformat(),
+        "firms_days": req.firms_days,
+        "chirps_mode": req.chirps_mode,
+        "anomalies": req.anomalies,
+        "firms_sources": sorted(req.firms_sources),
+        "windows": req.windows,
+    }, sort_keys=True))
 
 
-@app.post("/hazards/compute", response_model=HazardComputeResponse)
-async def hazards_compute(req: HazardComputeRequest):
+async def run_coalesced(kind: str, fn, req: HazardComputeRequest, **options):
+    """run_blocking(fn, req), shared with identical in-flight requests."""
+    return await inflight_requests.do(
+        request_key(kind, req, **options), lambda: run_blocking(fn, req))
+
+
+def stream_with_slot(lines) -> StreamingResponse:
+    """
+    NDJSON StreamingResponse over `lines` holding a compute_pool slot while
+    it streams. The slot is claimed before the response is returned, so a
+    busy server answers 503 like the other routes, and released once, when
+    the stream ends or, if it is never iterated, by the response's
+    background task.
+    """
+    try:
+        compute_pool.acquire()
+    except PoolSaturated as e:
+        logging.warning("Rejecting request: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    lock = threading.Lock()
+    held = [True]
+
+    def release():
+        with lock:
+            if not held[0]:
+                return
+            held[0] = False
+        compute_pool.release()
+
+    def body():
+        try:
+            yield from lines
+        finally:
+            release()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson",
+                             background=BackgroundTask(release))
+
+
+def compute_hazards(req: HazardComputeRequest, progress=None) -> Dict[str, Any]:
     normalized = normalize_location(req)
     bbox_tuple: Tuple[float, float, float, float] = tuple(normalized["bbox"])  # type: ignore
 
@@ -241,6 +549,12 @@ async def hazards_compute(req: HazardComputeRequest):
             end=req.end.isoformat(),
             bbox=bbox_tuple,
             firms_days=req.firms_days,
+            chirps_mode=req.chirps_mode,
+            polygon=normalized["polygon"],
+            progress=progress,
+            firms_sources=req.firms_sources,
+            anomalies=req.anomalies,
+            windows=req.windows,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error building hazard features: {e}")
@@ -256,51 +570,480 @@ async def hazards_compute(req: HazardComputeRequest):
     }
 
 
-@app.post("/hazards/raw", response_model=RawTimeseriesResponse)
-async def hazards_raw(req: HazardComputeRequest):
+RAW_UNITS: Dict[str, Dict[str, str]] = {
+    **FEATURE_UNITS,
+    "raw": {
+        "T2M": "degC",
+        "PRECTOT": "mm/day",
+        "WS10M": "m/s",
+        "precip_mm": "mm/day",
+    },
+}
+
+
+def _nan_to_none(value: Any) -> Any:
+    """NaN / inf floats to None, recursively, as orjson writes them (null)."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _nan_to_none(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_nan_to_none(v) for v in value]
+    return value
+
+
+def dumps_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(_nan_to_none(payload), default=str, allow_nan=False).encode("utf-8")
+
+
+def fetch_raw_frames(req: HazardComputeRequest):
     normalized = normalize_location(req)
     bbox_tuple: Tuple[float, float, float, float] = tuple(normalized["bbox"])  # type: ignore
 
-    start_power = req.start.isoformat().replace("-", "")
-    end_power = req.end.isoformat().replace("-", "")
+    frames, errors = fetch_hazard_sources(
+        lat=normalized["lat"],
+        lon=normalized["lon"],
+        start=req.start.isoformat(),
+        end=req.end.isoformat(),
+        bbox=bbox_tuple,
+        firms_days=req.firms_days,
+        chirps_mode=req.chirps_mode,
+        polygon=normalized["polygon"],
+        firms_sources=req.firms_sources,
+    )
+    if not frames:
+        detail = "; ".join(f"{name}: {msg}" for name, msg in errors.items())
+        raise HTTPException(status_code=500, detail=f"Error fetching raw hazard data: {detail}")
+    return frames, errors
 
-    try:
-        df_power = fetch_nasa_power(
-            lat=normalized["lat"],
-            lon=normalized["lon"],
-            start_date=start_power,
-            end_date=end_power,
-        )
-        df_chirps = fetch_chirps_rainfall(
-            lat=normalized["lat"],
-            lon=normalized["lon"],
-            start=req.start.isoformat(),
-            end=req.end.isoformat(),
-        )
-        df_fires = fetch_firms_area(
-            bbox_tuple, source="VIIRS_SNPP_NRT", day_range=req.firms_days
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching raw hazard data: {e}")
 
-    climate_series = dataframe_to_timeseries(df_power, ["T2M", "PRECTOT", "WS10M"])
-    rainfall_series = dataframe_to_timeseries(df_chirps, ["precip_mm"])
-    fires_records = df_fires.to_dict(orient="records")
+def raw_hazards(req: HazardComputeRequest) -> Dict[str, Any]:
+    frames, errors = fetch_raw_frames(req)
+
+    climate_series = dataframe_to_timeseries(
+        frames["power"], ["T2M", "PRECTOT", "WS10M"]) if "power" in frames else []
+    rainfall_series = dataframe_to_timeseries(
+        frames["chirps"], ["precip_mm"]) if "chirps" in frames else []
+    fires_records = frames["firms"].to_dict(orient="records") if "firms" in frames else []
 
     return {
         "climate_timeseries": climate_series,
         "rainfall_timeseries": rainfall_series,
         "fires": fires_records,
-        "units": {
-            **FEATURE_UNITS,
-            "raw": {
-                "T2M": "degC",
-                "PRECTOT": "mm/day",
-                "WS10M": "m/s",
-                "precip_mm": "mm/day",
-            },
-        },
+        "units": RAW_UNITS,
+        "errors": errors,
+    }
+
+
+def raw_hazards_columnar(req: HazardComputeRequest) -> bytes:
+    """
+    Same data as raw_hazards in a columnar layout ({"date": [...], "T2M": [...]}),
+    encoded directly to JSON bytes without per-row Pydantic validation.
+    """
+    frames, errors = fetch_raw_frames(req)
+
+    payload = {
+        "climate_timeseries": dataframe_to_columns(
+            frames.get("power", pd.DataFrame()), ["T2M", "PRECTOT", "WS10M"]),
+        "rainfall_timeseries": dataframe_to_columns(
+            frames.get("chirps", pd.DataFrame()), ["precip_mm"]),
+        "fires": records_to_columns(frames["firms"]) if "firms" in frames else {},
+        "units": RAW_UNITS,
+        "errors": errors,
     }
+    return dumps_json(payload)
+
+
+def select_window_groups(windows: List[Dict[str, Any]], groups: List[str]) -> List[Dict[str, Any]]:
+    """Per-window summaries restricted to the requested feature groups."""
+    return [{"days": w["days"], "start": w["start"], "end": w["end"],
+             **{group: w[group] for group in groups if group in w}} for w in windows]
+
+
+def query_hazards(req: HazardQueryRequest) -> bytes:
+    """
+    /hazards: fetch each source of the requested groups once and return any
+    combination of group summaries, daily series and fire records, encoded
+    directly to JSON bytes.
+    """
+    normalized = normalize_location(req)
+    sources = [GROUP_SOURCES[group] for group in req.groups]
+    kwargs = dict(
+        lat=normalized["lat"],
+        lon=normalized["lon"],
+        start=req.start.isoformat(),
+        end=req.end.isoformat(),
+        bbox=tuple(normalized["bbox"]),
+        firms_days=req.firms_days,
+        chirps_mode=req.chirps_mode,
+        polygon=normalized["polygon"],
+        sources=sources,
+        firms_sources=req.firms_sources,
+    )
+    payload: Dict[str, Any] = {
+        "lat": normalized["lat"],
+        "lon": normalized["lon"],
+        "bbox": normalized["bbox"],
+        "start": req.start.isoformat(),
+        "end": req.end.isoformat(),
+    }
+
+    if set(req.include) == {"features"}:
+        # summaries only: may be answered from the precomputed grid
+        try:
+            features = build_hazard_features(**kwargs, anomalies=req.anomalies, windows=req.windows)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error building hazard features: {e}")
+        errors = features.pop("errors")
+        payload["features"] = {group: features[group] for group in req.groups}
+        if req.windows:
+            payload["features"]["windows"] = select_window_groups(features["windows"], req.groups)
+        payload["units"] = {group: FEATURE_UNITS[group] for group in req.groups}
+        payload["errors"] = errors
+        return dumps_json(payload)
+
+    fetched, errors = fetch_hazard_sources(
+        **{**kwargs, "start": fetch_start_for_windows(kwargs["start"], kwargs["end"], req.windows)})
+    if not fetched:
+        detail = "; ".join(f"{name}: {msg}" for name, msg in errors.items())
+        raise HTTPException(status_code=500, detail=f"Error fetching hazard data: {detail}")
+    # series and summaries cover [start, end] even when windows reach further back
+    frames = frames_since(fetched, kwargs["start"]) if req.windows else fetched
+
+    units: Dict[str, Dict[str, str]] = {}
+    if "features" in req.include:
+        summarize = {"climate": climate_features, "drought": drought_features, "fire": fire_features}
+        payload["features"] = {
+            group: summarize[group](frames[GROUP_SOURCES[group]])
+            if GROUP_SOURCES[group] in frames else {}
+            for group in req.groups
+        }
+        if req.anomalies:
+            add_anomaly_features(payload["features"], frames, kwargs["lat"], kwargs["lon"],
+                                 kwargs["start"], kwargs["end"], errors)
+        if req.windows:
+            payload["features"]["windows"] = select_window_groups(summarize_windows(
+                fetched, kwargs["lat"], kwargs["lon"], kwargs["end"], req.windows,
+                req.anomalies, errors), req.groups)
+        units.update({group: FEATURE_UNITS[group] for group in req.groups})
+
+    series = dataframe_to_columns if req.layout == "columns" else dataframe_to_timeseries
+    if "series" in req.include:
+        if "climate" in req.groups:
+            payload["climate_timeseries"] = series(
+                frames.get("power", pd.DataFrame()), ["T2M", "PRECTOT", "WS10M"])
+        if "drought" in req.groups:
+            payload["rainfall_timeseries"] = series(
+                frames.get("chirps", pd.DataFrame()), ["precip_mm"])
+        units["raw"] = RAW_UNITS["raw"]
+    if "fires" in req.include and "fire" in req.groups:
+        fires = frames.get("firms", pd.DataFrame())
+        payload["fires"] = (records_to_columns(fires) if req.layout == "columns"
+                            else list(iter_records(fires)))
+
+    payload["units"] = units
+    payload["errors"] = errors
+    return dumps_json(payload)
+
+
+def raw_hazards_stream(req: HazardComputeRequest):
+    """
+    NDJSON lines for /hazards/raw/stream. Each source section is written as
+    soon as its fetch completes and rows are converted lazily in chunks:
+      {"type": "meta", "units": ...}
+      {"type": "climate", "date": ..., "T2M": ..., "PRECTOT": ..., "WS10M": ...}
+      {"type": "rainfall", "date": ..., "precip_mm": ...}
+      {"type": "fire", ...FIRMS columns...}
+      {"type": "error", "source": ..., "detail": ...}
+      {"type": "end", "errors": {...}}
+    """
+    normalized = normalize_location(req)
+    yield dumps_json({"type": "meta", "units": RAW_UNITS}) + b"\n"
+
+    errors: Dict[str, str] = {}
+    for name, df, error in iter_hazard_sources(
+        lat=normalized["lat"],
+        lon=normalized["lon"],
+        start=req.start.isoformat(),
+        end=req.end.isoformat(),
+        bbox=tuple(normalized["bbox"]),
+        firms_days=req.firms_days,
+        chirps_mode=req.chirps_mode,
+        polygon=normalized["polygon"],
+        firms_sources=req.firms_sources,
+    ):
+        if error is not None:
+            errors[name] = error
+            yield dumps_json({"type": "error", "source": name, "detail": error}) + b"\n"
+            continue
+
+        if name == "power":
+            rows, kind = iter_timeseries_rows(df, ["T2M", "PRECTOT", "WS10M"]), "climate"
+        elif name == "chirps":
+            rows, kind = iter_timeseries_rows(df, ["precip_mm"]), "rainfall"
+        else:
+            rows, kind = iter_records(df), "fire"
+        for row in rows:
+            yield dumps_json({"type": kind, **row}) + b"\n"
+
+    yield dumps_json({"type": "end", "errors": errors}) + b"\n"
+
+
+# ---------- Background jobs ----------
+
+def run_compute_job(request: Dict[str, Any], progress) -> Dict[str, Any]:
+    req = HazardComputeRequest(**request)
+    return jsonable_encoder(compute_hazards(req, progress=progress))
+
+
+job_store = JobStore(JOBS_DB_PATH)
+job_runner = JobRunner(job_store, run_compute_job, sources=("power", "chirps", "firms"))
+
+
+# ---------- Watchlist cache warmer ----------
+
+def watch_target(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """warm_hazard_sources arguments of a stored watchlist entry, as compute_hazards passes them."""
+    watched = WatchlistEntry(**entry)
+    normalized = normalize_location(watched)
+    return {
+        "lat": normalized["lat"],
+        "lon": normalized["lon"],
+        "bbox": tuple(normalized["bbox"]),
+        "polygon": normalized["polygon"],
+        "windows": watched.windows,
+        "firms_days": watched.firms_days,
+        "chirps_mode": watched.chirps_mode,
+        "firms_sources": watched.firms_sources,
+        "end_lag_days": watched.end_lag_days,
+    }
+
+
+watchlist = Watchlist(WATCHLIST_PATH)
+cache_warmer = CacheWarmer(watchlist, watch_target)
+
+
+# ---------- Routes ----------
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness, separate from liveness (/health): 503 until Earth Engine is
+    initialized, unless EE_INIT_MODE=lazy, where it is initialized on demand.
+    """
+    ee = ee_status()
+    is_ready = ee["status"] == "ready" or (EE_INIT_MODE == "lazy" and ee["status"] != "failed")
+    return JSONResponse(
+        {"status": "ready" if is_ready else "not_ready", "earth_engine": ee,
+         "import_s": round(IMPORT_S, 3)},
+        status_code=200 if is_ready else 503,
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of fetch, cache and request metrics."""
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/units")
+async def units():
+    """Return metric units for all hazard feature fields."""
+    return FEATURE_UNITS
+
+
+@app.post("/locations/preview", response_model=LocationPreviewResponse)
+async def location_preview(payload: LocationPayload):
+    normalized = normalize_location(payload)
+    return {
+        "centroid": {"lat": normalized["lat"], "lon": normalized["lon"]},
+        "bbox": normalized["bbox"],
+        "area_km2": normalized["area_km2"],
+        "message": "Normalized location payload",
+    }
+
+
+@app.post("/hazards/compute", response_model=HazardComputeResponse)
+async def hazards_compute(req: HazardComputeRequest):
+    return await run_coalesced("compute", compute_hazards, req)
+
+
+@app.post("/hazards", responses={
+    200: {"model": HazardQueryResponse, "description": "Selected summaries, series and fire records"},
+})
+async def hazards(req: HazardQueryRequest):
+    """
+    One fetch per source, selectable outputs. `groups` limits the feature
+    groups (and so the upstream sources fetched); `include` picks any of
+    "features" (summaries), "series" (climate_timeseries /
+    rainfall_timeseries) and "fires" (FIRMS records).
+    """
+    body = await run_coalesced(
+        "hazards", query_hazards, req,
+        groups=sorted(req.groups), include=sorted(req.include), layout=req.layout)
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/hazards/raw", response_model=RawTimeseriesResponse)
+async def hazards_raw(
+    req: HazardComputeRequest,
+    layout: Literal["rows", "columns"] = "rows",
+):
+    """
+    Daily series and fire rows. `layout=columns` returns column arrays
+    ({"date": [...], "T2M": [...]}) encoded without per-row validation.
+    """
+    if layout == "columns":
+        body = await run_coalesced("raw_columns", raw_hazards_columnar, req)
+        return Response(content=body, media_type="application/json")
+    return await run_coalesced("raw", raw_hazards, req)
+
+
+@app.post("/hazards/raw/stream")
+async def hazards_raw_stream(req: HazardComputeRequest):
+    """
+    Streaming /hazards/raw for long ranges: NDJSON, one line per row,
+    sections emitted in the order the sources finish.
+    """
+    normalize_location(req)
+    return stream_with_slot(raw_hazards_stream(req))
+
+
+@app.post("/hazards/batch")
+async def hazards_batch(req: HazardBatchRequest):
+    """
+    Compute hazard features for many locations over one date range.
+    Streams NDJSON, one line per location in completion order:
+    {"index", "id", "lat", "lon", "bbox", "features"}.
+    """
+    normalized = [normalize_location(loc) for loc in req.locations]
+
+    def lines():
+        for i, features in iter_batch_features(
+            normalized,
+            start=req.start.isoformat(),
+            end=req.end.isoformat(),
+            firms_days=req.firms_days,
+        ):
+            yield dumps_json({
+                "index": i,
+                "id": req.locations[i].id,
+                "lat": normalized[i]["lat"],
+                "lon": normalized[i]["lon"],
+                "bbox": normalized[i]["bbox"],
+                "features": features,
+            }) + b"\n"
+
+    return stream_with_slot(lines())
+
+
+@app.get("/tiles/{layer}/{z}/{x}/{y}")
+async def tiles(
+    request: Request,
+    layer: str,
+    z: int,
+    x: int,
+    y: str,
+    days: int = Query(7, ge=1, le=365, description="fires: lookback window (days)"),
+    source: str = Query("VIIRS_SNPP_NRT", pattern=r"^[A-Z0-9_]+$", description="fires: FIRMS product"),
+    start: Optional[date] = Query(None, description="chirps: first day (default: 30 days ago)"),
+    end: Optional[date] = Query(None, description="chirps: day after the last (default: today); end - start must be one of CHIRPS_TILE_WINDOWS"),
+    max_mm: Optional[float] = Query(None, gt=0, description="chirps: accumulation at the top of the colour scale, rounded up to a 1-2-5 step"),
+):
+    """
+    XYZ map tiles: `fires` as Mapbox Vector Tiles, `chirps` precipitation
+    accumulation as PNG. `y` may carry an extension (`12.png`, `12.mvt`).
+    Responses carry an ETag and Cache-Control; If-None-Match gets a 304.
+    """
+    try:
+        row = int(y.split(".", 1)[0])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid tile row '{y}'")
+
+    if layer == "chirps":
+        default_start, default_end = default_chirps_window()
+        first = start.isoformat() if start else default_start
+        stop = end.isoformat() if end else default_end
+        if first >= stop:
+            raise HTTPException(status_code=400, detail="start must be before end")
+        # default scale: 5 mm/day over the window
+        days_in_window = (date.fromisoformat(stop) - date.fromisoformat(first)).days
+        options = {"start": first, "end": stop, "max_mm": max_mm or 5.0 * days_in_window}
+    else:
+        options = {"days": days, "source": source}
+
+    try:
+        body, ttl = await run_blocking(lambda: get_tile(layer, z, x, row, **options))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering {layer} tile: {e}")
+
+    tag = etag(body)
+    headers = {"ETag": tag, "Cache-Control": f"public, max-age={int(ttl)}"}
+    if request.headers.get("if-none-match") == tag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=TILE_LAYERS[layer]["media_type"], headers=headers)
+
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(req: HazardComputeRequest):
+    """
+    Queue a /hazards/compute request and return immediately; poll
+    GET /jobs/{job_id} for progress and the result.
+    """
+    normalize_location(req)
+    try:
+        job_id = job_runner.submit(req.model_dump(mode="json"))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
+
+@app.get("/watchlist")
+async def get_watchlist():
+    """Watched AOIs with the time and outcome of each source group's last refresh."""
+    return {"entries": cache_warmer.status()}
+
+
+@app.put("/watchlist/{entry_id}")
+async def put_watchlist_entry(entry_id: str, entry: WatchlistEntry):
+    """Add or replace a watched AOI; it is warmed on the next pass, started right away."""
+    normalize_location(entry)
+    entry.id = entry_id
+    stored = entry.model_dump(mode="json", exclude_none=True)
+    try:
+        watchlist.put(stored)
+    except WatchlistFull as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    cache_warmer.forget(entry_id)
+    cache_warmer.nudge()
+    return stored
+
+
+@app.delete("/watchlist/{entry_id}", status_code=204)
+async def delete_watchlist_entry(entry_id: str):
+    if not watchlist.remove(entry_id):
+        raise HTTPException(status_code=404, detail="Unknown watchlist entry")
+    cache_warmer.forget(entry_id)
+    return Response(status_code=204)
 
 
 @app.post("/hazard-features", response_model=HazardComputeResponse)
@@ -317,3 +1060,7 @@ async def compute_alias(req: HazardComputeRequest):
     Short alias used by the UI; identical to /hazards/compute.
     """
     return await hazards_compute(req)
+
+
+IMPORT_S = time.perf_counter() - _import_t0
+logging.info("api_main imported in %.2fs", IMPORT_S)
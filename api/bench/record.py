@@ -0,0 +1,71 @@
+import argparse
+import json
+import logging
+import os
+
+from bench.replay import FIXTURES_DIR
+
+# ================================================================
+# Record replay fixtures from the live services
+# ================================================================
+#
+# Needs network access, FIRMS_MAP_KEY and Earth Engine credentials (see
+# init_ee). Overwrites the files in bench/fixtures/ with raw upstream
+# responses for one year at one point and the FIRMS hotspots over a bbox:
+#
+#   python -m bench.record --year 2022 --lat 40.4093 --lon 49.8671 \
+#       --bbox 44.0,38.5,51.5,42.0 --firms-days 10
+
+logging.basicConfig(level=logging.INFO)
+
+
+def record(year: int, lat: float, lon: float, bbox, firms_days: int, out_dir: str = FIXTURES_DIR):
+    from utils.fetch_hazard_data import CHIRPS_COLLECTION, CHIRPS_SCALE_M, ee, ensure_ee
+    from utils.http_client import http_get
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    resp = http_get("https://power.larc.nasa.gov/api/temporal/daily/point", params={
+        "latitude": lat,
+        "longitude": lon,
+        "start": f"{year}0101",
+        "end": f"{year}1231",
+        "parameters": "T2M,PRECTOT,WS10M",
+        "community": "AG",
+        "format": "JSON",
+    })
+    with open(os.path.join(out_dir, "power_daily.json"), "w") as fh:
+        # only the part fetch_nasa_power reads
+        json.dump({"properties": {"parameter": resp.json()["properties"]["parameter"]}}, fh)
+
+    map_key = os.environ["FIRMS_MAP_KEY"]
+    area = ",".join(str(v) for v in bbox)
+    resp = http_get(
+        f"https://firms.modaps.eosdis.nasa.gov/api/area/csv/{map_key}/VIIRS_SNPP_NRT/{area}/{firms_days}")
+    with open(os.path.join(out_dir, "firms_area.csv"), "w") as fh:
+        fh.write(resp.text)
+
+    ensure_ee()
+    rows = (
+        ee.ImageCollection(CHIRPS_COLLECTION)
+        .filterDate(f"{year}-01-01", f"{year + 1}-01-01")
+        .select("precipitation")
+        .getRegion(ee.Geometry.Point([lon, lat]), CHIRPS_SCALE_M)
+        .getInfo()
+    )
+    with open(os.path.join(out_dir, "chirps_point.json"), "w") as fh:
+        json.dump(rows, fh)
+    logging.info("Fixtures written to %s", out_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record benchmark replay fixtures")
+    parser.add_argument("--year", type=int, default=2022)
+    parser.add_argument("--lat", type=float, default=40.4093)
+    parser.add_argument("--lon", type=float, default=49.8671)
+    parser.add_argument("--bbox", default="44.0,38.5,51.5,42.0", help="west,south,east,north")
+    parser.add_argument("--firms-days", type=int, default=10)
+    parser.add_argument("--out", default=FIXTURES_DIR)
+    args = parser.parse_args()
+    record(args.year, args.lat, args.lon, [float(v) for v in args.bbox.split(",")],
+           args.firms_days, args.out)
@@ -0,0 +1,387 @@
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+
+from utils.timeseries_store import grid_cell
+
+# ================================================================
+# Offline stand-ins for the upstream services
+# ================================================================
+#
+# Replays recorded responses instead of calling NASA POWER, FIRMS and Earth
+# Engine, with injected latency, so the API can be benchmarked without
+# network access or credentials:
+#   * POWER / FIRMS : a requests adapter mounted on utils.http_client.session
+#                     for the two NASA hosts, POWER point and regional
+#                     endpoints (the real retry/pool/host-limit path is
+#                     still exercised up to the transport)
+#   * Earth Engine  : a fake `ee` module that records the expression graph
+#                     built by the CHIRPS fetchers and answers getInfo() from
+#                     the CHIRPS fixture after a simulated round trip
+#
+# Fixtures (bench/fixtures/, see bench/record.py):
+#   power_daily.json : raw POWER daily point response for one year
+#   firms_area.csv   : raw FIRMS area CSV
+#   chirps_point.json: raw CHIRPS getRegion rows for one year
+# Days outside the recorded year are answered from the same month/day, so any
+# date range can be replayed.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+POWER_HOST = "power.larc.nasa.gov"
+FIRMS_HOST = "firms.modaps.eosdis.nasa.gov"
+
+# Simulated upstream cost: base seconds per call + seconds per returned value
+# (days for POWER/CHIRPS, rows for FIRMS). Scaled by Replay(latency_scale=).
+DEFAULT_LATENCY: Dict[str, Tuple[float, float]] = {
+    "power": (0.35, 2e-5),
+    "firms": (0.5, 1e-5),
+    "ee": (0.6, 5e-6),
+}
+
+
+def _month_day_keys(days: pd.DatetimeIndex) -> pd.Index:
+    # Feb 29 is answered from Feb 28
+    return pd.Index(days.strftime("%m%d")).str.replace("0229", "0228")
+
+
+def _epoch_ms(days: pd.DatetimeIndex) -> List[int]:
+    return ((days - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).tolist()
+
+
+def _location_factor(source: str, lat: float, lon: float) -> float:
+    """
+    Deterministic 0.7..1.3 multiplier so distinct locations differ. Constant
+    within one source grid cell, like the real products.
+    """
+    digest = hashlib.blake2b(grid_cell(source, lat, lon).encode(), digest_size=4).digest()
+    return 0.7 + 0.6 * int.from_bytes(digest, "big") / 0xFFFFFFFF
+
+
+class Fixtures:
+    """Recorded upstream responses, indexed for replay."""
+
+    def __init__(self, path: str = FIXTURES_DIR):
+        with open(os.path.join(path, "power_daily.json")) as fh:
+            params = json.load(fh)["properties"]["parameter"]
+        self.power = {
+            name: pd.Series(values).set_axis(
+                _month_day_keys(pd.to_datetime(list(values), format="%Y%m%d")))
+            for name, values in params.items()
+        }
+
+        self.firms = pd.read_csv(os.path.join(path, "firms_area.csv"))
+        self.firms_last_day = pd.to_datetime(self.firms["acq_date"]).max()
+
+        with open(os.path.join(path, "chirps_point.json")) as fh:
+            rows = json.load(fh)
+        header = rows[0]
+        t_idx, v_idx = header.index("time"), header.index("precipitation")
+        days = pd.to_datetime([r[t_idx] for r in rows[1:]], unit="ms")
+        self.chirps = pd.Series([r[v_idx] for r in rows[1:]], dtype=float).set_axis(
+            _month_day_keys(days))
+
+
+class Replay:
+    """Latency model and request counters shared by the stand-ins."""
+
+    def __init__(self, fixtures: Optional[Fixtures] = None, latency_scale: float = 1.0,
+                 jitter: float = 0.2, seed: int = 0):
+        self.fixtures = fixtures or Fixtures()
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {"power": 0, "firms": 0, "ee": 0}
+
+    def wait(self, service: str, units: int = 0):
+        base, per_unit = DEFAULT_LATENCY[service]
+        with self._lock:
+            self.calls[service] += 1
+            noise = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        delay = (base + per_unit * units) * noise * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+
+    # ---- HTTP sources ----
+
+    def _power_parameters(self, query: Dict[str, List[str]], lat: float, lon: float) -> Dict[str, Any]:
+        days = pd.date_range(pd.to_datetime(query["start"][0], format="%Y%m%d"),
+                             pd.to_datetime(query["end"][0], format="%Y%m%d"))
+        keys = _month_day_keys(days)
+        labels = days.strftime("%Y%m%d")
+        factor = _location_factor("power", lat, lon)
+
+        parameter = {}
+        for name in query["parameters"][0].split(","):
+            # the AG community answers PRECTOT with PRECTOTCORR, like upstream
+            name = "PRECTOTCORR" if name == "PRECTOT" else name
+            series = self.fixtures.power.get(name)
+            if series is None:
+                continue
+            values = series.reindex(keys).to_numpy()
+            if name != "T2M":
+                values = values * factor
+            parameter[name] = dict(zip(labels, values.round(2).tolist()))
+        return parameter
+
+    def power_response(self, query: Dict[str, List[str]]) -> bytes:
+        parameter = self._power_parameters(
+            query, float(query["latitude"][0]), float(query["longitude"][0]))
+        self.wait("power", len(next(iter(parameter.values()), {})))
+        return json.dumps({"properties": {"parameter": parameter}}).encode()
+
+    def power_regional_response(self, query: Dict[str, List[str]]) -> bytes:
+        """GeoJSON FeatureCollection with one feature per POWER grid node in the box."""
+        south, north = float(query["latitude-min"][0]), float(query["latitude-max"][0])
+        west, east = float(query["longitude-min"][0]), float(query["longitude-max"][0])
+        features = []
+        # MERRA-2 nodes sit on the multiples of 0.5 deg lat / 0.625 deg lon
+        for i in range(math.ceil((south + 90) / 0.5), math.floor((north + 90) / 0.5) + 1):
+            lat = round(i * 0.5 - 90, 6)
+            for j in range(math.ceil((west + 180) / 0.625), math.floor((east + 180) / 0.625) + 1):
+                lon = round(j * 0.625 - 180, 6)
+                features.append({
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [lon, lat, 0.0]},
+                    "properties": {"parameter": self._power_parameters(query, lat, lon)},
+                })
+        days = len(next(iter(features[0]["properties"]["parameter"].values()), {})) if features else 0
+        self.wait("power", len(features) * days)
+        return json.dumps({"type": "FeatureCollection", "features": features}).encode()
+
+    def firms_response(self, path: str) -> bytes:
+        # /api/area/csv/<key>/<source>/<w,s,e,n>/<days>
+        # /api/country/csv/<key>/<source>/<ISO3>/<days>
+        parts = path.strip("/").split("/")
+        kind, area, day_range = parts[1], parts[5], int(parts[6])
+        df = self.fixtures.firms.copy()
+
+        # shift recorded dates so the newest fixture day is today (UTC)
+        today = pd.Timestamp(time.strftime("%Y-%m-%d", time.gmtime()))
+        acq = pd.to_datetime(df["acq_date"]) + (today - self.fixtures.firms_last_day)
+        df["acq_date"] = acq.dt.strftime("%Y-%m-%d")
+        mask = acq > today - pd.Timedelta(days=day_range)
+        if kind == "area":
+            west, south, east, north = (float(v) for v in area.split(","))
+            mask &= (df["longitude"].between(west, east)
+                     & df["latitude"].between(south, north))
+        df = df[mask]
+        self.wait("firms", len(df))
+        buf = io.StringIO()
+        df.to_csv(buf, index=False)
+        return buf.getvalue().encode()
+
+    # ---- Earth Engine ----
+
+    def chirps_values(self, days: pd.DatetimeIndex, lat: float, lon: float):
+        values = self.fixtures.chirps.reindex(_month_day_keys(days)).to_numpy()
+        return (values * _location_factor("chirps", lat, lon)).round(3)
+
+
+# ---------- requests transport ----------
+
+class ReplayAdapter(BaseAdapter):
+    """requests adapter answering POWER / FIRMS URLs from the fixtures."""
+
+    def __init__(self, replay: Replay):
+        super().__init__()
+        self.replay = replay
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        url = urlsplit(request.url)
+        if url.netloc == POWER_HOST and url.path.endswith("/regional"):
+            body = self.replay.power_regional_response(parse_qs(url.query))
+        elif url.netloc == POWER_HOST:
+            body = self.replay.power_response(parse_qs(url.query))
+        elif url.netloc == FIRMS_HOST:
+            body = self.replay.firms_response(url.path)
+        else:
+            raise requests.ConnectionError(f"no replay fixture for {url.netloc}")
+
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = body
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "OK"
+        return resp
+
+    def close(self):
+        pass
+
+
+# ---------- Earth Engine expression stand-in ----------
+
+class Expr:
+    """
+    One node of a fake Earth Engine expression. Attribute access and calls
+    build the graph like the real client library; getInfo() evaluates it.
+    """
+
+    def __init__(self, replay: Replay, op: str, parent: Optional["Expr"] = None,
+                 args=(), kwargs=None):
+        self._replay = replay
+        self.op = op
+        self.parent = parent
+        self.args = args
+        self.kwargs = kwargs or {}
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Expr(self._replay, name, self)
+
+    def __call__(self, *args, **kwargs):
+        return Expr(self._replay, self.op, self.parent, args, kwargs)
+
+    def chain(self) -> Iterator["Expr"]:
+        node = self
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def walk(self) -> Iterator["Expr"]:
+        """Every node reachable through parents and arguments."""
+        seen = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            yield node
+            if node.parent is not None:
+                stack.append(node.parent)
+            for value in list(node.args) + list(node.kwargs.values()):
+                for item in (value if isinstance(value, (list, tuple)) else [value]):
+                    if isinstance(item, Expr):
+                        stack.append(item)
+                    elif callable(item):
+                        # collection.map(fn): trace fn's graph on a stand-in element
+                        stack.append(item(Expr(self._replay, "element")))
+
+    def find(self, op: str) -> Optional["Expr"]:
+        return next((n for n in self.walk() if n.op == op), None)
+
+    def getInfo(self):
+        return _evaluate(self)
+
+
+def _days(expr: Expr) -> pd.DatetimeIndex:
+    start, end = expr.find("filterDate").args
+    return pd.date_range(start, end, inclusive="left")
+
+
+def _evaluate(expr: Expr) -> Any:
+    replay = expr._replay
+    ops = {n.op for n in expr.chain()}
+
+    if "getRegion" in ops:
+        # point series: [[id, lon, lat, time, precipitation], ...]
+        lon, lat = next(n for n in expr.chain() if n.op == "getRegion").args[0].args[0]
+        days = _days(expr)
+        values = replay.chirps_values(days, lat, lon)
+        replay.wait("ee", len(days))
+        times = _epoch_ms(days)
+        return [["id", "longitude", "latitude", "time", "precipitation"]] + [
+            [d.strftime("%Y%m%d"), lon, lat, t, v]
+            for d, t, v in zip(days, times, values.tolist())
+        ]
+
+    if "reduceColumns" in ops:
+        # area statistics: [[time, mean, p..., p...], ...]
+        rect = expr.find("Rectangle")
+        if rect is not None:
+            west, south, east, north = rect.args[0]
+            lat, lon = (south + north) / 2, (west + east) / 2
+        else:
+            coords = expr.find("Polygon").args[0][0]
+            lon = sum(c[0] for c in coords) / len(coords)
+            lat = sum(c[1] for c in coords) / len(coords)
+        selectors = next(n for n in expr.chain() if n.op == "reduceColumns").args[1]
+        days = _days(expr)
+        mean = replay.chirps_values(days, lat, lon)
+        times = _epoch_ms(days)
+        # low percentiles below the mean, high ones above it
+        spreads = [0.5 if int(key.rsplit("_p", 1)[1]) < 50 else 1.6 for key in selectors[2:]]
+        replay.wait("ee", len(days) * len(selectors))
+        return [[t, m] + [round(m * s, 3) for s in spreads]
+                for t, m in zip(times, mean.tolist())]
+
+    if expr.op == "If":
+        # batch sampling: FeatureCollection of {idx, <YYYYMMDD>_precipitation}
+        sample = expr.find("sampleRegions")
+        days = _days(expr)
+        if not len(days):
+            replay.wait("ee")
+            return None
+        features = []
+        for feature in sample.kwargs["collection"].args[0]:
+            point, props = feature.args
+            lon, lat = point.args[0]
+            values = replay.chirps_values(days, lat, lon)
+            record = {f"{d}_precipitation": v
+                      for d, v in zip(days.strftime("%Y%m%d"), values.tolist())}
+            record["idx"] = props["idx"]
+            features.append({"type": "Feature", "properties": record})
+        replay.wait("ee", len(days) * len(features))
+        return {"type": "FeatureCollection", "features": features}
+
+    if "size" in ops:
+        replay.wait("ee")
+        return len(_days(expr))
+
+    raise NotImplementedError(f"replay cannot evaluate EE expression ending in {expr.op}")
+
+
+# ---------- installation ----------
+
+@contextlib.contextmanager
+def replay_upstreams(replay: Optional[Replay] = None) -> Iterator[Replay]:
+    """
+    Route POWER / FIRMS / Earth Engine calls to `replay` for the duration of
+    the block. Import api_main (if used) before entering so its init_ee
+    binding is patched as well.
+    """
+    from utils import fetch_hazard_data
+    from utils.http_client import session
+
+    replay = replay or Replay()
+    adapter = ReplayAdapter(replay)
+    prefixes = [f"https://{POWER_HOST}", f"https://{FIRMS_HOST}"]
+    for prefix in prefixes:
+        session.mount(prefix, adapter)
+
+    patched = [(fetch_hazard_data, "ee", Expr(replay, "ee"))]
+    for module in (fetch_hazard_data, sys.modules.get("api_main")):
+        if module is not None and hasattr(module, "init_ee"):
+            patched.append((module, "init_ee", lambda: None))
+    originals = [(module, name, getattr(module, name)) for module, name, _ in patched]
+    for module, name, value in patched:
+        setattr(module, name, value)
+    map_key = os.environ.setdefault("FIRMS_MAP_KEY", "replay")
+
+    try:
+        yield replay
+    finally:
+        for module, name, value in originals:
+            setattr(module, name, value)
+        for prefix in prefixes:
+            session.adapters.pop(prefix, None)
+        if map_key == "replay":
+            os.environ.pop("FIRMS_MAP_KEY", None)
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+import api_main
+from bench.replay import Replay, replay_upstreams
+from utils.cache import hazard_cache
+from utils.timeseries_store import daily_store
+
+# ================================================================
+# Offline benchmark scenarios
+# ================================================================
+#
+# Runs the FastAPI app in-process (httpx ASGI transport) against the replay
+# stand-ins and reports p50/p95 latency, throughput and peak RSS per scenario:
+#
+#   python -m bench.run                          # all scenarios
+#   python -m bench.run -s single year --iterations 20 --json out.json
+#   python -m bench.run --latency-scale 0        # CPU cost only, no injected waits
+#
+# Each request uses a distinct location and the in-process cache is cleared
+# between scenarios, so every request is a cold fetch. Leave
+# HAZARD_CACHE_BACKEND and TIMESERIES_STORE_PATH unset for comparable runs.
+
+# Azerbaijan, same as the fixtures
+REGION = (44.0, 38.5, 51.5, 42.0)
+
+
+def _point(i: int) -> List[float]:
+    """Distinct, reproducible [lat, lon] inside REGION (0.05 deg lattice)."""
+    west, south, east, north = REGION
+    ncols = int((east - west) / 0.05)
+    row, col = divmod(i, ncols)
+    return [round(south + 0.025 + 0.05 * (row % int((north - south) / 0.05)), 4),
+            round(west + 0.025 + 0.05 * col, 4)]
+
+
+def _compute_body(i: int, start: str, end: str) -> Dict[str, Any]:
+    return {"point": _point(i), "start": start, "end": end, "firms_days": 7}
+
+
+async def _timed_post(client: httpx.AsyncClient, path: str, body, latencies: List[float]) -> int:
+    return (await _timed_post_body(client, path, body, latencies))[0]
+
+
+async def _timed_post_body(client: httpx.AsyncClient, path: str, body,
+                           latencies: List[float]) -> Tuple[int, bytes]:
+    t0 = time.perf_counter()
+    resp = await client.post(path, json=body)
+    content = await resp.aread()
+    latencies.append(time.perf_counter() - t0)
+    return resp.status_code, content
+
+
+def _failures(statuses: List[int]) -> int:
+    return sum(1 for s in statuses if s != 200)
+
+
+def batch_failures(status: int, content: bytes, locations: int) -> int:
+    """
+    Locations of a /hazards/batch response that did not come back clean:
+    lines with a non-empty features.errors, plus any missing from the
+    stream (a non-200 or truncated response).
+    """
+    if status != 200:
+        return locations
+    failed = seen = 0
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            break  # cut off mid-line
+        seen += 1
+        if row.get("features", {}).get("errors"):
+            failed += 1
+    return failed + max(locations - seen, 0)
+
+
+async def sequential(client, start: str, end: str, iterations: int, offset: int):
+    latencies: List[float] = []
+    statuses = [await _timed_post(client, "/hazards/compute",
+                                  _compute_body(offset + i, start, end), latencies)
+                for i in range(iterations)]
+    return latencies, _failures(statuses), iterations
+
+
+async def concurrent(client, start: str, end: str, iterations: int, clients: int, offset: int):
+    latencies: List[float] = []
+
+    async def worker(c: int):
+        return [await _timed_post(client, "/hazards/compute",
+                                  _compute_body(offset + c * iterations + i, start, end),
+                                  latencies)
+                for i in range(iterations)]
+
+    results = await asyncio.gather(*(worker(c) for c in range(clients)))
+    return latencies, _failures([s for r in results for s in r]), clients * iterations
+
+
+async def batch(client, start: str, end: str, locations: int, offset: int):
+    latencies: List[float] = []
+    body = {
+        "locations": [{"point": _point(offset + i), "id": str(i)} for i in range(locations)],
+        "start": start,
+        "end": end,
+        "firms_days": 7,
+    }
+    status, content = await _timed_post_body(client, "/hazards/batch", body, latencies)
+    return latencies, batch_failures(status, content, locations), locations
+
+
+def scenarios(args) -> Dict[str, Any]:
+    """name -> coroutine factory(client, offset)."""
+    return {
+        "single": lambda c, o: sequential(c, "2022-06-01", "2022-06-30", args.iterations, o),
+        "year": lambda c, o: sequential(c, "2022-01-01", "2022-12-31", args.iterations, o),
+        "decade": lambda c, o: sequential(c, "2013-01-01", "2022-12-31", args.iterations, o),
+        "batch": lambda c, o: batch(c, "2022-01-01", "2022-12-31", args.batch_size, o),
+        "concurrent": lambda c, o: concurrent(
+            c, "2022-01-01", "2022-12-31", args.iterations, args.clients, o),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    if hazard_cache.backend is not None or daily_store is not None:
+        logging.warning("Shared cache / per-day store configured; results are not cold-path timings")
+
+    results = []
+    with replay_upstreams(Replay(latency_scale=args.latency_scale, seed=args.seed)) as replay:
+        transport = httpx.ASGITransport(app=api_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     timeout=None) as client:
+            available = scenarios(args)
+            offset = 0
+            for name in args.scenarios:
+                hazard_cache.local.clear()
+                calls_before = dict(replay.calls)
+                t0 = time.perf_counter()
+                latencies, errors, items = await available[name](client, offset)
+                wall = time.perf_counter() - t0
+                # keep locations distinct across scenarios too
+                offset += items
+
+                lat_ms = np.asarray(latencies) * 1000
+                result = {
+                    "scenario": name,
+                    "requests": len(latencies),
+                    "errors": errors,
+                    "items": items,
+                    "p50_ms": round(float(np.percentile(lat_ms, 50)), 1),
+                    "p95_ms": round(float(np.percentile(lat_ms, 95)), 1),
+                    "wall_s": round(wall, 3),
+                    "throughput_items_s": round(items / wall, 2),
+                    "peak_rss_mb": round(peak_rss_mb(), 1),
+                    "upstream_calls": {k: v - calls_before[k] for k, v in replay.calls.items()},
+                }
+                results.append(result)
+                logging.info("%s done in %.2fs", name, wall)
+    return results
+
+
+def print_table(results: List[Dict[str, Any]]):
+    header = f"{'scenario':<11} {'req':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} " \
+             f"{'items/s':>9} {'peak RSS MB':>12}  upstream calls"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        calls = " ".join(f"{k}={v}" for k, v in r["upstream_calls"].items())
+        print(f"{r['scenario']:<11} {r['requests']:>5} {r['errors']:>4} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['throughput_items_s']:>9.2f} {r['peak_rss_mb']:>12.1f}  {calls}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline hazard API benchmarks")
+    parser.add_argument("-s", "--scenarios", nargs="+",
+                        default=["single", "year", "decade", "batch", "concurrent"],
+                        choices=["single", "year", "decade", "batch", "concurrent"])
+    parser.add_argument("--iterations", type=int, default=10,
+                        help="requests per scenario (per client for 'concurrent')")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--batch-size", type=int, default=1000, help="locations in 'batch'")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier on injected upstream latency (0 disables it)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write results (with run metadata) to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run(args))
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": vars(args),
+                "results": results,
+            }, fh, indent=2)
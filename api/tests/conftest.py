@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modules are imported as utils.*, relative to api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import batch, http_client, power_block
+from utils.fetch_hazard_data import POWER_PARAMETERS
+
+START, END = "2024-06-01", "2024-06-30"
+DAYS = pd.date_range(START, END, freq="D")
+
+
+def _locations(n: int):
+    out = []
+    for i in range(n):
+        lat, lon = 40.0 + 0.7 * i, 47.0
+        out.append({"lat": lat, "lon": lon, "bbox": [lon - 0.1, lat - 0.1, lon + 0.1, lat + 0.1]})
+    return out
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    """Fake POWER/CHIRPS/FIRMS loaders with configurable delays."""
+    delays = {"power": 0.0, "chirps": 0.0, "firms": 0.0}
+    seen_deadlines = {}
+
+    def sleep(name):
+        seen_deadlines[name] = http_client._deadline.get()
+        time.sleep(delays[name])
+
+    def load_power(lat, lon, start, end):
+        sleep("power")
+        return pd.DataFrame({p: np.ones(len(DAYS)) for p in POWER_PARAMETERS}, index=DAYS)
+
+    def load_chirps_points(points, start, end):
+        sleep("chirps")
+        return [pd.DataFrame({"precip_mm": np.ones(len(DAYS) - 1)}, index=DAYS[:-1])
+                for _ in points]
+
+    def load_firms(bbox, firms_days=7):
+        sleep("firms")
+        return pd.DataFrame(columns=["latitude", "longitude", "acq_date", "acq_time", "frp"])
+
+    monkeypatch.setattr(power_block, "POWER_REGIONAL", False)
+    monkeypatch.setattr(power_block, "load_power", load_power)
+    monkeypatch.setattr(batch, "load_chirps_points", load_chirps_points)
+    monkeypatch.setattr(batch, "load_firms", load_firms)
+    return delays, seen_deadlines
+
+
+def _run(locations):
+    t0 = time.monotonic()
+    lines = [(i, features, time.monotonic() - t0)
+             for i, features in batch.iter_batch_features(locations, START, END)]
+    return lines
+
+
+def test_every_location_once_with_all_groups(upstreams):
+    locations = _locations(5)
+    lines = _run(locations)
+    assert sorted(i for i, _, _ in lines) == list(range(len(locations)))
+    for _, features, _ in lines:
+        assert features["errors"] == {}
+        assert features["climate"] and features["drought"]
+
+
+def test_shared_budgets_overlap(upstreams, monkeypatch):
+    delays, seen_deadlines = upstreams
+    delays.update(chirps=0.3, firms=0.6)
+    monkeypatch.setitem(batch.SOURCE_TIMEOUTS, "chirps", 0.5)
+    monkeypatch.setitem(batch.SOURCE_TIMEOUTS, "firms", 0.2)
+
+    lines = _run(_locations(3))
+    # FIRMS times out at 0.2 s while CHIRPS is still running; CHIRPS lands at
+    # 0.3 s. Serial waits would give 0.3 + 0.2 s before the first line.
+    first = min(t for _, _, t in lines)
+    assert 0.25 < first < 0.45
+    for _, features, _ in lines:
+        assert features["errors"] == {"firms": "timed out after 0.2s"}
+        assert features["drought"]
+    # the HTTP layer sees each source's own deadline
+    assert seen_deadlines["chirps"] is not None and seen_deadlines["firms"] is not None
+    assert seen_deadlines["chirps"] - seen_deadlines["firms"] == pytest.approx(0.3, abs=0.05)
+    assert seen_deadlines["power"] is not None
+
+
+def test_locations_wait_only_for_shared_sources(upstreams):
+    delays, _ = upstreams
+    delays.update(chirps=0.2)
+    lines = _run(_locations(4))
+    # POWER is ready at once; every line is yielded as CHIRPS lands
+    assert all(0.15 < t < 0.35 for _, _, t in lines)
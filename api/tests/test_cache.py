@@ -0,0 +1,32 @@
+import sqlite3
+import time
+
+from utils.cache import SQLiteBackend
+
+
+def _rows(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def test_expired_rows_are_skipped_then_purged(tmp_path):
+    path = str(tmp_path / "cache.db")
+    backend = SQLiteBackend(path, purge_every_s=float("inf"))
+    backend.set("old", 1, ttl=-1)
+    backend.set("new", 2, ttl=60)
+    assert backend.get("old") is None
+    assert backend.get("new")[1] == 2
+    assert _rows(path) == 2
+
+    assert backend.purge_expired() == 1
+    assert _rows(path) == 1
+
+
+def test_writes_purge_periodically(tmp_path):
+    path = str(tmp_path / "cache.db")
+    backend = SQLiteBackend(path, purge_every_s=0.05)
+    for i in range(5):
+        backend.set(f"old{i}", i, ttl=-1)
+    time.sleep(0.06)
+    backend.set("new", 1, ttl=60)
+    assert _rows(path) == 1
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from utils.fire_fusion import (
+    _M_PER_DEG_LAT,
+    _M_PER_DEG_LON,
+    candidate_pairs,
+    connected_labels,
+    dedupe_hotspots,
+    fused_fire_stats,
+    merge_sources,
+)
+
+
+def _detections(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # a dense 0.2 deg box over three days, so many detections are near each other
+    minutes = rng.integers(0, 3 * 1440, n)
+    day = pd.Timestamp("2024-07-01") + pd.to_timedelta(minutes // 1440, unit="D")
+    hhmm = (minutes % 1440) // 60 * 100 + minutes % 60
+    return pd.DataFrame({
+        "latitude": 40.0 + rng.uniform(0, 0.2, n),
+        "longitude": 47.0 + rng.uniform(0, 0.2, n),
+        "acq_date": day.strftime("%Y-%m-%d"),
+        "acq_time": hhmm,
+        "frp": rng.uniform(1, 50, n),
+    })
+
+
+def _brute_force_labels(df: pd.DataFrame, distance_m: float, hours: float) -> np.ndarray:
+    lat = df["latitude"].to_numpy()
+    lon = df["longitude"].to_numpy()
+    x = lon * _M_PER_DEG_LON * np.cos(np.radians(lat.mean()))
+    y = lat * _M_PER_DEG_LAT
+    day = pd.to_datetime(df["acq_date"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    hhmm = df["acq_time"].to_numpy()
+    t = (day * 1440 + hhmm // 100 * 60 + hhmm % 100).astype(float)
+    close = (((x[:, None] - x[None, :]) ** 2 + (y[:, None] - y[None, :]) ** 2 <= distance_m ** 2)
+             & (np.abs(t[:, None] - t[None, :]) <= hours * 60))
+    i, j = np.nonzero(np.triu(close, 1))
+    return connected_labels(len(df), i, j)
+
+
+def _same_partition(a: np.ndarray, b: np.ndarray) -> bool:
+    # equal up to relabelling: every label of a maps to exactly one label of b
+    pairs = set(zip(a.tolist(), b.tolist()))
+    return len(pairs) == len(set(a.tolist())) == len(set(b.tolist()))
+
+
+def test_candidate_pairs_include_every_close_pair():
+    rng = np.random.default_rng(0)
+    n = 400
+    x, y = rng.uniform(0, 5000, n), rng.uniform(0, 5000, n)
+    t = rng.uniform(0, 600, n)
+    i, j = candidate_pairs(x, y, t, 1000.0, 180.0)
+    assert np.all(i < j)
+    found = set(zip(i.tolist(), j.tolist()))
+    assert len(found) == len(i)  # no duplicates
+
+    close = ((np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :]) <= 1000.0)
+             & (np.abs(t[:, None] - t[None, :]) <= 180.0))
+    expected = set(zip(*[v.tolist() for v in np.nonzero(np.triu(close, 1))]))
+    assert expected <= found
+
+
+def test_dedupe_matches_brute_force():
+    for seed in range(5):
+        df = _detections(300, seed)
+        fused = dedupe_hotspots(df, distance_m=1000, hours=3)
+        assert len(fused) == len(df)
+        assert _same_partition(fused["fire_id"].to_numpy(), _brute_force_labels(df, 1000, 3))
+
+
+def test_dedupe_links_transitively():
+    # 0.008 deg of latitude is ~885 m: each neighbour is linked, the ends are not
+    df = pd.DataFrame({
+        "latitude": [40.0, 40.008, 40.016, 41.0],
+        "longitude": [47.0] * 4,
+        "acq_date": ["2024-07-01"] * 4,
+        "acq_time": [1000, 1030, 1100, 1000],
+    })
+    fire_id = dedupe_hotspots(df, distance_m=1000, hours=3)["fire_id"].tolist()
+    assert fire_id[0] == fire_id[1] == fire_id[2] != fire_id[3]
+
+
+def test_dedupe_separates_in_time():
+    df = pd.DataFrame({
+        "latitude": [40.0, 40.0, 40.0],
+        "longitude": [47.0, 47.0, 47.0],
+        "acq_date": ["2024-07-01", "2024-07-01", "2024-07-02"],
+        "acq_time": [100, 359, 100],
+    })
+    fire_id = dedupe_hotspots(df, distance_m=1000, hours=3)["fire_id"].tolist()
+    assert fire_id[0] == fire_id[1] != fire_id[2]
+
+
+def test_dedupe_empty():
+    fused = dedupe_hotspots(pd.DataFrame(columns=["latitude", "longitude", "acq_date", "acq_time"]))
+    assert fused.empty and "fire_id" in fused
+
+
+def test_fused_stats_count_each_fire_once():
+    viirs = pd.DataFrame({
+        "latitude": [40.0, 40.001, 41.0], "longitude": [47.0, 47.0, 47.0],
+        "acq_date": ["2024-07-01"] * 3, "acq_time": [1000, 1000, 1000],
+        "bright_ti4": [330.0, 331.0, 320.0], "frp": [10.0, 12.0, 3.0],
+    })
+    modis = pd.DataFrame({
+        "latitude": [40.002], "longitude": [47.001],
+        "acq_date": ["2024-07-01"], "acq_time": [1045],
+        "brightness": [335.0], "frp": [30.0],
+    })
+    merged = merge_sources({"VIIRS_SNPP_NRT": viirs, "MODIS_NRT": modis})
+    assert merged["bright_ti4"].tolist() == [330.0, 331.0, 320.0, 335.0]
+
+    stats = fused_fire_stats(dedupe_hotspots(merged, distance_m=1000, hours=3))
+    assert stats == {
+        "fires_unique": 2,
+        "fires_multi_sensor": 1,
+        "fires_frp_sum": 33.0,  # strongest detection of each fire: 30 + 3
+        "fires_frp_max": 30.0,
+    }
+
+
+def test_load_firms_multi_reports_failed_sensors(monkeypatch):
+    from utils import fetch_hazard_data
+
+    viirs = _detections(20, 0)
+
+    def load_firms(bbox, firms_days=7, source=None, polygon=None):
+        if source == "VIIRS_NOAA20_NRT":
+            raise RuntimeError("FIRMS 503")
+        return viirs
+
+    monkeypatch.setattr(fetch_hazard_data, "load_firms", load_firms)
+    errors = {}
+    fused = fetch_hazard_data.load_firms_multi(
+        (47.0, 40.0, 47.2, 40.2), sources=["VIIRS_SNPP_NRT", "VIIRS_NOAA20_NRT"], errors=errors)
+    assert len(fused) == len(viirs)
+    assert set(fused["source"]) == {"VIIRS_SNPP_NRT"}
+    assert errors == {"firms_VIIRS_NOAA20_NRT": "FIRMS 503"}
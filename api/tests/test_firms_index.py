@@ -0,0 +1,82 @@
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import batch, fetch_hazard_data
+from utils.fetch_hazard_data import fire_features
+from utils.firms_index import HotspotIndex, HotspotTables
+
+REGION = (44.0, 38.5, 51.5, 42.0)
+
+
+def _hotspots(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    days = [(today - datetime.timedelta(days=int(d))).isoformat() for d in rng.integers(0, 7, n)]
+    return pd.DataFrame({
+        "latitude": rng.uniform(REGION[1], REGION[3], n),
+        "longitude": rng.uniform(REGION[0], REGION[2], n),
+        "acq_date": days,
+        "acq_time": rng.integers(0, 2400, n),
+        "bright_ti4": rng.uniform(300, 360, n),
+        "frp": rng.uniform(1, 80, n),
+    })
+
+
+def _tables(df: pd.DataFrame) -> HotspotTables:
+    tables = HotspotTables(REGION, ["VIIRS_SNPP_NRT"], days=7, refresh_s=600)
+    tables._tables["VIIRS_SNPP_NRT"] = HotspotIndex(df)
+    tables._loaded_at["VIIRS_SNPP_NRT"] = time.time()
+    return tables
+
+
+@pytest.mark.parametrize("bbox, polygon, days", [
+    ((46.0, 39.0, 48.0, 41.0), None, 7),
+    ((46.0, 39.0, 48.0, 41.0), None, 2),
+    ((46.0, 39.0, 48.0, 41.0), [[46.0, 39.0], [48.0, 39.0], [47.0, 41.0]], 7),
+    ((50.0, 41.9, 50.01, 41.91), None, 7),  # empty
+])
+def test_stats_match_fire_features_of_rows(bbox, polygon, days):
+    index = HotspotIndex(_hotspots(5000))
+    expected = fire_features(index.rows(bbox, polygon=polygon, days=days))
+    assert index.stats(bbox, polygon=polygon, days=days) == pytest.approx(expected, rel=1e-12)
+
+
+def test_compute_takes_fire_stats_from_the_index(monkeypatch):
+    df = _hotspots(2000)
+    monkeypatch.setattr(fetch_hazard_data, "hotspot_tables", _tables(df))
+    requested = []
+
+    def fetch_hazard_sources(*args, sources=None, **kwargs):
+        requested.append(sources)
+        return {}, {"power": "down", "chirps": "down"}
+
+    monkeypatch.setattr(fetch_hazard_data, "fetch_hazard_sources", fetch_hazard_sources)
+    bbox = (46.0, 39.0, 48.0, 41.0)
+    features = fetch_hazard_data.build_hazard_features(
+        40.0, 47.0, "2024-06-01", "2024-06-30", bbox=bbox, firms_days=3)
+    assert requested == [["power", "chirps"]]
+    assert features["fire"] == pytest.approx(
+        HotspotIndex(df).stats(bbox, days=3), rel=1e-12)
+    assert features["fire"]["fires_count"] > 0
+
+
+def test_batch_takes_fire_stats_from_the_index(monkeypatch):
+    df = _hotspots(2000)
+    monkeypatch.setattr(batch, "hotspot_tables", _tables(df))
+    monkeypatch.setattr(batch, "load_firms", lambda *a, **k: pytest.fail("FIRMS fetched"))
+    monkeypatch.setattr(batch, "load_chirps_points", lambda points, start, end: [
+        pd.DataFrame({"precip_mm": [1.0]}, index=pd.DatetimeIndex([start]))] * len(points))
+    monkeypatch.setattr(batch.PowerBlock, "iter_fill", lambda self, executor, timeout=None: iter(
+        [(cell, "skipped") for cell in range(self.n_cells)]))
+
+    locations = [{"lat": lat, "lon": 47.0, "bbox": [46.5, lat - 0.5, 47.5, lat + 0.5]}
+                 for lat in (39.5, 40.5, 41.0)]
+    lines = list(batch.iter_batch_features(locations, "2024-06-01", "2024-06-30", firms_days=7))
+    assert sorted(i for i, _ in lines) == [0, 1, 2]
+    for i, features in lines:
+        assert "firms" not in features["errors"]
+        assert features["fire"] == HotspotIndex(df).stats(locations[i]["bbox"], days=7)
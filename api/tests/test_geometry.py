@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+
+from utils import geometry
+from utils.geometry import (
+    _authalic_q,
+    _lat_from_q,
+    bbox_area_km2,
+    bbox_polygon,
+    points_in_polygon,
+    polygon_area_km2,
+    polygon_centroid,
+)
+
+# WGS84 ellipsoid surface area
+EARTH_AREA_KM2 = 510_065_621.7
+
+
+def _star(n_vertices: int, seed: int):
+    """Random star-shaped (so simple) polygon around (47, 40)."""
+    rng = np.random.default_rng(seed)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n_vertices))
+    radii = rng.uniform(0.2, 1.0, n_vertices)
+    return np.column_stack([47 + radii * np.cos(angles), 40 + radii * np.sin(angles)]).tolist()
+
+
+def _distance_to_edges(lons, lats, polygon) -> np.ndarray:
+    """Distance (degrees) of each point to the nearest polygon edge."""
+    poly = np.asarray(polygon, dtype=float)
+    a, b = poly, np.roll(poly, -1, axis=0)
+    p = np.column_stack([lons, lats])[:, None, :]
+    ab = b - a
+    t = np.clip(((p - a) * ab).sum(-1) / (ab * ab).sum(-1), 0, 1)
+    return np.linalg.norm(p - (a + t[..., None] * ab), axis=-1).min(axis=1)
+
+
+# ---------- area ----------
+
+def test_whole_globe_area():
+    assert bbox_area_km2((-180, -90, 180, 90)) == pytest.approx(EARTH_AREA_KM2, rel=1e-9)
+
+
+def test_polygon_area_matches_bbox_area():
+    bbox = (44.0, 38.5, 51.5, 42.0)
+    ring = bbox_polygon(bbox)
+    expected = bbox_area_km2(bbox)
+    assert polygon_area_km2(ring) == pytest.approx(expected, rel=1e-12)
+    # orientation and a repeated closing vertex do not matter
+    assert polygon_area_km2(ring[::-1]) == pytest.approx(expected, rel=1e-12)
+    assert polygon_area_km2(ring + [ring[0]]) == pytest.approx(expected, rel=1e-12)
+
+
+def test_area_of_hemispheres_and_bands_add_up():
+    north = bbox_area_km2((-180, 0, 180, 90))
+    assert north == pytest.approx(EARTH_AREA_KM2 / 2, rel=1e-9)
+    bands = sum(bbox_area_km2((-180, lat, 180, lat + 10)) for lat in range(0, 90, 10))
+    assert bands == pytest.approx(north, rel=1e-12)
+
+
+def test_degenerate_areas():
+    assert polygon_area_km2([[0, 0], [1, 1]]) == 0.0
+    assert bbox_area_km2((1, 0, 0, 1)) == 0.0
+
+
+# ---------- centroid ----------
+
+@pytest.mark.parametrize("lat", [-89.0, -60.0, -12.5, 0.0, 33.3, 75.0, 89.9])
+def test_lat_from_q_inverts_authalic_q(lat):
+    assert _lat_from_q(float(_authalic_q(np.array(lat)))) == pytest.approx(lat, abs=1e-6)
+
+
+def test_box_centroid_splits_area_in_half():
+    west, south, east, north = 44.0, 38.5, 51.5, 62.0
+    lon, lat = polygon_centroid(bbox_polygon((west, south, east, north)))
+    assert lon == pytest.approx((west + east) / 2)
+    # equal-area centroid: the parallel through it halves the box
+    assert bbox_area_km2((west, south, east, lat)) == pytest.approx(
+        bbox_area_km2((west, lat, east, north)), rel=1e-9)
+    assert lat < (south + north) / 2  # pulled towards the wider, southern part
+
+
+def test_centroid_of_l_shape():
+    # two unit squares side by side at the equator plus one on top of the left one
+    ring = [[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2]]
+    lon, lat = polygon_centroid(ring)
+    assert lon == pytest.approx(5 / 6, abs=1e-3)
+    assert lat == pytest.approx(5 / 6, abs=1e-3)
+
+
+def test_degenerate_centroid_is_vertex_mean():
+    assert polygon_centroid([[0, 1], [2, 1], [4, 1]]) == pytest.approx((2.0, 1.0))
+    assert polygon_centroid([[3, 0], [3, 2], [3, 7]]) == pytest.approx((3.0, 3.0))
+    assert polygon_centroid([[5, 5], [5, 5]]) == pytest.approx((5.0, 5.0))
+
+
+# ---------- point in polygon ----------
+
+def test_points_in_square():
+    square = bbox_polygon((0, 0, 1, 1))
+    lons = [0.5, 1.5, 0.25, -0.1, 0.99]
+    lats = [0.5, 0.5, 0.75, 0.5, 0.01]
+    assert points_in_polygon(lons, lats, square).tolist() == [True, False, True, False, True]
+
+
+def test_points_keep_input_shape():
+    square = bbox_polygon((0, 0, 1, 1))
+    lons, lats = np.meshgrid(np.linspace(-0.5, 1.5, 5), np.linspace(-0.5, 1.5, 4))
+    inside = points_in_polygon(lons, lats, square)
+    assert inside.shape == (4, 5)
+    assert inside.sum() == 2 * 2
+
+
+def test_points_in_polygon_with_hole_like_concavity():
+    # a "C" shape: the notch is outside
+    ring = [[0, 0], [3, 0], [3, 1], [1, 1], [1, 2], [3, 2], [3, 3], [0, 3]]
+    assert points_in_polygon([0.5, 2, 2, 2], [1.5, 1.5, 0.5, 2.5], ring).tolist() == [
+        True, False, True, True]
+
+
+@pytest.mark.parametrize("n_vertices", [40, 200])
+def test_slab_path_matches_edge_loop(monkeypatch, n_vertices):
+    """
+    Both paths agree everywhere except for points lying on an edge (within
+    floating-point error), which either may count as inside.
+    """
+    rng = np.random.default_rng(n_vertices)
+    for seed in range(5):
+        polygon = _star(n_vertices, seed)
+        lons = rng.uniform(45.9, 48.1, 20_000)
+        lats = rng.uniform(38.9, 41.1, 20_000)
+        # points exactly on vertex latitudes hit the slab boundaries
+        poly = np.array(polygon)
+        lats[:1000] = rng.choice(poly[:, 1], 1000)
+        # points on the edges themselves
+        edge = rng.integers(0, n_vertices, 1000)
+        t = rng.uniform(0, 1, 1000)
+        a, b = poly[edge], poly[(edge + 1) % n_vertices]
+        lons[1000:2000] = a[:, 0] + t * (b[:, 0] - a[:, 0])
+        lats[1000:2000] = a[:, 1] + t * (b[:, 1] - a[:, 1])
+
+        assert n_vertices >= geometry.SLAB_MIN_VERTICES
+        slab = points_in_polygon(lons, lats, polygon)
+        monkeypatch.setattr(geometry, "SLAB_MIN_VERTICES", 10 ** 9)
+        loop = points_in_polygon(lons, lats, polygon)
+        monkeypatch.undo()
+
+        differ = slab != loop
+        assert np.all(_distance_to_edges(lons[differ], lats[differ], polygon) < 1e-9)
+        assert not differ[2000:].any()
+
+
+def test_points_in_polygon_empty_inputs():
+    assert points_in_polygon([], [], bbox_polygon((0, 0, 1, 1))).shape == (0,)
+    assert not points_in_polygon([0.5], [0.5], [[0, 0], [1, 1]]).any()
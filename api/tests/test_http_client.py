@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from utils import http_client
+from utils.http_client import HTTP_MAX_PER_HOST, fetch_deadline, http_get
+
+
+class _FakeSession:
+    """Stands in for the pooled session and records peak concurrency."""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay_s)
+        with self.lock:
+            self.active -= 1
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = b"{}"
+        return resp
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    fake = _FakeSession(delay_s=0.05)
+    monkeypatch.setattr(http_client, "session", fake)
+    monkeypatch.setattr(http_client, "_host_limits", {})
+    return fake
+
+
+def test_callers_queue_for_host_slots_without_deadline(fake_session):
+    n = 2 * HTTP_MAX_PER_HOST
+    with ThreadPoolExecutor(n) as pool:
+        results = list(pool.map(lambda _: http_get("https://upstream.test/x").status_code, range(n)))
+    assert results == [200] * n
+    assert fake_session.peak == HTTP_MAX_PER_HOST
+
+
+def test_deadline_bounds_the_wait_for_a_slot(fake_session):
+    fake_session.delay_s = 0.5
+    n = 2 * HTTP_MAX_PER_HOST
+
+    def get(_):
+        with fetch_deadline(time.monotonic() + 0.1):
+            try:
+                return http_get("https://upstream.test/x").status_code
+            except requests.Timeout:
+                return "timeout"
+
+    with ThreadPoolExecutor(n) as pool:
+        results = list(pool.map(get, range(n)))
+    assert results.count(200) == HTTP_MAX_PER_HOST
+    assert results.count("timeout") == n - HTTP_MAX_PER_HOST
@@ -0,0 +1,191 @@
+import os
+import struct
+import time
+
+import numpy as np
+import pytest
+
+from utils.tiles import (
+    MVT_EXTENT,
+    TileCache,
+    check_tile,
+    encode_point_layer,
+    quantize_max_mm,
+    tile_bbox,
+    tile_pixels,
+)
+
+
+# ---------- minimal protobuf reader for the MVT messages ----------
+
+def _read_varint(buf: bytes, pos: int):
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def _fields(buf: bytes):
+    pos = 0
+    while pos < len(buf):
+        key, pos = _read_varint(buf, pos)
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire == 2:
+            size, pos = _read_varint(buf, pos)
+            value, pos = buf[pos:pos + size], pos + size
+        else:
+            raise AssertionError(f"unexpected wire type {wire}")
+        yield number, value
+
+
+def _packed(buf: bytes):
+    pos, out = 0, []
+    while pos < len(buf):
+        value, pos = _read_varint(buf, pos)
+        out.append(value)
+    return out
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def _decode_value(buf: bytes):
+    (number, value), = _fields(buf)
+    if number == 1:
+        return value.decode("utf-8")
+    if number == 3:
+        return struct.unpack("<d", value)[0]
+    if number == 6:
+        return _unzigzag(value)
+    if number == 7:
+        return bool(value)
+    raise AssertionError(f"unexpected value field {number}")
+
+
+def decode_point_layer(tile: bytes):
+    (number, layer), = _fields(tile)
+    assert number == 3
+    out = {"features": [], "keys": [], "values": []}
+    raw_features = []
+    for number, value in _fields(layer):
+        if number == 15:
+            out["version"] = value
+        elif number == 1:
+            out["name"] = value.decode("utf-8")
+        elif number == 2:
+            raw_features.append(value)
+        elif number == 3:
+            out["keys"].append(value.decode("utf-8"))
+        elif number == 4:
+            out["values"].append(_decode_value(value))
+        elif number == 5:
+            out["extent"] = value
+    for raw in raw_features:
+        feature = {"tags": []}
+        for number, value in _fields(raw):
+            if number == 1:
+                feature["id"] = value
+            elif number == 2:
+                feature["tags"] = _packed(value)
+            elif number == 3:
+                feature["type"] = value
+            elif number == 4:
+                feature["geometry"] = _packed(value)
+        tags = feature.pop("tags")
+        feature["properties"] = {out["keys"][k]: out["values"][v]
+                                 for k, v in zip(tags[::2], tags[1::2])}
+        out["features"].append(feature)
+    return out
+
+
+# ---------- encoder ----------
+
+def test_point_layer_round_trip():
+    px = np.array([0, 4096, -10, 2048])
+    py = np.array([0, 4096, 4100, 17])
+    properties = [
+        {"acq_date": "2024-07-01", "frp": 12.5, "acq_time": 1130, "daynight": "D"},
+        {"acq_date": "2024-07-01", "frp": 12.5, "acq_time": 45},
+        {"acq_date": "2024-07-02", "frp": float("nan"), "confidence": None},
+        {"acq_time": -3, "flag": True},
+    ]
+    layer = decode_point_layer(encode_point_layer("fires", px, py, properties))
+
+    assert layer["name"] == "fires"
+    assert layer["version"] == 2
+    assert layer["extent"] == MVT_EXTENT
+    assert [f["id"] for f in layer["features"]] == [1, 2, 3, 4]
+    for feature, x, y, props in zip(layer["features"], px, py, properties):
+        assert feature["type"] == 1  # POINT
+        command, dx, dy = feature["geometry"]
+        assert command == (1 << 3) | 1  # MoveTo, count 1
+        assert (_unzigzag(dx), _unzigzag(dy)) == (x, y)
+        expected = {k: v for k, v in props.items()
+                    if v is not None and not (isinstance(v, float) and np.isnan(v))}
+        assert feature["properties"] == expected
+
+
+def test_point_layer_shares_keys_and_values():
+    properties = [{"acq_date": "2024-07-01", "frp": 1.0}] * 3
+    layer = decode_point_layer(encode_point_layer(
+        "fires", np.zeros(3, dtype=int), np.zeros(3, dtype=int), properties))
+    assert layer["keys"] == ["acq_date", "frp"]
+    assert layer["values"] == ["2024-07-01", 1.0]
+
+
+def test_point_layer_keeps_int_and_float_values_apart():
+    layer = decode_point_layer(encode_point_layer(
+        "fires", np.zeros(2, dtype=int), np.zeros(2, dtype=int), [{"v": 1}, {"v": 1.0}]))
+    values = [f["properties"]["v"] for f in layer["features"]]
+    assert [type(v) for v in values] == [int, float]
+
+
+# ---------- tile math ----------
+
+def test_tile_pixels_of_tile_corners():
+    z, x, y = 7, 85, 47
+    west, south, east, north = tile_bbox(z, x, y)
+    px, py = tile_pixels(np.array([west, east]), np.array([north, south]), z, x, y)
+    assert px.tolist() == [0, MVT_EXTENT]
+    assert py.tolist() == [0, MVT_EXTENT]
+
+
+@pytest.mark.parametrize("tile", [(-1, 0, 0), (3, 8, 0), (3, 0, -1)])
+def test_check_tile_rejects_out_of_range(tile):
+    with pytest.raises(ValueError):
+        check_tile(*tile)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.5, 1.0), (1, 1.0), (1.01, 2.0), (2, 2.0), (3, 5.0), (5, 5.0),
+    (6, 10.0), (150, 200.0), (500, 500.0), (501, 1000.0),
+])
+def test_quantize_max_mm(value, expected):
+    assert quantize_max_mm(value) == expected
+
+
+# ---------- disk cache ----------
+
+def test_sweep_drops_expired_then_oldest(tmp_path):
+    cache = TileCache(str(tmp_path), max_bytes=5000, max_age_s=100, sweep_every_s=float("inf"))
+    now = time.time()
+    for i in range(10):
+        cache.put("fires", "v", 5, i, 1, b"x" * 1000)
+        path = cache._path("fires", "v", 5, i, 1)
+        os.utime(path, (now - 10 + i, now - 10 + i))
+    expired = cache._path("fires", "v", 5, 0, 1)
+    os.utime(expired, (now - 1000, now - 1000))
+
+    assert cache.sweep() == 6  # the expired tile, then oldest down to 90% of 5000 bytes
+    kept = sorted(int(name) for name in os.listdir(tmp_path / "fires" / "v" / "5"))
+    assert kept == [6, 7, 8, 9]
+    assert cache.get("fires", "v", 5, 9, 1, ttl=100) == b"x" * 1000
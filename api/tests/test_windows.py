@@ -0,0 +1,103 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.feature_grid import window_dates
+from utils.fetch_hazard_data import (
+    climate_features,
+    drought_features,
+    frames_since,
+    window_features,
+    window_start,
+)
+
+END = "2024-06-30"
+WINDOWS = [1, 7, 30, 90, 365, 400]
+
+
+def _frames(seed: int, first: str = "2023-06-01", with_gaps: bool = True):
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(first, END, freq="D")
+    power = pd.DataFrame({
+        "T2M": rng.normal(15, 8, len(days)),
+        "PRECTOT": rng.gamma(0.5, 4, len(days)),
+        "WS10M": rng.uniform(0, 12, len(days)),
+    }, index=days)
+    chirps_days = days[:-1]  # CHIRPS end is exclusive
+    chirps = pd.DataFrame({
+        "precip_mm": rng.gamma(0.5, 4, len(chirps_days)),
+        "precip_p10": rng.gamma(0.3, 2, len(chirps_days)),
+        "precip_p90": rng.gamma(1.0, 6, len(chirps_days)),
+    }, index=chirps_days)
+    if with_gaps:
+        power.iloc[rng.choice(len(power), 20, replace=False), 0] = np.nan
+        chirps.iloc[rng.choice(len(chirps), 20, replace=False), 0] = np.nan
+        # a missing day, not only missing values
+        power = power.drop(power.index[-3])
+    return {"power": power, "chirps": chirps}
+
+
+def _assert_features_equal(got, expected):
+    assert got.keys() == expected.keys()
+    for key, value in expected.items():
+        assert got[key] == pytest.approx(value, rel=1e-12, abs=1e-12), key
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_windows_match_separate_requests(seed):
+    frames = _frames(seed)
+    summaries = window_features(frames, END, WINDOWS)
+    assert [w["days"] for w in summaries] == WINDOWS
+
+    for window in summaries:
+        start = window_start(END, window["days"])
+        assert window["start"] == start and window["end"] == END
+        # what a request for [start, END] would summarise
+        power = frames["power"].loc[start:END]
+        chirps = frames["chirps"].loc[start:(datetime.date.fromisoformat(END)
+                                             - datetime.timedelta(days=1)).isoformat()]
+        _assert_features_equal(window["climate"], climate_features(power))
+        _assert_features_equal(window["drought"], drought_features(chirps))
+
+
+def test_frames_since_matches_label_slicing():
+    frames = _frames(0)
+    start = window_start(END, 30)
+    sliced = frames_since(frames, start)
+    for name, df in frames.items():
+        pd.testing.assert_frame_equal(sliced[name], df.loc[start:])
+
+
+def test_window_before_the_data_is_empty():
+    frames = _frames(1, first="2024-06-01")
+    (window,) = window_features(frames, "2024-05-20", [7])
+    _assert_features_equal(window["climate"], climate_features(frames["power"].iloc[0:0]))
+    _assert_features_equal(window["drought"], drought_features(frames["chirps"].iloc[0:0]))
+
+
+def test_all_nan_window():
+    frames = _frames(2, with_gaps=False)
+    frames["power"].loc["2024-06-24":, "T2M"] = np.nan
+    (window,) = window_features(frames, END, [7])
+    expected = climate_features(frames["power"].loc[window_start(END, 7):END])
+    _assert_features_equal(window["climate"], expected)
+
+
+def test_missing_source_gives_empty_group():
+    frames = _frames(0)
+    del frames["chirps"]
+    (window,) = window_features(frames, END, [30])
+    assert window["drought"] == {}
+    assert window["climate"]
+
+
+def test_window_span_matches_feature_grid():
+    frames = _frames(0)
+    for window in window_features(frames, END, [1, 30, 365]):
+        start, end = window_dates(datetime.date.fromisoformat(END), window["days"])
+        assert (window["start"], window["end"]) == (start, end)
+        # n + 1 POWER days, n CHIRPS days (end exclusive)
+        days = (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days
+        assert days == window["days"]
@@ -0,0 +1,204 @@
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.fetch_hazard_data import (
+    DEFAULT_FIRMS_SOURCE,
+    SOURCE_TIMEOUTS,
+    _run_until,
+    clip_fires_to_bbox,
+    clip_fires_to_polygon,
+    climate_features,
+    drought_features,
+    fire_features,
+    load_chirps_points,
+    load_firms,
+)
+from utils.firms_index import hotspot_tables
+from utils.power_block import PowerBlock
+from utils.timeseries_store import grid_cell
+
+# ================================================================
+# Portfolio / batch feature computation
+# ================================================================
+#
+# Many locations share a date range, so upstream work is grouped:
+#   * POWER   : one fetch per distinct POWER grid cell, or one regional call
+#               per parameter, into a [cell, day, parameter] block
+#               (utils/power_block.py)
+#   * CHIRPS  : one sampleRegions request (per date chunk) over one point per
+#               distinct CHIRPS cell
+#   * FIRMS   : stats per location from the in-memory hotspot index when it
+#               covers the batch (utils/firms_index.py), otherwise one area
+#               fetch for the union bbox, clipped per location (bbox, then
+#               polygon)
+# Results are yielded per location as soon as its POWER cell and the shared
+# CHIRPS/FIRMS fetches are ready. Every fetch runs under a fetch_deadline
+# measured from the start of the batch, so the budgets overlap instead of
+# adding up.
+
+BATCH_POWER_WORKERS = int(os.environ.get("BATCH_POWER_WORKERS", "8"))
+
+# Separate from the interactive source pool so a large portfolio cannot
+# starve single-AOI requests.
+_BATCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=BATCH_POWER_WORKERS + 2, thread_name_prefix="hazard-batch")
+
+
+def union_bbox(bboxes: List[List[float]]) -> Tuple[float, float, float, float]:
+    return (
+        min(b[0] for b in bboxes),
+        min(b[1] for b in bboxes),
+        max(b[2] for b in bboxes),
+        max(b[3] for b in bboxes),
+    )
+
+
+def _group_by_cell(source: str, locations: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    groups: Dict[str, List[int]] = {}
+    for i, loc in enumerate(locations):
+        groups.setdefault(grid_cell(source, loc["lat"], loc["lon"]), []).append(i)
+    return groups
+
+
+def iter_batch_features(
+    locations: List[Dict[str, Any]],
+    start: str,
+    end: str,
+    firms_days: int = 7,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Compute hazard features for many normalized locations (dicts with lat,
+    lon, bbox as returned by normalize_location) over one date range.
+
+    Yields (index, features) in completion order; features has the same
+    climate/drought/fire/errors layout as build_hazard_features. A location
+    is yielded once its POWER cell is ready and the shared CHIRPS and FIRMS
+    fetches have finished, failed or run out of their budgets; all three
+    budgets are measured from the start of the batch.
+    """
+    power_block = PowerBlock([(loc["lat"], loc["lon"]) for loc in locations], start, end)
+    chirps_cells = _group_by_cell("chirps", locations)
+    logging.info(
+        "Batch of %d locations: %d POWER cells, %d CHIRPS cells",
+        len(locations), power_block.n_cells, len(chirps_cells))
+
+    t0 = time.monotonic()
+    deadlines = {name: t0 + budget for name, budget in SOURCE_TIMEOUTS.items()}
+    # ("power", (cell, error)), ("power", None) once the fill ends, or
+    # (source, future) when a shared fetch finishes
+    events: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+
+    def submit(name: str, fn, **kwargs) -> Future:
+        ctx = contextvars.copy_context()
+        fut = _BATCH_EXECUTOR.submit(ctx.run, _run_until, deadlines[name], fn, kwargs)
+        fut.add_done_callback(lambda f: events.put((name, f)))
+        return fut
+
+    # one representative point per CHIRPS cell
+    chirps_reps = list(chirps_cells.values())
+    shared = {
+        "chirps": submit(
+            "chirps", load_chirps_points,
+            points=[(locations[idx[0]]["lat"], locations[idx[0]]["lon"]) for idx in chirps_reps],
+            start=start, end=end),
+    }
+    union = union_bbox([loc["bbox"] for loc in locations])
+    firms_index = (hotspot_tables.get(DEFAULT_FIRMS_SOURCE, union, firms_days)
+                   if hotspot_tables else None)
+    if firms_index is None:
+        shared["firms"] = submit("firms", load_firms, bbox=union, firms_days=firms_days)
+
+    def fill_power():
+        try:
+            for ready in power_block.iter_fill(
+                    _BATCH_EXECUTOR, timeout=max(deadlines["power"] - time.monotonic(), 0.0)):
+                events.put(("power", ready))
+        finally:
+            events.put(("power", None))
+
+    # the fill waits on its own futures, so it gets a thread of its own
+    # rather than a pool slot
+    threading.Thread(target=contextvars.copy_context().run, args=(fill_power,),
+                     name="hazard-batch-power", daemon=True).start()
+
+    shared_errors: Dict[str, str] = {}
+    drought_by_loc: Dict[int, Dict[str, float]] = {}
+    df_fires = None
+    power_points: List[List[int]] = [[] for _ in range(power_block.n_cells)]
+    for i, cell in enumerate(power_block.point_cell):
+        power_points[cell].append(i)
+
+    def rows(cell: int, error: Optional[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        climate: Dict[str, float] = {}
+        errors = dict(shared_errors)
+        if error is None:
+            climate = climate_features(power_block.frame(cell))
+        else:
+            errors["power"] = error
+
+        for i in power_points[cell]:
+            fire = {}
+            if firms_index is not None:
+                fire = firms_index.stats(locations[i]["bbox"], polygon=locations[i].get("polygon"),
+                                         days=firms_days)
+            elif df_fires is not None:
+                fire = fire_features(clip_fires_to_polygon(
+                    clip_fires_to_bbox(df_fires, locations[i]["bbox"]), locations[i].get("polygon")))
+            yield i, {
+                "climate": climate,
+                "drought": drought_by_loc.get(i, {}),
+                "fire": fire,
+                "errors": errors,
+            }
+
+    # cells whose POWER is ready while a shared source is still pending
+    waiting: List[Tuple[int, Optional[str]]] = []
+    power_done = False
+    while not power_done or shared:
+        timeout = None
+        if shared:
+            timeout = max(min(deadlines[name] for name in shared) - time.monotonic(), 0.0)
+        try:
+            name, payload = events.get(timeout=timeout)
+        except queue.Empty:
+            name, payload = None, None
+
+        if name == "power":
+            if payload is None:
+                power_done = True
+            else:
+                waiting.append(payload)
+        elif name in shared:
+            del shared[name]
+            try:
+                result = payload.result()
+            except Exception as e:
+                shared_errors[name] = str(e) or type(e).__name__
+                logging.warning("Batch %s fetch failed: %s", name.upper(), e)
+            else:
+                if name == "chirps":
+                    for idx, df in zip(chirps_reps, result):
+                        group = drought_features(df)
+                        for i in idx:
+                            drought_by_loc[i] = group
+                else:
+                    df_fires = result
+
+        now = time.monotonic()
+        for name, fut in list(shared.items()):
+            if now >= deadlines[name]:
+                del shared[name]
+                fut.cancel()
+                shared_errors[name] = f"timed out after {SOURCE_TIMEOUTS[name]:g}s"
+                logging.warning("Batch %s fetch timed out after %gs", name.upper(), SOURCE_TIMEOUTS[name])
+
+        if not shared:
+            for cell, error in waiting:
+                yield from rows(cell, error)
+            waiting.clear()
@@ -0,0 +1,270 @@
+import datetime
+import logging
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from utils.metrics import CACHE_REQUESTS, count
+
+# ================================================================
+# Result cache for upstream hazard sources
+# ================================================================
+#
+# Two tiers:
+#   * an in-process LRU (size-bounded, per-entry TTL), always on
+#   * an optional shared backend so several uvicorn workers share hits,
+#     selected with HAZARD_CACHE_BACKEND:
+#         sqlite:///path/to/cache.db
+#         redis://localhost:6379/0      (needs the `redis` package)
+#
+# Keys are built from locations snapped to a CACHE_GRID_DEG grid so that
+# requests for (almost) the same AOI land on the same entry.
+
+CACHE_GRID_DEG = float(os.environ.get("CACHE_GRID_DEG", "0.01"))
+CACHE_MAX_ENTRIES = int(os.environ.get("HAZARD_CACHE_MAX_ENTRIES", "512"))
+
+# FIRMS NRT hotspots change every few minutes; recent POWER/CHIRPS days can
+# still be revised; days older than the settle window are effectively final.
+FIRMS_CACHE_TTL_S = float(os.environ.get("FIRMS_CACHE_TTL_S", "600"))
+RECENT_CACHE_TTL_S = float(os.environ.get("RECENT_CACHE_TTL_S", "3600"))
+HISTORICAL_CACHE_TTL_S = float(os.environ.get("HISTORICAL_CACHE_TTL_S", str(30 * 86400)))
+# How often the SQLite backend deletes expired rows (on the write path)
+HAZARD_CACHE_PURGE_S = float(os.environ.get("HAZARD_CACHE_PURGE_S", "600"))
+
+SETTLE_DAYS = {
+    "power": 7,    # POWER daily values are finalized within about a week
+    "chirps": 45,  # CHIRPS final product lags by roughly a month
+}
+
+
+# ---------- key helpers ----------
+
+def snap(value: float, grid: float = CACHE_GRID_DEG) -> float:
+    return round(round(value / grid) * grid, 6)
+
+
+def snap_point(lat: float, lon: float, grid: float = CACHE_GRID_DEG) -> Tuple[float, float]:
+    return snap(lat, grid), snap(lon, grid)
+
+
+def snap_bbox(bbox, grid: float = CACHE_GRID_DEG) -> Tuple[float, float, float, float]:
+    """
+    Snap a (west, south, east, north) bbox outward to the grid, so the snapped
+    box always contains the original one.
+    """
+    west, south, east, north = bbox
+    return (
+        round(math.floor(west / grid) * grid, 6),
+        round(math.floor(south / grid) * grid, 6),
+        round(math.ceil(east / grid) * grid, 6),
+        round(math.ceil(north / grid) * grid, 6),
+    )
+
+
+def source_ttl(source: str, end: Optional[str] = None) -> float:
+    """
+    TTL (seconds) for a cached source result. `end` is the last requested
+    day ('YYYY-MM-DD') for date-ranged sources.
+    """
+    if source == "firms":
+        return FIRMS_CACHE_TTL_S
+    if end is None:
+        return RECENT_CACHE_TTL_S
+    settle = SETTLE_DAYS.get(source, 7)
+    horizon = datetime.date.today() - datetime.timedelta(days=settle)
+    if datetime.date.fromisoformat(end) <= horizon:
+        return HISTORICAL_CACHE_TTL_S
+    return RECENT_CACHE_TTL_S
+
+
+def make_key(*parts) -> str:
+    return "|".join(str(p) for p in parts)
+
+
+# ---------- in-process LRU ----------
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ---------- shared backends ----------
+
+class SQLiteBackend:
+    """
+    Shared cache in a local SQLite file (safe across worker processes).
+    Expired rows are skipped on read and deleted every purge_every_s by
+    whichever write comes next.
+    """
+
+    def __init__(self, path: str, purge_every_s: float = HAZARD_CACHE_PURGE_S):
+        self.path = path
+        self.purge_every_s = purge_every_s
+        self._local = threading.local()
+        self._last_purge = time.monotonic()
+        self._purging = threading.Lock()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Return (expires_at, value) or None."""
+        row = self._conn().execute(
+            "SELECT expires_at, value FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], pickle.loads(row[1])
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, time.time() + ttl, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+            )
+        self._maybe_purge()
+
+    def _maybe_purge(self):
+        if time.monotonic() - self._last_purge < self.purge_every_s:
+            return
+        if not self._purging.acquire(blocking=False):
+            return  # another thread is purging
+        try:
+            self._last_purge = time.monotonic()
+            removed = self.purge_expired()
+            if removed:
+                logging.info("Shared cache: purged %d expired entries", removed)
+        except Exception as e:
+            logging.warning("Shared cache purge failed: %s", e)
+        finally:
+            self._purging.release()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows; returns how many were removed."""
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+class RedisBackend:
+    """Shared cache in Redis (or any Redis-protocol stand-in)."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "HAZARD_CACHE_BACKEND uses redis:// but the `redis` package is not installed"
+            ) from e
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Return (expires_at, value) or None."""
+        raw, ttl = self._client.pipeline().get(key).ttl(key).execute()
+        if raw is None:
+            return None
+        return time.time() + max(ttl, 0), pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._client.setex(key, max(int(ttl), 1),
+                           pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def backend_from_url(url: Optional[str]):
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported HAZARD_CACHE_BACKEND: {url}")
+
+
+# ---------- two-tier cache ----------
+
+class HazardCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, backend=None):
+        self.local = LRUCache(max_entries)
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        value = self.local.get(key)
+        if value is None and self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:
+                logging.warning("Shared cache read failed for %s: %s", key, e)
+                entry = None
+            if entry is not None:
+                expires_at, value = entry
+                # promote with the remaining lifetime of the shared entry
+                self.local.set(key, value, expires_at - time.time())
+        outcome = "miss" if value is None else "hit"
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        CACHE_REQUESTS.inc(source=key.split("|", 1)[0], result=outcome)
+        count(f"cache_{outcome}")
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.local.set(key, value, ttl)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, ttl)
+            except Exception as e:
+                logging.warning("Shared cache write failed for %s: %s", key, e)
+
+    def clear(self):
+        self.local.clear()
+
+
+hazard_cache = HazardCache(backend=backend_from_url(os.environ.get("HAZARD_CACHE_BACKEND")))
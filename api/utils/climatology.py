@@ -0,0 +1,365 @@
+import argparse
+import datetime
+import io
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.cache import LRUCache
+from utils.singleflight import SingleFlight
+from utils.timeseries_store import SOURCE_GRIDS, cell_center, grid_cell
+
+# ================================================================
+# Multi-year climatology baselines and anomaly features
+# ================================================================
+#
+# A baseline is the daily series of one source grid cell over the reference
+# period (1991-2020 by default), laid out as a float32 [year, day-of-year]
+# array per variable with day-of-year on a 366-day calendar (Feb 29 is NaN in
+# non-leap years). It is fetched once per cell:
+#
+#   power  : one long-range POWER call for the whole period
+#   chirps : the batched toBands/sampleRegions path (fetch_chirps_points), so
+#            the per-day sampling happens server-side in a few round trips
+#
+# and kept forever: in process (LRU) and in SQLite at CLIMATOLOGY_DB_PATH.
+# Anomalies for any window are then pure array work: gather the window's
+# days-of-year for every reference year, reduce per year (sum or mean), and
+# compare the current value against those 30 same-window values. No upstream
+# call is made once the cell's baseline is stored.
+#
+# A request never waits on a 30-year fetch: a missing baseline is fetched in
+# the background and the request waits at most CLIMATOLOGY_WAIT_S for it,
+# after which it is answered without anomalies and errors reports
+# '<source>_climatology': 'pending'.
+#
+#   python -m utils.climatology --bbox 44.0,38.5,51.5,42.0   # prefetch a region
+
+CLIMATOLOGY_DB_PATH = os.environ.get(
+    "CLIMATOLOGY_DB_PATH", os.path.join(tempfile.gettempdir(), "hazard_climatology.db"))
+CLIMATOLOGY_START_YEAR = int(os.environ.get("CLIMATOLOGY_START_YEAR", "1991"))
+CLIMATOLOGY_END_YEAR = int(os.environ.get("CLIMATOLOGY_END_YEAR", "2020"))
+CLIMATOLOGY_MEMORY_CELLS = int(os.environ.get("CLIMATOLOGY_MEMORY_CELLS", "256"))
+CLIMATOLOGY_WAIT_S = float(os.environ.get("CLIMATOLOGY_WAIT_S", "5"))
+CLIMATOLOGY_FETCH_WORKERS = int(os.environ.get("CLIMATOLOGY_FETCH_WORKERS", "2"))
+
+# source -> {baseline variable: source column}
+BASELINE_VARIABLES: Dict[str, Dict[str, str]] = {
+    "power": {"t2m": "T2M", "precip": "PRECTOT"},
+    "chirps": {"precip": "precip_mm"},
+}
+
+# (source, baseline variable, how the window is reduced, feature compared);
+# anomaly features are named after the feature, e.g. chirps_precip_sum_anomaly
+ANOMALY_FEATURES: List[Tuple[str, str, str, str]] = [
+    ("power", "t2m", "mean", "t2m_mean"),
+    ("power", "precip", "sum", "precip_sum"),
+    ("chirps", "precip", "sum", "chirps_precip_sum"),
+]
+
+_LEAP_JAN1 = datetime.date(2000, 1, 1)
+_FEB29 = 59
+
+
+def day_of_year(d: datetime.date) -> int:
+    """0-based day index on a 366-day calendar, so Feb 29 has its own slot."""
+    return (d.replace(year=2000) - _LEAP_JAN1).days
+
+
+class Baseline:
+    """Per-variable [year, day-of-year] arrays for one source cell."""
+
+    def __init__(self, first_year: int, values: Dict[str, np.ndarray]):
+        self.first_year = first_year
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, df, columns: Dict[str, str], first_year: int, last_year: int) -> "Baseline":
+        n_years = last_year - first_year + 1
+        rows = np.asarray(df.index.year, dtype=int) - first_year
+        keep = (rows >= 0) & (rows < n_years)
+        doy = np.array([day_of_year(d) for d in df.index.date], dtype=int)
+        values = {}
+        for name, col in columns.items():
+            arr = np.full((n_years, 366), np.nan, dtype=np.float32)
+            if col in df:
+                arr[rows[keep], doy[keep]] = df[col].to_numpy(dtype=float)[keep]
+            values[name] = arr
+        return cls(first_year, values)
+
+    def to_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez_compressed(buf, first_year=np.array(self.first_year), **self.values)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Baseline":
+        with np.load(io.BytesIO(data)) as npz:
+            first_year = int(npz["first_year"])
+            return cls(first_year, {k: npz[k] for k in npz.files if k != "first_year"})
+
+    def window_values(self, variable: str, days: Sequence[datetime.date], how: str) -> np.ndarray:
+        """
+        The window reduced ('sum' or 'mean') for every reference year the
+        window fits in. `days` keeps its calendar shape: a Dec-Feb window is
+        compared against Dec-Feb of consecutive reference years.
+        """
+        arr = self.values[variable]
+        if not days:
+            return np.empty(0)
+        first = min(d.year for d in days)
+        offsets = np.array([d.year - first for d in days], dtype=int)
+        doy = np.array([day_of_year(d) for d in days], dtype=int)
+        n = arr.shape[0] - int(offsets.max())
+        if n <= 0:
+            return np.empty(0)
+        window = arr[np.arange(n)[:, None] + offsets[None, :], doy[None, :]]
+        if how == "sum":
+            # a reference year with gaps would bias the sum low; allow at most
+            # a tenth of the days missing, not counting Feb 29 of common years
+            gaps = np.isnan(window[:, doy != _FEB29])
+            complete = gaps.mean(axis=1) <= 0.1 if gaps.shape[1] else np.ones(n, dtype=bool)
+            return np.nansum(window, axis=1)[complete]
+        with np.errstate(all="ignore"):
+            means = np.nanmean(window, axis=1)
+        return means[~np.isnan(means)]
+
+
+def anomaly_stats(current: float, reference: np.ndarray, how: str) -> Dict[str, float]:
+    """Baseline mean, anomaly and empirical percentile of `current`."""
+    mean = float(reference.mean())
+    # baselines are float32: treat values within rounding of each other as ties
+    ties = np.isclose(reference, current, rtol=1e-5, atol=1e-6)
+    below = (reference < current) & ~ties
+    stats = {
+        "baseline": mean,
+        "anomaly": current - mean,
+        # mid-rank, so a value equal to every reference year sits at 50
+        "percentile": float(100.0 * (below.sum() + 0.5 * ties.sum()) / len(reference)),
+    }
+    if how == "sum":
+        stats["anomaly_pct"] = 100.0 * (current / mean - 1.0) if mean > 0 else 0.0
+    return stats
+
+
+class ClimatologyStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS baselines ("
+                " source TEXT NOT NULL, cell TEXT NOT NULL,"
+                " first_year INTEGER NOT NULL, last_year INTEGER NOT NULL,"
+                " data BLOB NOT NULL, created_at REAL NOT NULL,"
+                " PRIMARY KEY (source, cell, first_year, last_year))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def read(self, source: str, cell: str, first_year: int, last_year: int) -> Optional[Baseline]:
+        row = self._conn().execute(
+            "SELECT data FROM baselines"
+            " WHERE source = ? AND cell = ? AND first_year = ? AND last_year = ?",
+            (source, cell, first_year, last_year),
+        ).fetchone()
+        return Baseline.from_bytes(row[0]) if row else None
+
+    def write(self, source: str, cell: str, first_year: int, last_year: int, baseline: Baseline):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO baselines"
+                " (source, cell, first_year, last_year, data, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (source, cell, first_year, last_year, baseline.to_bytes(), time.time()),
+            )
+
+
+class BaselinePending(RuntimeError):
+    """Raised when a baseline is still being fetched in the background."""
+
+
+class Climatology:
+    """Baseline lookup (memory -> SQLite -> upstream) and anomaly features."""
+
+    def __init__(self, path: str, first_year: int = CLIMATOLOGY_START_YEAR,
+                 last_year: int = CLIMATOLOGY_END_YEAR):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.store = ClimatologyStore(path)
+        self._memory = LRUCache(max_entries=CLIMATOLOGY_MEMORY_CELLS)
+        self._inflight = SingleFlight()
+        self._executor = ThreadPoolExecutor(
+            max_workers=CLIMATOLOGY_FETCH_WORKERS, thread_name_prefix="climatology")
+        self._background: Dict[str, Future] = {}
+        self._background_lock = threading.Lock()
+
+    def _fetch(self, source: str, lat: float, lon: float) -> Baseline:
+        # imported here to avoid a cycle: fetch_hazard_data consults this module
+        from utils.fetch_hazard_data import POWER_PARAMETERS, fetch_chirps_points, fetch_nasa_power
+
+        t0 = time.monotonic()
+        if source == "power":
+            df = fetch_nasa_power(lat, lon, f"{self.first_year}0101", f"{self.last_year}1231",
+                                  parameters=POWER_PARAMETERS)
+        else:
+            df = fetch_chirps_points(
+                [(lat, lon)], f"{self.first_year}-01-01", f"{self.last_year + 1}-01-01")[0]
+        baseline = Baseline.from_frame(df, BASELINE_VARIABLES[source], self.first_year, self.last_year)
+        logging.info("Climatology baseline %s at (%.3f, %.3f) fetched in %.1fs",
+                     source, lat, lon, time.monotonic() - t0)
+        return baseline
+
+    def baseline(self, source: str, lat: float, lon: float,
+                 wait: Optional[float] = None) -> Baseline:
+        """
+        Baseline of the source cell containing (lat, lon); fetched at most
+        once. With `wait`, the lookup runs in the background and
+        BaselinePending is raised if it takes longer than `wait` seconds;
+        it keeps running, so a later call finds the baseline stored.
+        """
+        cell = grid_cell(source, lat, lon)
+        key = f"climatology|{source}|{cell}|{self.first_year}-{self.last_year}"
+        found = self._memory.get(key)
+        if found is not None:
+            return found
+
+        def load():
+            baseline = self.store.read(source, cell, self.first_year, self.last_year)
+            if baseline is None:
+                baseline = self._fetch(source, *cell_center(source, lat, lon))
+                self.store.write(source, cell, self.first_year, self.last_year, baseline)
+            self._memory.set(key, baseline, float("inf"))
+            return baseline
+
+        if wait is None:
+            return self._inflight.do(key, load)
+        with self._background_lock:
+            future = self._background.get(key)
+            if future is None:
+                future = self._background[key] = self._executor.submit(self._inflight.do, key, load)
+                future.add_done_callback(lambda _: self._forget_background(key))
+        try:
+            return future.result(timeout=wait)
+        except FuturesTimeout:
+            raise BaselinePending(f"{source} baseline for this cell is being fetched") from None
+
+    def _forget_background(self, key: str):
+        with self._background_lock:
+            self._background.pop(key, None)
+
+    def anomaly_features(
+        self,
+        source: str,
+        lat: float,
+        lon: float,
+        days: Sequence[datetime.date],
+        current: Dict[str, float],
+        wait: Optional[float] = None,
+    ) -> Dict[str, float]:
+        """
+        Anomaly features of one source for a window.
+
+        days    : the days the current values were computed over
+        current : the group's features for the window (climate_features /
+                  drought_features output)
+        Returns '<feature>_baseline', '_anomaly', '_percentile' and, for
+        sums, '_anomaly_pct'. Features with no usable reference years are
+        skipped. wait is passed to baseline().
+        """
+        baseline = self.baseline(source, lat, lon, wait=wait)
+        features: Dict[str, float] = {}
+        for src, variable, how, feature in ANOMALY_FEATURES:
+            if src != source or feature not in current:
+                continue
+            reference = baseline.window_values(variable, days, how)
+            if len(reference) == 0:
+                continue
+            for stat, value in anomaly_stats(current[feature], reference, how).items():
+                features[f"{feature}_{stat}"] = value
+        return features
+
+
+def climatology_from_env() -> Optional[Climatology]:
+    if os.environ.get("CLIMATOLOGY_ENABLED", "1") == "0":
+        return None
+    try:
+        return Climatology(CLIMATOLOGY_DB_PATH)
+    except Exception as e:
+        logging.warning("Climatology store at %s not available: %s", CLIMATOLOGY_DB_PATH, e)
+        return None
+
+
+climatology = climatology_from_env()
+
+
+# Cells per fetch_chirps_points call when prefetching
+PREFETCH_BATCH_CELLS = int(os.environ.get("CLIMATOLOGY_PREFETCH_BATCH", "100"))
+
+
+def prefetch(bbox, sources: Sequence[str] = ("power", "chirps")):
+    """
+    Fetch and store the baseline of every source cell intersecting bbox that
+    is not stored yet. CHIRPS cells are sampled PREFETCH_BATCH_CELLS at a time.
+    """
+    from utils.fetch_hazard_data import fetch_chirps_points
+
+    west, south, east, north = bbox
+    first, last = climatology.first_year, climatology.last_year
+    for source in sources:
+        dlat, dlon = SOURCE_GRIDS[source]
+        cells: Dict[str, Tuple[float, float]] = {}
+        for lat in np.arange(south, north + dlat, dlat):
+            for lon in np.arange(west, east + dlon, dlon):
+                lat, lon = min(float(lat), north), min(float(lon), east)
+                cells.setdefault(grid_cell(source, lat, lon), cell_center(source, lat, lon))
+        todo = {cell: center for cell, center in cells.items()
+                if climatology.store.read(source, cell, first, last) is None}
+        logging.info("%s: %d cells, %d to fetch", source, len(cells), len(todo))
+
+        if source == "power":
+            for lat, lon in todo.values():
+                try:
+                    climatology.baseline(source, lat, lon)
+                except Exception as e:
+                    logging.warning("POWER baseline failed at (%.3f, %.3f): %s", lat, lon, e)
+            continue
+
+        items = list(todo.items())
+        for b in range(0, len(items), PREFETCH_BATCH_CELLS):
+            batch = items[b:b + PREFETCH_BATCH_CELLS]
+            try:
+                frames = fetch_chirps_points([c for _, c in batch], f"{first}-01-01", f"{last + 1}-01-01")
+            except Exception as e:
+                logging.warning("CHIRPS baseline batch %d failed: %s", b // PREFETCH_BATCH_CELLS, e)
+                continue
+            for (cell, _), df in zip(batch, frames):
+                climatology.store.write(source, cell, first, last, Baseline.from_frame(
+                    df, BASELINE_VARIABLES[source], first, last))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Prefetch climatology baselines for a region")
+    parser.add_argument("--bbox", default="44.0,38.5,51.5,42.0", help="west,south,east,north")
+    parser.add_argument("--sources", default="power,chirps")
+    args = parser.parse_args()
+    if climatology is None:
+        parser.error("climatology is disabled (CLIMATOLOGY_ENABLED=0)")
+
+    from utils.fetch_hazard_data import ensure_ee
+
+    ensure_ee()
+    prefetch(tuple(float(v) for v in args.bbox.split(",")), args.sources.split(","))
@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ================================================================
+# Bounded executor for the blocking hazard pipeline
+# ================================================================
+#
+# The fetchers are synchronous (requests + ee), so async handlers hand them to
+# this pool instead of calling them on the event loop. Admission is bounded:
+# at most `max_concurrency` computations run and at most `max_queue` wait;
+# anything beyond that is rejected immediately so the worker stays responsive
+# (e.g. /health for Cloud Run liveness checks).
+
+COMPUTE_MAX_CONCURRENCY = int(os.environ.get("COMPUTE_MAX_CONCURRENCY", "4"))
+COMPUTE_MAX_QUEUE = int(os.environ.get("COMPUTE_MAX_QUEUE", "16"))
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when the pool has no free slot and the wait queue is full."""
+
+
+class ComputePool:
+    def __init__(self, max_concurrency: int, max_queue: int, name: str = "hazard-compute"):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.name = name
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0  # running + queued
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def capacity(self) -> int:
+        return self.max_concurrency + self.max_queue
+
+    @property
+    def saturated(self) -> bool:
+        return self._pending >= self.capacity
+
+    def acquire(self):
+        """
+        Claim a slot for work that runs outside the pool (e.g. a streamed
+        response iterated by the server). Pair with release().
+        """
+        self._admit()
+
+    def release(self):
+        self._release()
+
+    def _admit(self):
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise PoolSaturated(
+                    f"compute pool saturated ({self._pending}/{self.capacity} in flight)")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool and await its result.
+        Raises PoolSaturated without queueing if the pool is full.
+        """
+        self._admit()
+        try:
+            # run in a copy of the caller's context (per-request timings)
+            ctx = contextvars.copy_context()
+            cf = self._executor.submit(ctx.run, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        # release on completion of the work itself, not of the awaiting
+        # coroutine: a disconnected client must not free a busy slot
+        cf.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(cf)
+
+    def shutdown(self):
+        logging.info("Shutting down %s pool", self.name)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+compute_pool = ComputePool(COMPUTE_MAX_CONCURRENCY, COMPUTE_MAX_QUEUE)
@@ -0,0 +1,263 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.timeseries_store import grid_cell
+
+# ================================================================
+# Precomputed climate / drought feature grid
+# ================================================================
+#
+# Most traffic falls inside one region, so the climate and drought groups are
+# evaluated offline on a regular lat/lon grid for rolling standard windows
+# (last 30/90/365 days by default) and stored as a memory-mapped array:
+#
+#   <dir>/grid.npy    float32 [window, lat, lon, feature], NaN where a
+#                     source fetch failed during the build
+#   <dir>/index.json  bbox, step, window start/end dates, feature names
+#
+# build_hazard_features answers point-mode requests whose start/end match a
+# window exactly and whose location is inside the grid by bilinear
+# interpolation of the four surrounding nodes; only FIRMS is fetched live.
+# Anything else (custom ranges, out-of-grid, area mode) is fetched as usual.
+#
+#   python -m utils.feature_grid --out /data/feature_grid      # nightly cron
+#
+# FEATURE_GRID_PATH points the API at the directory; a rebuilt grid is picked
+# up within FEATURE_GRID_RELOAD_S.
+
+DEFAULT_GRID_BBOX = (44.0, 38.5, 51.5, 42.0)  # Azerbaijan
+DEFAULT_GRID_STEP = 0.1
+DEFAULT_WINDOWS = (30, 90, 365)
+GRID_BUILD_WORKERS = int(os.environ.get("GRID_BUILD_WORKERS", "8"))
+FEATURE_GRID_RELOAD_S = float(os.environ.get("FEATURE_GRID_RELOAD_S", "60"))
+
+GRID_FEATURES: List[Tuple[str, str]] = [
+    ("climate", "t2m_mean"),
+    ("climate", "t2m_max"),
+    ("climate", "precip_sum"),
+    ("climate", "wind_mean"),
+    ("drought", "chirps_precip_sum"),
+    ("drought", "chirps_precip_mean"),
+]
+
+
+class FeatureGrid:
+    """Read side: memory-mapped grid with window lookup and interpolation."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._load()
+
+    def _load(self):
+        index_path = os.path.join(self.path, "index.json")
+        mtime = os.path.getmtime(index_path)
+        with open(index_path) as fh:
+            index = json.load(fh)
+        values = np.load(os.path.join(self.path, "grid.npy"), mmap_mode="r")
+
+        self.bbox = tuple(index["bbox"])
+        self.step = float(index["step"])
+        self.shape = tuple(index["shape"])  # (n_lat, n_lon)
+        self.features = [tuple(f) for f in index["features"]]
+        self.windows = {(w["start"], w["end"]): i for i, w in enumerate(index["windows"])}
+        self.values = values
+        self._mtime = mtime
+        logging.info("Feature grid %s: %d windows, %dx%d nodes, built %s",
+                     self.path, len(self.windows), *self.shape, index.get("built_at"))
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < FEATURE_GRID_RELOAD_S:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                if os.path.getmtime(os.path.join(self.path, "index.json")) != self._mtime:
+                    self._load()
+            except Exception as e:
+                logging.warning("Feature grid reload failed, keeping the loaded grid: %s", e)
+
+    def covers(self, lat: float, lon: float) -> bool:
+        west, south, east, north = self.bbox
+        return south <= lat <= north and west <= lon <= east
+
+    def lookup(self, lat: float, lon: float, start: str, end: str) -> Optional[Dict[str, Dict[str, float]]]:
+        """
+        {"climate": {...}, "drought": {...}} interpolated at (lat, lon) for the
+        window [start, end], or None if the grid cannot answer.
+        """
+        self._maybe_reload()
+        w = self.windows.get((start, end))
+        if w is None or not self.covers(lat, lon):
+            return None
+
+        west, south, _, _ = self.bbox
+        n_lat, n_lon = self.shape
+        fy = (lat - south) / self.step
+        fx = (lon - west) / self.step
+        i = min(max(int(np.floor(fy)), 0), n_lat - 2)
+        j = min(max(int(np.floor(fx)), 0), n_lon - 2)
+        ty = min(max(fy - i, 0.0), 1.0)
+        tx = min(max(fx - j, 0.0), 1.0)
+
+        corners = np.asarray(self.values[w, i:i + 2, j:j + 2, :], dtype=float)
+        weights = np.array([[(1 - ty) * (1 - tx), (1 - ty) * tx],
+                            [ty * (1 - tx), ty * tx]])[:, :, None]
+        # nodes whose build fetch failed are NaN; renormalize over the rest
+        valid = ~np.isnan(corners)
+        total = (weights * valid).sum(axis=(0, 1))
+        if (total <= 0).any():
+            return None
+        interpolated = (np.where(valid, corners, 0.0) * weights).sum(axis=(0, 1)) / total
+
+        groups: Dict[str, Dict[str, float]] = {"climate": {}, "drought": {}}
+        for (group, name), value in zip(self.features, interpolated):
+            groups[group][name] = float(value)
+        return groups
+
+
+def grid_from_env() -> Optional[FeatureGrid]:
+    path = os.environ.get("FEATURE_GRID_PATH")
+    if not path:
+        return None
+    try:
+        return FeatureGrid(path)
+    except Exception as e:
+        logging.warning("Feature grid at %s not loaded: %s", path, e)
+        return None
+
+
+feature_grid = grid_from_env()
+
+
+# ---------- offline build ----------
+
+def window_dates(end: datetime.date, days: int) -> Tuple[str, str]:
+    """
+    (start, end) ISO dates of the `days` window ending on `end`: start is
+    `days` before end, the same span as trailing `windows` and the
+    watchlist. POWER then covers days + 1 days, CHIRPS (end exclusive) days.
+    """
+    return (end - datetime.timedelta(days=days)).isoformat(), end.isoformat()
+
+
+def build_grid(out_dir: str, bbox=DEFAULT_GRID_BBOX, step: float = DEFAULT_GRID_STEP,
+               windows: Sequence[int] = DEFAULT_WINDOWS, end: Optional[datetime.date] = None):
+    """
+    Evaluate climate_features / drought_features on every grid node for each
+    window ending on `end` (default: yesterday, UTC) and write the grid to
+    out_dir. Upstream data is fetched once for the longest window: one POWER
+    call per POWER cell, CHIRPS for all nodes via batched sampling.
+    """
+    # imported here to avoid a cycle: fetch_hazard_data consults this module
+    from utils.fetch_hazard_data import (
+        climate_features, drought_features, load_chirps_points, load_power)
+
+    if end is None:
+        end = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=1)
+    west, south, east, north = bbox
+    n_lat = int(round((north - south) / step)) + 1
+    n_lon = int(round((east - west) / step)) + 1
+    if n_lat < 2 or n_lon < 2:
+        raise ValueError("grid needs at least 2 nodes per axis; use a smaller step")
+    lats = south + step * np.arange(n_lat)
+    lons = west + step * np.arange(n_lon)
+    nodes = [(float(lat), float(lon)) for lat in lats for lon in lons]
+    first, last = window_dates(end, max(windows))
+    t0 = time.monotonic()
+
+    # POWER: one fetch per distinct cell
+    power_cells: Dict[str, List[int]] = {}
+    for k, (lat, lon) in enumerate(nodes):
+        power_cells.setdefault(grid_cell("power", lat, lon), []).append(k)
+    power_frames: Dict[int, Any] = {}
+    with ThreadPoolExecutor(max_workers=GRID_BUILD_WORKERS) as pool:
+        futures = {pool.submit(load_power, *nodes[idx[0]], first, last): idx
+                   for idx in power_cells.values()}
+        for fut, idx in futures.items():
+            try:
+                df = fut.result()
+            except Exception as e:
+                logging.warning("POWER fetch failed for %s: %s", nodes[idx[0]], e)
+                continue
+            for k in idx:
+                power_frames[k] = df
+
+    # CHIRPS: end is exclusive, exactly like a live request for [first, last]
+    try:
+        chirps_frames = dict(enumerate(load_chirps_points(nodes, first, last)))
+    except Exception as e:
+        logging.warning("CHIRPS fetch failed: %s", e)
+        chirps_frames = {}
+    logging.info("Fetched %d POWER cells and %d CHIRPS nodes in %.1fs",
+                 len(power_cells), len(chirps_frames), time.monotonic() - t0)
+
+    values = np.full((len(windows), n_lat, n_lon, len(GRID_FEATURES)), np.nan, dtype=np.float32)
+    window_index = []
+    for w, days in enumerate(windows):
+        start, stop = window_dates(end, days)
+        window_index.append({"days": days, "start": start, "end": stop})
+        for k in range(len(nodes)):
+            features: Dict[str, Dict[str, float]] = {}
+            if k in power_frames:
+                df = power_frames[k]
+                features["climate"] = climate_features(df[(df.index >= start) & (df.index <= stop)])
+            if k in chirps_frames:
+                df = chirps_frames[k]
+                features["drought"] = drought_features(df[(df.index >= start) & (df.index < stop)])
+            i, j = divmod(k, n_lon)
+            for f, (group, name) in enumerate(GRID_FEATURES):
+                if group in features:
+                    values[w, i, j, f] = features[group][name]
+
+    os.makedirs(out_dir, exist_ok=True)
+    # grid first, index last: readers reload on the index mtime
+    tmp = os.path.join(out_dir, "grid.npy.tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, values)
+    os.replace(tmp, os.path.join(out_dir, "grid.npy"))
+    tmp = os.path.join(out_dir, "index.json.tmp")
+    with open(tmp, "w") as fh:
+        json.dump({
+            "bbox": list(bbox),
+            "step": step,
+            "shape": [n_lat, n_lon],
+            "windows": window_index,
+            "features": GRID_FEATURES,
+            "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }, fh, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "index.json"))
+    logging.info("Feature grid written to %s in %.1fs", out_dir, time.monotonic() - t0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Precompute the hazard feature grid")
+    parser.add_argument("--out", default=os.environ.get("FEATURE_GRID_PATH"), required=False)
+    parser.add_argument("--bbox", default=",".join(str(v) for v in DEFAULT_GRID_BBOX),
+                        help="west,south,east,north")
+    parser.add_argument("--step", type=float, default=DEFAULT_GRID_STEP, help="node spacing (deg)")
+    parser.add_argument("--windows", default=",".join(str(d) for d in DEFAULT_WINDOWS),
+                        help="window lengths in days")
+    parser.add_argument("--end", type=datetime.date.fromisoformat,
+                        help="last day of every window (default: yesterday, UTC)")
+    args = parser.parse_args()
+    if not args.out:
+        parser.error("--out (or FEATURE_GRID_PATH) is required")
+
+    from utils.fetch_hazard_data import ensure_ee
+
+    ensure_ee()
+    build_grid(args.out, bbox=tuple(float(v) for v in args.bbox.split(",")), step=args.step,
+               windows=[int(d) for d in args.windows.split(",")], end=args.end)
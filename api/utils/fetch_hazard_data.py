@@ -1,14 +1,31 @@
 from dotenv import load_dotenv
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 import os
 import io
+import contextlib
+import contextvars
 import datetime
-import requests
+import hashlib
+import importlib
+import math
+import numpy as np
 import pandas as pd
-import ee
-from google.oauth2 import service_account
 import logging
 import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.cache import hazard_cache, make_key, snap_bbox, snap_point, source_ttl
+from utils.climatology import CLIMATOLOGY_WAIT_S, BaselinePending, climatology
+from utils.feature_grid import feature_grid, window_dates
+from utils.fire_fusion import fuse, fused_fire_stats
+from utils.firms_index import hotspot_tables
+from utils.geometry import bbox_area_km2, points_in_polygon, polygon_area_km2
+from utils.http_client import fetch_deadline, http_get
+from utils.metrics import EE_ROUND_TRIPS, FETCH_ERRORS, count, timed
+from utils.singleflight import SingleFlight
+from utils.timeseries_store import daily_store, grid_cell
 
 logging.basicConfig(level=logging.INFO)
 
@@ -26,21 +43,75 @@ FEATURE_UNITS: Dict[str, Dict[str, str]] = {
         "t2m_max": "degC",
         "precip_sum": "mm",
         "wind_mean": "m/s",
+        # anomalies=True only: vs the same window in the reference years
+        "t2m_mean_baseline": "degC",
+        "t2m_mean_anomaly": "degC",
+        "t2m_mean_percentile": "%",
+        "precip_sum_baseline": "mm",
+        "precip_sum_anomaly": "mm",
+        "precip_sum_anomaly_pct": "%",
+        "precip_sum_percentile": "%",
     },
     "drought": {
         "chirps_precip_sum": "mm",
         "chirps_precip_mean": "mm/day",
+        # area mode only: mean of the daily spatial percentiles over the AOI
+        "chirps_precip_p10_mean": "mm/day",
+        "chirps_precip_p90_mean": "mm/day",
+        # anomalies=True only
+        "chirps_precip_sum_baseline": "mm",
+        "chirps_precip_sum_anomaly": "mm",
+        "chirps_precip_sum_anomaly_pct": "%",
+        "chirps_precip_sum_percentile": "%",
     },
     "fire": {
         "fires_count": "count",
         "fires_mean_brightness": "Kelvin",
         "fires_mean_frp": "MW",
+        # several firms_sources only: detections fused into fires
+        "fires_unique": "count",
+        "fires_multi_sensor": "count",
+        "fires_frp_sum": "MW",
+        "fires_frp_max": "MW",
     },
 }
 
+# Upstream source behind each feature group
+GROUP_SOURCES: Dict[str, str] = {"climate": "power", "drought": "chirps", "fire": "firms"}
+
 SERVICE_ACCOUNT_PROJECT = "hackathon-demo-480416"
 
 
+class _LazyModule:
+    """
+    Module imported on first attribute access. `ee` (and the google-auth
+    stack it pulls in) adds about half a second to every cold start, and
+    only CHIRPS needs it.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self.import_s: Optional[float] = None
+
+    def load(self):
+        if self._module is None:
+            t0 = time.perf_counter()
+            module = importlib.import_module(self._name)
+            self.import_s = time.perf_counter() - t0
+            logging.info("Imported %s in %.2fs", self._name, self.import_s)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+
+ee = _LazyModule("ee")
+
+
 def init_ee():
     """
     Initialize Earth Engine.
@@ -50,6 +121,8 @@ def init_ee():
     2) Else, if EE_KEY_PATH env var is set, load JSON from that file.
     3) Else, fall back to ./utils/keys or ./keys for local development.
     """
+    from google.oauth2 import service_account
+
     # 1) Cloud Run: EE_JSON secret as env var
     ee_json = os.environ.get("EE_JSON")
     if ee_json:
@@ -109,15 +182,52 @@ def init_ee():
     raise RuntimeError(
         "Could not find Earth Engine credentials (EE_JSON, EE_KEY_PATH, or local key file).")
 
+
+# Earth Engine is initialized once per process, either in the background at
+# startup or by the first CHIRPS fetch, whichever comes first.
+_ee_lock = threading.Lock()
+_ee_state: Dict[str, Any] = {"status": "pending", "error": None, "import_s": None, "init_s": None}
+
+
+def ensure_ee():
+    """Initialize Earth Engine if needed (thread-safe). Raises if it fails."""
+    if _ee_state["status"] == "ready":
+        return
+    with _ee_lock:
+        if _ee_state["status"] == "ready":
+            return
+        _ee_state["status"] = "initializing"
+        t0 = time.perf_counter()
+        try:
+            if isinstance(ee, _LazyModule):
+                ee.load()
+                _ee_state["import_s"] = round(ee.import_s, 3)
+            init_ee()
+        except Exception as e:
+            # the next CHIRPS fetch retries
+            _ee_state.update(status="failed", error=str(e))
+            raise
+        _ee_state.update(status="ready", error=None, init_s=round(time.perf_counter() - t0, 3))
+        logging.info("Earth Engine ready in %.2fs", _ee_state["init_s"])
+
+
+def ee_status() -> Dict[str, Any]:
+    """status ('pending' / 'initializing' / 'ready' / 'failed'), error, timings."""
+    return dict(_ee_state)
+
 # ================================================================
 # 1. NASA POWER – climate / met data for a point
 # ================================================================
 
 
+# request PRECTOT, may get PRECTOTCORR
+POWER_PARAMETERS = ["T2M", "PRECTOT", "WS10M"]
+
+
+@timed("power")
 def fetch_nasa_power(lat, lon, start_date, end_date, parameters=None, community="AG"):
     if parameters is None:
-        # request PRECTOT, may get PRECTOTCORR
-        parameters = ["T2M", "PRECTOT", "WS10M"]
+        parameters = POWER_PARAMETERS
 
     base_url = "https://power.larc.nasa.gov/api/temporal/daily/point"
     params = {
@@ -130,8 +240,7 @@ def fetch_nasa_power(lat, lon, start_date, end_date, parameters=None, community=
         "format": "JSON",
     }
 
-    resp = requests.get(base_url, params=params)
-    resp.raise_for_status()
+    resp = http_get(base_url, params=params)
     data = resp.json()
 
     df = pd.DataFrame(data["properties"]["parameter"])
@@ -151,52 +260,322 @@ def fetch_nasa_power(lat, lon, start_date, end_date, parameters=None, community=
 
     return df
 
+
+@timed("power_regional")
+def fetch_nasa_power_regional(bbox, start_date, end_date, parameter, community="AG"):
+    """
+    One POWER parameter for every grid node inside bbox, in one call.
+
+    bbox       : (west, south, east, north); the regional endpoint accepts
+                 2 to 10 degrees per side
+    start_date : 'YYYYMMDD', as fetch_nasa_power
+    Returns (nodes, labels, values): [(lat, lon)] per node, the 'YYYYMMDD'
+    day labels and a float [node, day] array. PRECTOT answered as
+    PRECTOTCORR is returned under the requested name.
+    """
+    west, south, east, north = bbox
+    resp = http_get("https://power.larc.nasa.gov/api/temporal/daily/regional", params={
+        "latitude-min": south,
+        "latitude-max": north,
+        "longitude-min": west,
+        "longitude-max": east,
+        "start": start_date,
+        "end": end_date,
+        "parameters": parameter,
+        "community": community,
+        "format": "JSON",
+    })
+    features = resp.json().get("features", [])
+
+    nodes: List[Tuple[float, float]] = []
+    rows: List[List[float]] = []
+    labels: List[str] = []
+    for feat in features:
+        lon, lat = feat["geometry"]["coordinates"][:2]
+        by_name = feat["properties"]["parameter"]
+        series = by_name.get(parameter) or next(iter(by_name.values()), {})
+        if not labels:
+            labels = sorted(series)
+        nodes.append((float(lat), float(lon)))
+        rows.append([series.get(d, float("nan")) for d in labels])
+    values = np.asarray(rows, dtype=float).reshape(len(nodes), len(labels))
+    return nodes, labels, values
+
 # ================================================================
 # 2. CHIRPS via Earth Engine – rainfall for a point
 # ================================================================
 
 
-def fetch_chirps_rainfall(lat, lon, start, end):
+def ee_get_info(obj, source: str = "chirps"):
+    """obj.getInfo(), counted as one blocking Earth Engine round trip."""
+    EE_ROUND_TRIPS.inc(source=source)
+    count("ee_calls")
+    return obj.getInfo()
+
+
+CHIRPS_COLLECTION = "UCSB-CHG/CHIRPS/DAILY"
+CHIRPS_SCALE_M = 5566  # native CHIRPS pixel size (~0.05 deg)
+
+# getRegion returns one row per image; keep each request well under the
+# Earth Engine 1M-element limit and the interactive request timeout.
+CHIRPS_CHUNK_DAYS = int(os.environ.get("CHIRPS_CHUNK_DAYS", "3650"))
+
+
+def _date_chunks(start, end, chunk_days):
     """
-    Fetch daily precipitation (mm/day) for a point using CHIRPS via Earth Engine.
+    Split the half-open range [start, end) ('YYYY-MM-DD') into consecutive
+    sub-ranges of at most chunk_days days.
+    """
+    cur = datetime.date.fromisoformat(start)
+    stop = datetime.date.fromisoformat(end)
+    step = datetime.timedelta(days=max(int(chunk_days), 1))
+    chunks = []
+    while cur < stop:
+        nxt = min(cur + step, stop)
+        chunks.append((cur.isoformat(), nxt.isoformat()))
+        cur = nxt
+    return chunks
 
-    start, end : 'YYYY-MM-DD'
-    Returns a pandas DataFrame with index=date, column=precip_mm.
+
+def _chirps_region_chunk(pt, start, end):
+    """
+    Pull the (date, precip) series for one chunk in a single getRegion call.
+    """
+    collection = (
+        ee.ImageCollection(CHIRPS_COLLECTION)
+        .filterDate(start, end)
+        .select("precipitation")
+    )
+    rows = ee_get_info(collection.getRegion(pt, CHIRPS_SCALE_M))
+    if not rows or len(rows) < 2:
+        return []
+
+    header = rows[0]
+    t_idx = header.index("time")
+    v_idx = header.index("precipitation")
+    return [(r[t_idx], r[v_idx]) for r in rows[1:] if r[v_idx] is not None]
+
+
+def _fetch_chirps_per_image(pt, start, end):
+    """
+    Legacy extraction: two getInfo() round trips per daily image.
+    Kept for debugging / parity checks against the region mode.
     """
-    pt = ee.Geometry.Point([lon, lat])
     collection = (
-        ee.ImageCollection("UCSB-CHG/CHIRPS/DAILY")
+        ee.ImageCollection(CHIRPS_COLLECTION)
         .filterDate(start, end)
         .select("precipitation")
     )
 
-    # Convert each image to (date, precip) and pull to client.
-    size = collection.size().getInfo()
+    size = ee_get_info(collection.size())
     if size is None or size <= 0:
-        # No imagery in this date range; return empty frame
-        return pd.DataFrame(columns=["precip_mm"])
+        return []
 
     imgs_list = collection.toList(size)
-    n = size
 
     records = []
-    for i in range(n):
+    for i in range(size):
         img = ee.Image(imgs_list.get(i))
-        date_str = ee.Date(img.get("system:time_start")
-                           ).format("YYYY-MM-dd").getInfo()
+        date_str = ee_get_info(
+            ee.Date(img.get("system:time_start")).format("YYYY-MM-dd"))
         # sample() with default scale ~5km; fine for CHIRPS
-        val = img.sample(pt).first().get("precipitation").getInfo()
+        val = ee_get_info(img.sample(pt).first().get("precipitation"))
         records.append((date_str, val))
+    return records
+
+
+@timed("chirps")
+def fetch_chirps_rainfall(lat, lon, start, end, mode="region"):
+    """
+    Fetch daily precipitation (mm/day) for a point using CHIRPS via Earth Engine.
+
+    start, end : 'YYYY-MM-DD'
+    mode       : 'region'    -> whole series via getRegion, one EE request per
+                                CHIRPS_CHUNK_DAYS chunk (default)
+                 'per_image' -> legacy per-image getInfo loop
+    Returns a pandas DataFrame with index=date, column=precip_mm.
+    """
+    ensure_ee()
+    pt = ee.Geometry.Point([lon, lat])
+
+    if mode == "per_image":
+        records = _fetch_chirps_per_image(pt, start, end)
+        if not records:
+            return pd.DataFrame(columns=["precip_mm"])
+        df = pd.DataFrame(records, columns=["date", "precip_mm"])
+        df["date"] = pd.to_datetime(df["date"])
+        return df.set_index("date").sort_index()
+
+    if mode != "region":
+        raise ValueError(f"Unknown CHIRPS extraction mode: {mode}")
+
+    records = []
+    for chunk_start, chunk_end in _date_chunks(start, end, CHIRPS_CHUNK_DAYS):
+        records.extend(_chirps_region_chunk(pt, chunk_start, chunk_end))
 
     if not records:
+        # No imagery in this date range; return empty frame
         return pd.DataFrame(columns=["precip_mm"])
 
-    df = pd.DataFrame(records, columns=["date", "precip_mm"])
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.set_index("date").sort_index()
+    df = pd.DataFrame(records, columns=["time", "precip_mm"])
+    # getRegion reports system:time_start in epoch milliseconds
+    df["date"] = pd.to_datetime(df["time"], unit="ms").dt.normalize()
+    df = df.drop(columns="time").set_index("date").sort_index()
+    df = df[~df.index.duplicated(keep="first")]
+    df["precip_mm"] = df["precip_mm"].astype(float)
     return df
 
 
+# ---------- area mode: reduce over the AOI instead of sampling one point ----------
+
+# Area reductions are heavier per image than point sampling, so chunk smaller
+CHIRPS_AREA_CHUNK_DAYS = int(os.environ.get("CHIRPS_AREA_CHUNK_DAYS", "366"))
+# Upper bound on pixels touched per image reduction; larger AOIs are reduced
+# at a coarser scale instead of hitting EE memory / time limits
+CHIRPS_AREA_MAX_PIXELS = float(os.environ.get("CHIRPS_AREA_MAX_PIXELS", "250000"))
+
+
+def chirps_area_params(area_km2: float) -> Tuple[float, int]:
+    """
+    (scale_m, tileScale) for reducing CHIRPS over an AOI of area_km2: native
+    resolution until the pixel budget is exceeded, then coarser; tileScale
+    grows with the native pixel count so big regions are split into tiles.
+    """
+    native_pixels = area_km2 * 1e6 / CHIRPS_SCALE_M ** 2
+    scale = CHIRPS_SCALE_M
+    if native_pixels > CHIRPS_AREA_MAX_PIXELS:
+        scale = math.sqrt(area_km2 * 1e6 / CHIRPS_AREA_MAX_PIXELS)
+    if native_pixels < 1e4:
+        tile_scale = 1
+    elif native_pixels < 1e5:
+        tile_scale = 2
+    elif native_pixels < 1e6:
+        tile_scale = 4
+    else:
+        tile_scale = 8
+    return scale, tile_scale
+
+
+@timed("chirps_area")
+def fetch_chirps_area(bbox, start, end, polygon=None, percentiles=(10, 90)):
+    """
+    Daily CHIRPS statistics reduced over an area instead of one point.
+
+    bbox        : (west, south, east, north)
+    polygon     : optional [[lon, lat], ...]; reduces over the polygon when given
+    start, end  : 'YYYY-MM-DD' (end exclusive)
+    percentiles : spatial percentiles computed per day alongside the mean
+
+    Returns a DataFrame with index=date and columns precip_mm (area mean) plus
+    precip_p<N> per percentile. One Earth Engine request per
+    CHIRPS_AREA_CHUNK_DAYS chunk.
+    """
+    ensure_ee()
+    if polygon is not None:
+        geom = ee.Geometry.Polygon([polygon])
+    else:
+        geom = ee.Geometry.Rectangle(list(bbox))
+    area_km2 = polygon_area_km2(polygon) if polygon is not None else bbox_area_km2(bbox)
+    scale, tile_scale = chirps_area_params(area_km2)
+
+    reducer = ee.Reducer.mean()
+    if percentiles:
+        reducer = reducer.combine(
+            ee.Reducer.percentile(list(percentiles)), sharedInputs=True)
+    columns = ["precip_mm"] + [f"precip_p{p}" for p in percentiles]
+    keys = ["precipitation_mean"] + [f"precipitation_p{p}" for p in percentiles]
+
+    def _reduce(img):
+        stats = img.reduceRegion(
+            reducer=reducer,
+            geometry=geom,
+            scale=scale,
+            tileScale=tile_scale,
+            maxPixels=1e10,
+        )
+        return ee.Feature(None, stats).set("time", img.get("system:time_start"))
+
+    records = []
+    for chunk_start, chunk_end in _date_chunks(start, end, CHIRPS_AREA_CHUNK_DAYS):
+        collection = (
+            ee.ImageCollection(CHIRPS_COLLECTION)
+            .filterDate(chunk_start, chunk_end)
+            .select("precipitation")
+        )
+        table = ee.FeatureCollection(collection.map(_reduce)).reduceColumns(
+            ee.Reducer.toList(len(keys) + 1), ["time"] + keys)
+        rows = ee_get_info(table.get("list"), "chirps_area")
+        records.extend(rows or [])
+
+    if not records:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.DataFrame(records, columns=["time"] + columns)
+    df["date"] = pd.to_datetime(df["time"], unit="ms").dt.normalize()
+    df = df.drop(columns="time").set_index("date").sort_index()
+    return df[~df.index.duplicated(keep="first")].astype(float)
+
+
+# Upper bound on (points x days) sampled per Earth Engine request in batch mode
+CHIRPS_BATCH_MAX_VALUES = int(os.environ.get("CHIRPS_BATCH_MAX_VALUES", "500000"))
+
+
+@timed("chirps_batch")
+def fetch_chirps_points(points, start, end):
+    """
+    Fetch daily CHIRPS precipitation for many points at once.
+
+    points     : list of (lat, lon)
+    start, end : 'YYYY-MM-DD' (end exclusive, as in fetch_chirps_rainfall)
+    Returns a list of DataFrames (index=date, column=precip_mm) aligned with
+    `points`. Each date chunk is one sampleRegions request over all points.
+    """
+    if not points:
+        return []
+
+    ensure_ee()
+    fc = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([lon, lat]), {"idx": i})
+        for i, (lat, lon) in enumerate(points)
+    ])
+    chunk_days = max(1, min(CHIRPS_CHUNK_DAYS, CHIRPS_BATCH_MAX_VALUES // len(points)))
+
+    series: List[Dict[str, float]] = [{} for _ in points]
+    for chunk_start, chunk_end in _date_chunks(start, end, chunk_days):
+        collection = (
+            ee.ImageCollection(CHIRPS_COLLECTION)
+            .filterDate(chunk_start, chunk_end)
+            .select("precipitation")
+        )
+        # one band per day, named '<YYYYMMDD>_precipitation'; guard empty
+        # collections server-side so this stays a single round trip
+        samples = ee_get_info(ee.Algorithms.If(
+            collection.size().gt(0),
+            collection.toBands().sampleRegions(
+                collection=fc, properties=["idx"], scale=CHIRPS_SCALE_M, geometries=False),
+            None,
+        ), "chirps_batch")
+        if not samples:
+            continue
+        for feat in samples.get("features", []):
+            props = dict(feat["properties"])
+            i = int(props.pop("idx"))
+            for band, val in props.items():
+                if val is not None:
+                    series[i][band[:8]] = val
+
+    frames = []
+    for values in series:
+        if not values:
+            frames.append(pd.DataFrame(columns=["precip_mm"]))
+            continue
+        df = pd.DataFrame({"precip_mm": pd.Series(values, dtype=float)})
+        df.index = pd.to_datetime(df.index, format="%Y%m%d")
+        df.index.name = "date"
+        frames.append(df.sort_index())
+    return frames
+
+
 def _safe_sum(series) -> float:
     if series is None or len(series) == 0:
         return 0.0
@@ -219,6 +598,7 @@ def _safe_mean(series) -> float:
 # 3. FIRMS – fire hotspots via official API (needs MAP_KEY)
 # ================================================================
 
+@timed("firms")
 def fetch_firms_area(bbox, source="VIIRS_SNPP_NRT", day_range=7):
     """
     Fetch FIRMS fire hotspots for an area and time window.
@@ -239,13 +619,13 @@ def fetch_firms_area(bbox, source="VIIRS_SNPP_NRT", day_range=7):
 
     url = f"https://firms.modaps.eosdis.nasa.gov/api/area/csv/{map_key}/{source}/{area_coord}/{day_range}"
 
-    resp = requests.get(url)
-    resp.raise_for_status()
+    resp = http_get(url)
 
     df = pd.read_csv(io.StringIO(resp.text))
     return df
 
 
+@timed("firms_country")
 def fetch_firms_country(country_code="AZE", source="VIIRS_SNPP_NRT", day_range=7):
     """
     Alternative: fetch by country code instead of bbox.
@@ -257,8 +637,7 @@ def fetch_firms_country(country_code="AZE", source="VIIRS_SNPP_NRT", day_range=7
         raise RuntimeError("Set FIRMS_MAP_KEY env var to your FIRMS MAP_KEY")
 
     url = f"https://firms.modaps.eosdis.nasa.gov/api/country/csv/{map_key}/{source}/{country_code}/{day_range}"
-    resp = requests.get(url)
-    resp.raise_for_status()
+    resp = http_get(url)
     df = pd.read_csv(io.StringIO(resp.text))
     return df
 
@@ -274,7 +653,7 @@ if __name__ == "__main__":
         lon=49.8671,
         start_date="20220101",
         end_date="20220110",
-        parameters=["T2M", "PRECTOT", "WS10M"],
+        parameters=POWER_PARAMETERS,
         community="AG",
     )
     logging.info("NASA POWER sample:\n%s\n", df_power.head())
@@ -304,64 +683,802 @@ if __name__ == "__main__":
         logging.info("FIRMS fetch failed:", e)
 
 
-def build_hazard_features(
+# ================================================================
+# 5. CACHED SOURCE LOADERS
+# ================================================================
+# Thin wrappers used by the request pipeline. Locations are snapped to the
+# cache grid before fetching, so a cached value is exactly what a fresh fetch
+# for that key would return. See utils/cache.py for TTLs and backends.
+# Below the cache, the optional per-day store (utils/timeseries_store.py)
+# limits upstream POWER/CHIRPS fetches to the days not seen before.
+# Concurrent misses for the same key share one fetch (utils/singleflight.py),
+# so e.g. a /hazards/raw and a /compute for one AOI wait on one POWER call.
+
+_inflight = SingleFlight()
+
+
+# Cache warming (utils/watchlist.py): inside `with warming(ttls)`, loads of
+# the sources named in ttls skip the cache read and re-fetch, once per key
+# per block, storing the result for at least ttls[source] seconds. The
+# setting is a context variable, so it follows the fan-out into the source
+# executor threads.
+
+
+class _Warming:
+    def __init__(self, ttls: Dict[str, float]):
+        self.ttls = ttls
+        self._refreshed: set = set()
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> Optional[float]:
+        """TTL to store key with if this block should re-fetch it, else None."""
+        ttl = self.ttls.get(key.split("|", 1)[0])
+        if ttl is None:
+            return None
+        with self._lock:
+            if key in self._refreshed:
+                return None
+            self._refreshed.add(key)
+        return ttl
+
+
+_warming: contextvars.ContextVar[Optional[_Warming]] = contextvars.ContextVar(
+    "warming", default=None)
+
+
+@contextlib.contextmanager
+def warming(ttls: Dict[str, float]):
+    token = _warming.set(_Warming(ttls))
+    try:
+        yield
+    finally:
+        _warming.reset(token)
+
+
+def _load_through(key: str, ttl: float, fetch: Callable[[], Any]) -> Any:
+    """Cached value for key; on a miss, one fetch however many callers wait."""
+    state = _warming.get()
+    refresh_ttl = state.claim(key) if state is not None else None
+    value = hazard_cache.get(key) if refresh_ttl is None else None
+    if value is None:
+        ttl = max(ttl, refresh_ttl or 0.0)
+
+        def fetch_and_store():
+            fetched = fetch()
+            hazard_cache.set(key, fetched, ttl)
+            return fetched
+
+        value = _inflight.do(key, fetch_and_store)
+    return value
+
+
+def series_cache_key(source: str, start: str, end: str, lat: Optional[float] = None,
+                     lon: Optional[float] = None, bbox=None, polygon=None) -> str:
+    """Result-cache key of load_power / load_chirps ('chirps') / load_chirps_area ('chirps_area')."""
+    if source == "chirps_area":
+        return make_key("chirps_area", *snap_bbox(bbox), _polygon_digest(polygon), start, end)
+    return make_key(source, *snap_point(lat, lon), start, end)
+
+
+def _fetch_power_days(lat: float, lon: float, first: str, last: str) -> pd.DataFrame:
+    """POWER for the inclusive day range [first, last] ('YYYY-MM-DD')."""
+    return fetch_nasa_power(
+        lat=lat,
+        lon=lon,
+        start_date=first.replace("-", ""),
+        end_date=last.replace("-", ""),
+        parameters=POWER_PARAMETERS,
+        community="AG",
+    )
+
+
+def _fetch_chirps_days(lat: float, lon: float, first: str, last: str) -> pd.DataFrame:
+    """CHIRPS for the inclusive day range [first, last] ('YYYY-MM-DD')."""
+    stop = datetime.date.fromisoformat(last) + datetime.timedelta(days=1)
+    return fetch_chirps_rainfall(lat=lat, lon=lon, start=first, end=stop.isoformat())
+
+
+def load_power(lat: float, lon: float, start: str, end: str) -> pd.DataFrame:
+    """NASA POWER T2M/PRECTOT/WS10M for [start, end] ('YYYY-MM-DD'), cached."""
+    key = series_cache_key("power", start, end, lat, lon)
+    lat, lon = snap_point(lat, lon)
+
+    def fetch():
+        if daily_store is not None:
+            return daily_store.fetch_range(
+                "power", grid_cell("power", lat, lon), start, end,
+                lambda a, b: _fetch_power_days(lat, lon, a, b))
+        return _fetch_power_days(lat, lon, start, end)
+
+    return _load_through(key, source_ttl("power", end), fetch).copy()
+
+
+def load_chirps(lat: float, lon: float, start: str, end: str) -> pd.DataFrame:
+    """CHIRPS daily precip_mm for [start, end) ('YYYY-MM-DD'), cached."""
+    key = series_cache_key("chirps", start, end, lat, lon)
+    lat, lon = snap_point(lat, lon)
+
+    def fetch():
+        if daily_store is not None:
+            # CHIRPS 'end' is exclusive (filterDate); the store works on
+            # inclusive day ranges
+            last = (datetime.date.fromisoformat(end) - datetime.timedelta(days=1)).isoformat()
+            return daily_store.fetch_range(
+                "chirps", grid_cell("chirps", lat, lon), start, last,
+                lambda a, b: _fetch_chirps_days(lat, lon, a, b),
+                index_name="date", empty_columns=["precip_mm"])
+        return fetch_chirps_rainfall(lat=lat, lon=lon, start=start, end=end)
+
+    return _load_through(key, source_ttl("chirps", end), fetch).copy()
+
+
+def _polygon_digest(polygon) -> str:
+    if polygon is None:
+        return "-"
+    rounded = [[round(lon, 5), round(lat, 5)] for lon, lat in polygon]
+    return hashlib.sha1(json.dumps(rounded).encode()).hexdigest()[:16]
+
+
+def load_chirps_area(bbox, start: str, end: str, polygon=None) -> pd.DataFrame:
+    """CHIRPS area statistics (see fetch_chirps_area) for [start, end), cached."""
+    snapped = snap_bbox(bbox)
+    key = series_cache_key("chirps_area", start, end, bbox=bbox, polygon=polygon)
+    # polygons are reduced exactly; plain bboxes use the snapped box
+    df = _load_through(key, source_ttl("chirps", end), lambda: fetch_chirps_area(
+        snapped if polygon is None else bbox, start, end, polygon=polygon))
+    return df.copy()
+
+
+def load_chirps_points(points, start: str, end: str) -> List[pd.DataFrame]:
+    """
+    Batch variant of load_chirps: cached points are served from the cache,
+    the rest are fetched together in one fetch_chirps_points call.
+    """
+    snapped = [snap_point(lat, lon) for lat, lon in points]
+    keys = [series_cache_key("chirps", start, end, lat, lon) for lat, lon in snapped]
+    frames: List[Optional[pd.DataFrame]] = [hazard_cache.get(k) for k in keys]
+
+    missing = [i for i, df in enumerate(frames) if df is None]
+    if missing:
+        fetched = fetch_chirps_points([snapped[i] for i in missing], start, end)
+        ttl = source_ttl("chirps", end)
+        for i, df in zip(missing, fetched):
+            hazard_cache.set(keys[i], df, ttl)
+            frames[i] = df
+    return [df.copy() for df in frames]
+
+
+def clip_fires_to_bbox(df: pd.DataFrame, bbox) -> pd.DataFrame:
+    if df.empty or "latitude" not in df or "longitude" not in df:
+        return df
+    west, south, east, north = bbox
+    mask = (
+        df["longitude"].between(west, east) & df["latitude"].between(south, north)
+    )
+    return df[mask].reset_index(drop=True)
+
+
+def clip_fires_to_polygon(df: pd.DataFrame, polygon) -> pd.DataFrame:
+    """Hotspots inside polygon ([[lon, lat], ...]); run after clip_fires_to_bbox."""
+    if polygon is None or df.empty or "latitude" not in df or "longitude" not in df:
+        return df
+    mask = points_in_polygon(df["longitude"].to_numpy(dtype=float),
+                             df["latitude"].to_numpy(dtype=float), polygon)
+    return df[mask].reset_index(drop=True)
+
+
+def load_firms(bbox, firms_days: int = 7, source: str = "VIIRS_SNPP_NRT",
+               polygon=None) -> pd.DataFrame:
+    """
+    FIRMS hotspots inside bbox (and polygon, if given) for the last
+    firms_days days, cached. Answered from the in-memory hotspot index when
+    it covers the bbox (see utils/firms_index.py); otherwise the upstream
+    call uses the bbox snapped outward to the cache grid and the result is
+    clipped back to the bbox and polygon. The cache entry is per bbox, so
+    polygons sharing a bbox share the upstream call.
+    """
+    index = hotspot_tables.get(source, bbox, firms_days) if hotspot_tables else None
+    if index is not None:
+        return index.rows(bbox, polygon=polygon, days=firms_days)
+
+    snapped = snap_bbox(bbox)
+    key = make_key("firms", source, *snapped, firms_days)
+    df = _load_through(key, source_ttl("firms"), lambda: fetch_firms_area(
+        snapped, source=source, day_range=firms_days))
+    return clip_fires_to_polygon(clip_fires_to_bbox(df, bbox), polygon)
+
+
+DEFAULT_FIRMS_SOURCE = "VIIRS_SNPP_NRT"
+FIRMS_SOURCES = ["VIIRS_SNPP_NRT", "VIIRS_NOAA20_NRT", "VIIRS_NOAA21_NRT", "MODIS_NRT"]
+
+
+def indexed_fire_features(bbox, firms_days: int = 7, source: str = DEFAULT_FIRMS_SOURCE,
+                          polygon=None) -> Optional[Dict[str, Any]]:
+    """
+    fire_features of load_firms(bbox, ...) straight from the in-memory
+    hotspot index, without building a frame; None if the index cannot
+    answer (disabled, stale, or bbox / firms_days outside it).
+    """
+    index = hotspot_tables.get(source, bbox, firms_days) if hotspot_tables else None
+    if index is None:
+        return None
+    return index.stats(bbox, polygon=polygon, days=firms_days)
+
+# Per-sensor FIRMS fetches of one multi-source load; separate from the source
+# pool, whose workers run load_firms_multi itself.
+_FIRMS_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("FIRMS_FETCH_WORKERS", "8")),
+    thread_name_prefix="hazard-firms",
+)
+
+
+def load_firms_multi(bbox, firms_days: int = 7, sources: Optional[List[str]] = None,
+                     polygon=None, errors: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    FIRMS hotspots from several sensors, fetched in parallel (each through
+    load_firms) and fused: one table with a `source` column and a `fire_id`
+    shared by detections of the same fire (utils/fire_fusion.py). A sensor
+    that fails is left out and recorded in `errors` under firms_<sensor>, so
+    callers can tell the fusion is partial; if all fail the first error is
+    raised.
+    """
+    sources = sources or [DEFAULT_FIRMS_SOURCE]
+    futures = {}
+    for source in sources:
+        ctx = contextvars.copy_context()
+        futures[source] = _FIRMS_EXECUTOR.submit(
+            ctx.run, load_firms, bbox, firms_days=firms_days, source=source, polygon=polygon)
+
+    frames: Dict[str, pd.DataFrame] = {}
+    failures: List[Exception] = []
+    for source, fut in futures.items():
+        try:
+            frames[source] = fut.result()
+        except Exception as e:
+            logging.warning("FIRMS %s fetch failed: %s", source, e)
+            failures.append(e)
+            if errors is not None:
+                errors[f"firms_{source}"] = str(e) or type(e).__name__
+    if failures and not frames:
+        raise failures[0]
+    return fuse(frames)
+
+
+# ================================================================
+# 6. CONCURRENT SOURCE FAN-OUT
+# ================================================================
+
+# Per-source wall-clock budgets (seconds). A source that misses its budget is
+# reported in `errors` and its feature group comes back empty, so a slow FIRMS
+# call does not hold back the climate and drought groups.
+SOURCE_TIMEOUTS: Dict[str, float] = {
+    "power": float(os.environ.get("POWER_TIMEOUT_S", "60")),
+    "chirps": float(os.environ.get("CHIRPS_TIMEOUT_S", "120")),
+    "firms": float(os.environ.get("FIRMS_TIMEOUT_S", "30")),
+}
+
+# Shared pool; requests only wait on their own futures, never on pool shutdown.
+# POWER and FIRMS run under a fetch_deadline at their budget, so their HTTP
+# calls give up about when the caller stops waiting. Earth Engine calls
+# (CHIRPS) cannot be interrupted: a timed-out CHIRPS fetch keeps its worker
+# until EE answers. The default of 16 workers leaves room for that at the
+# default COMPUTE_MAX_CONCURRENCY (4 requests x 3 sources); raise it with
+# the compute concurrency.
+_SOURCE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SOURCE_FETCH_WORKERS", "16")),
+    thread_name_prefix="hazard-source",
+)
+
+
+def _run_until(deadline: float, fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    with fetch_deadline(deadline):
+        return fn(**kwargs)
+
+
+def iter_hazard_sources(
     lat: float,
     lon: float,
     start: str,
     end: str,
     bbox=None,
     firms_days: int = 7,
-) -> Dict[str, Any]:
+    timeouts: Optional[Dict[str, float]] = None,
+    chirps_mode: str = "point",
+    polygon=None,
+    progress: Optional[Callable[[str, str], None]] = None,
+    sources: Optional[List[str]] = None,
+    firms_sources: Optional[List[str]] = None,
+) -> Iterator[Tuple[str, Optional[pd.DataFrame], Optional[str]]]:
     """
-    Build a simple hazard feature dict for one location (and optional bbox for fires).
+    Fetch NASA POWER, CHIRPS and FIRMS concurrently and yield
+    (source, frame, error) for each one as soon as it completes, fails or
+    runs out of its time budget. Exactly one of frame / error is set. A
+    fused FIRMS answer missing some sensors is followed by one error entry
+    per missing sensor, named firms_<sensor>.
 
-    start/end  : 'YYYY-MM-DD'
-    firms_days : how many days back to look for fires
+    start/end : 'YYYY-MM-DD'
+    bbox        : (west, south, east, north); FIRMS is skipped when None
+    timeouts    : per-source overrides of SOURCE_TIMEOUTS
+    chirps_mode : 'point' samples CHIRPS at (lat, lon); 'area' reduces it
+                  over polygon (or bbox) with load_chirps_area
+    polygon     : optional [[lon, lat], ...] inside bbox; FIRMS hotspots are
+                  clipped to it
+    progress    : optional callback(source, state), state in
+                  'running' / 'done' / 'failed'
+    sources     : subset of 'power' / 'chirps' / 'firms' to fetch (default all)
+    firms_sources : FIRMS sensors; more than one fetches them in parallel and
+                  fuses the detections (load_firms_multi)
     """
-    # ---- NASA POWER (climate) ----
-    # convert dates to YYYYMMDD
-    start_power = start.replace("-", "")
-    end_power = end.replace("-", "")
-    df_power = fetch_nasa_power(
-        lat=lat,
-        lon=lon,
-        start_date=start_power,
-        end_date=end_power,
-        parameters=["T2M", "PRECTOT", "WS10M"],
-        community="AG",
-    )
+    budgets = {**SOURCE_TIMEOUTS, **(timeouts or {})}
 
-    # simple climate summaries with safe handling of empty frames
-    climate = {
+    if chirps_mode == "area" and bbox is not None:
+        chirps_task = (load_chirps_area, dict(
+            bbox=bbox, start=start, end=end, polygon=polygon))
+    else:
+        chirps_task = (load_chirps, dict(lat=lat, lon=lon, start=start, end=end))
+    tasks = {
+        "power": (load_power, dict(lat=lat, lon=lon, start=start, end=end)),
+        "chirps": chirps_task,
+    }
+    # sensors missing from a fused FIRMS answer, reported after it
+    firms_errors: Dict[str, str] = {}
+    if bbox is not None and firms_sources and len(firms_sources) > 1:
+        tasks["firms"] = (load_firms_multi, dict(
+            bbox=bbox, firms_days=firms_days, sources=firms_sources, polygon=polygon,
+            errors=firms_errors))
+    elif bbox is not None:
+        tasks["firms"] = (load_firms, dict(
+            bbox=bbox, firms_days=firms_days, polygon=polygon,
+            source=firms_sources[0] if firms_sources else DEFAULT_FIRMS_SOURCE))
+    if sources is not None:
+        tasks = {name: task for name, task in tasks.items() if name in sources}
+
+    def report(name: str, state: str):
+        if progress is not None:
+            try:
+                progress(name, state)
+            except Exception as e:
+                logging.warning("progress callback failed: %s", e)
+
+    t0 = time.monotonic()
+    pending = {}
+    for name, (fn, kwargs) in tasks.items():
+        # copy the context so timing spans land in this request's breakdown
+        ctx = contextvars.copy_context()
+        pending[_SOURCE_EXECUTOR.submit(
+            ctx.run, _run_until, t0 + budgets[name], fn, kwargs)] = name
+        report(name, "running")
+
+    while pending:
+        # all fetches started at t0, so each budget is measured from there
+        elapsed = time.monotonic() - t0
+        next_deadline = min(budgets[name] for name in pending.values()) - elapsed
+        done, _ = wait(pending, timeout=max(next_deadline, 0.0),
+                       return_when=FIRST_COMPLETED)
+
+        for fut in done:
+            name = pending.pop(fut)
+            try:
+                df = fut.result()
+            except Exception as e:
+                logging.warning("%s fetch failed: %s", name, e)
+                FETCH_ERRORS.inc(source=name, kind="error")
+                report(name, "failed")
+                yield name, None, str(e)
+            else:
+                report(name, "done")
+                yield name, df, None
+                if name == "firms":
+                    for sensor, error in firms_errors.items():
+                        FETCH_ERRORS.inc(source=name, kind="error")
+                        yield sensor, None, error
+
+        elapsed = time.monotonic() - t0
+        for fut, name in list(pending.items()):
+            if elapsed >= budgets[name]:
+                del pending[fut]
+                # drops a fetch still queued; a running one stops at its
+                # fetch_deadline (HTTP) or when EE answers
+                fut.cancel()
+                logging.warning("%s fetch timed out after %gs", name, budgets[name])
+                FETCH_ERRORS.inc(source=name, kind="timeout")
+                report(name, "failed")
+                yield name, None, f"timed out after {budgets[name]:g}s"
+
+
+def fetch_hazard_sources(
+    lat: float,
+    lon: float,
+    start: str,
+    end: str,
+    bbox=None,
+    firms_days: int = 7,
+    timeouts: Optional[Dict[str, float]] = None,
+    chirps_mode: str = "point",
+    polygon=None,
+    progress: Optional[Callable[[str, str], None]] = None,
+    sources: Optional[List[str]] = None,
+    firms_sources: Optional[List[str]] = None,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    Fetch NASA POWER, CHIRPS and FIRMS concurrently (see iter_hazard_sources).
+
+    Returns (frames, errors): frames maps source name -> DataFrame for every
+    source that succeeded, errors maps source name -> message for the rest.
+    """
+    frames: Dict[str, pd.DataFrame] = {}
+    errors: Dict[str, str] = {}
+    for name, df, error in iter_hazard_sources(
+            lat, lon, start, end, bbox=bbox, firms_days=firms_days, timeouts=timeouts,
+            chirps_mode=chirps_mode, polygon=polygon, progress=progress,
+            sources=sources, firms_sources=firms_sources):
+        if error is None:
+            frames[name] = df
+        else:
+            errors[name] = error
+    return frames, errors
+
+
+def climate_features(df_power: pd.DataFrame) -> Dict[str, float]:
+    """Climate summaries from a NASA POWER frame, safe for empty frames."""
+    return {
         "t2m_mean": _safe_mean(df_power["T2M"]) if "T2M" in df_power else 0.0,
         "t2m_max": float(df_power["T2M"].max()) if "T2M" in df_power and not df_power["T2M"].empty else 0.0,
         "precip_sum": _safe_sum(df_power["PRECTOT"]) if "PRECTOT" in df_power else 0.0,
         "wind_mean": _safe_mean(df_power["WS10M"]) if "WS10M" in df_power else 0.0,
     }
 
-    # ---- CHIRPS (rainfall) ----
-    df_chirps = fetch_chirps_rainfall(lat, lon, start, end)
+
+def drought_features(df_chirps: pd.DataFrame) -> Dict[str, float]:
+    """
+    Drought summaries from a CHIRPS frame, safe for empty frames. Area-mode
+    frames (fetch_chirps_area) also yield the mean daily spatial percentiles.
+    """
     drought = {
         "chirps_precip_sum": _safe_sum(df_chirps["precip_mm"]) if "precip_mm" in df_chirps else 0.0,
         "chirps_precip_mean": _safe_mean(df_chirps["precip_mm"]) if "precip_mm" in df_chirps else 0.0,
     }
+    for col in df_chirps.columns:
+        if col.startswith("precip_p"):
+            drought[f"chirps_{col}_mean"] = _safe_mean(df_chirps[col])
+    return drought
 
-    # ---- FIRMS (fires) ----
-    fire_stats = {}
-    if bbox is not None:
-        df_fires = fetch_firms_area(
-            bbox, source="VIIRS_SNPP_NRT", day_range=firms_days)
-        fire_stats = {
-            "fires_count": int(len(df_fires)),
-            "fires_mean_brightness": float(df_fires["bright_ti4"].mean()) if len(df_fires) else 0.0,
-            "fires_mean_frp": float(df_fires["frp"].mean()) if len(df_fires) else 0.0,
+
+def fire_features(df_fires: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Fire summaries from a FIRMS hotspot frame. Fused multi-sensor frames
+    (load_firms_multi) also yield per-fire stats; fires_count stays the
+    number of detections.
+    """
+    features = {
+        "fires_count": int(len(df_fires)),
+        "fires_mean_brightness": float(df_fires["bright_ti4"].mean()) if len(df_fires) else 0.0,
+        "fires_mean_frp": float(df_fires["frp"].mean()) if len(df_fires) else 0.0,
+    }
+    if "fire_id" in df_fires:
+        features.update(fused_fire_stats(df_fires))
+    return features
+
+
+def _window_days(df: Optional[pd.DataFrame], start: str, end: str, inclusive: bool) -> List[datetime.date]:
+    """Days the window's features were computed over: the frame's, or every day."""
+    if df is not None:
+        return list(df.dropna(how="all").index.date)
+    last = datetime.date.fromisoformat(end) - datetime.timedelta(days=0 if inclusive else 1)
+    first = datetime.date.fromisoformat(start)
+    return [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def add_anomaly_features(
+    groups: Dict[str, Dict[str, float]],
+    frames: Dict[str, pd.DataFrame],
+    lat: float,
+    lon: float,
+    start: str,
+    end: str,
+    errors: Dict[str, str],
+):
+    """
+    Extend the climate / drought summaries in `groups` in place with
+    climatology anomalies (utils/climatology.py). The reference window is
+    the days present in the source frame, or the whole [start, end] window
+    when the summaries came from the feature grid. Area mode compares
+    against the baseline of the centre cell. A baseline that cannot be
+    fetched is reported under errors['<source>_climatology'], as 'pending'
+    while it is still being fetched in the background.
+    """
+    if climatology is None:
+        return
+    for group in ("climate", "drought"):
+        name = GROUP_SOURCES[group]
+        features = groups.get(group)
+        if not features or errors.get(f"{name}_climatology") == "pending":
+            continue
+        days = _window_days(frames.get(name), start, end, inclusive=name == "power")
+        try:
+            features.update(climatology.anomaly_features(
+                name, lat, lon, days, features, wait=CLIMATOLOGY_WAIT_S))
+        except BaselinePending:
+            errors[f"{name}_climatology"] = "pending"
+        except Exception as e:
+            logging.warning("Climatology for %s failed: %s", name, e)
+            errors[f"{name}_climatology"] = str(e)
+
+
+# ---------- trailing windows: several summaries from one fetch ----------
+#
+# windows=[7, 30, 90, 365] summarises the trailing windows ending at `end`
+# from one fetch of the longest one. Window n covers exactly what a request
+# with start = end - n days (window_start) would: n + 1 POWER days through
+# end and n CHIRPS days through the day before. Its groups equal
+# climate_features / drought_features of that request, and the span is that
+# of the feature grid's n-day window. Per column, suffix sums, non-NaN counts and a suffix running max
+# are computed once; each window is then one searchsorted lookup.
+
+# (feature, column, aggregate) as in climate_features / drought_features
+CLIMATE_AGGREGATES = [
+    ("t2m_mean", "T2M", "mean"),
+    ("t2m_max", "T2M", "max"),
+    ("precip_sum", "PRECTOT", "sum"),
+    ("wind_mean", "WS10M", "mean"),
+]
+DROUGHT_AGGREGATES = [
+    ("chirps_precip_sum", "precip_mm", "sum"),
+    ("chirps_precip_mean", "precip_mm", "mean"),
+]
+
+
+def window_start(end: str, days: int) -> str:
+    # one definition with the feature grid's windows
+    return window_dates(datetime.date.fromisoformat(end), days)[0]
+
+
+def fetch_start_for_windows(start: str, end: str, windows: Optional[List[int]]) -> str:
+    """Start of the one fetch covering [start, end] and every window."""
+    if not windows:
+        return start
+    return min(start, window_start(end, max(windows)))
+
+
+def frames_since(frames: Dict[str, pd.DataFrame], start: str) -> Dict[str, pd.DataFrame]:
+    """POWER / CHIRPS frames trimmed to days >= start; other frames as is."""
+    first = pd.Timestamp(start)
+    return {name: df[df.index >= first] if name in ("power", "chirps") else df
+            for name, df in frames.items()}
+
+
+def _trailing_aggregates(df: pd.DataFrame, last_day: np.datetime64, first_days: np.ndarray,
+                         aggregates) -> List[Dict[str, float]]:
+    """
+    One {feature: value} dict per first day, aggregating df over
+    [first_day, last_day] with the _safe_sum / _safe_mean / max rules.
+    """
+    dates = df.index.to_numpy(dtype="datetime64[D]")
+    stop = np.searchsorted(dates, last_day, side="right")
+    lo = np.searchsorted(dates[:stop], first_days, side="left")
+    empty = lo >= stop
+    lo = np.minimum(lo, max(stop - 1, 0))
+
+    out: List[Dict[str, float]] = [{} for _ in first_days]
+    suffixes: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+    for feature, column, how in aggregates:
+        if column not in df or stop == 0:
+            for features in out:
+                features[feature] = 0.0
+            continue
+        if column not in suffixes:
+            values = df[column].to_numpy(dtype=float)[:stop][::-1]
+            valid = ~np.isnan(values)
+            suffixes[column] = (
+                np.cumsum(np.where(valid, values, 0.0))[::-1],
+                np.cumsum(valid)[::-1],
+                np.fmax.accumulate(values)[::-1],
+            )
+        sums, counts, maxima = suffixes[column]
+        if how == "sum":
+            result = sums[lo]
+        elif how == "mean":
+            n = counts[lo]
+            result = np.divide(sums[lo], n, out=np.zeros(len(lo)), where=n > 0)
+        else:
+            result = maxima[lo]
+        result = np.where(empty, 0.0, result)
+        for features, value in zip(out, result.tolist()):
+            features[feature] = value
+    return out
+
+
+def window_features(frames: Dict[str, pd.DataFrame], end: str,
+                    windows: List[int]) -> List[Dict[str, Any]]:
+    """
+    [{"days", "start", "end", "climate", "drought"}, ...] for the trailing
+    windows ending at end, from POWER / CHIRPS frames covering the longest.
+    A group whose source is missing from frames comes back empty.
+    """
+    end_day = np.datetime64(end, "D")
+    # window_start for each window
+    first_days = end_day - np.asarray(windows, dtype="timedelta64[D]")
+    climate = drought = None
+    if "power" in frames:
+        climate = _trailing_aggregates(frames["power"], end_day, first_days, CLIMATE_AGGREGATES)
+    if "chirps" in frames:
+        df = frames["chirps"]
+        percentiles = [(f"chirps_{col}_mean", col, "mean")
+                       for col in df.columns if col.startswith("precip_p")]
+        # CHIRPS end is exclusive
+        drought = _trailing_aggregates(df, end_day - np.timedelta64(1, "D"), first_days,
+                                       DROUGHT_AGGREGATES + percentiles)
+    return [
+        {
+            "days": int(days),
+            "start": str(first),
+            "end": end,
+            "climate": climate[k] if climate is not None else {},
+            "drought": drought[k] if drought is not None else {},
         }
+        for k, (days, first) in enumerate(zip(windows, first_days))
+    ]
 
-    return {
+
+def summarize_windows(
+    frames: Dict[str, pd.DataFrame],
+    lat: float,
+    lon: float,
+    end: str,
+    windows: List[int],
+    anomalies: bool,
+    errors: Dict[str, str],
+) -> List[Dict[str, Any]]:
+    """window_features, plus per-window climatology anomalies when asked."""
+    summaries = window_features(frames, end, windows)
+    if anomalies:
+        for window in summaries:
+            add_anomaly_features(window, frames_since(frames, window["start"]), lat, lon,
+                                 window["start"], end, errors)
+    return summaries
+
+
+def warm_hazard_sources(
+    lat: float,
+    lon: float,
+    end: str,
+    windows: List[int],
+    sources: List[str],
+    ttls: Dict[str, float],
+    bbox=None,
+    firms_days: int = 7,
+    chirps_mode: str = "point",
+    polygon=None,
+    firms_sources: Optional[List[str]] = None,
+    timeout_s: Optional[float] = None,
+) -> Dict[str, str]:
+    """
+    Re-fetch `sources` for the requests start = end - n days (n in windows)
+    and store them in the result cache for ttls[source] seconds. Must run
+    inside warming(ttls) for the re-fetch to bypass the cache.
+
+    One fetch per source covers the longest window; the shorter windows'
+    POWER / CHIRPS entries are slices of it. Returns errors per source.
+    """
+    start = window_start(end, max(windows))
+    frames, errors = fetch_hazard_sources(
+        lat, lon, start, end, bbox=bbox, firms_days=firms_days,
+        timeouts={name: timeout_s for name in sources} if timeout_s else None,
+        chirps_mode=chirps_mode, polygon=polygon, sources=sources, firms_sources=firms_sources)
+
+    area = chirps_mode == "area" and bbox is not None
+    for name in ("power", "chirps"):
+        if name not in frames:
+            continue
+        key_source = "chirps_area" if name == "chirps" and area else name
+        ttl = max(ttls.get(key_source, 0.0), source_ttl(name, end))
+        for days in windows:
+            first = window_start(end, days)
+            if first == start:
+                continue
+            key = series_cache_key(key_source, first, end, lat, lon, bbox=bbox, polygon=polygon)
+            hazard_cache.set(key, frames_since({name: frames[name]}, first)[name], ttl)
+    return errors
+
+
+def build_hazard_features(
+    lat: float,
+    lon: float,
+    start: str,
+    end: str,
+    bbox=None,
+    firms_days: int = 7,
+    chirps_mode: str = "point",
+    polygon=None,
+    progress: Optional[Callable[[str, str], None]] = None,
+    sources: Optional[List[str]] = None,
+    anomalies: bool = False,
+    firms_sources: Optional[List[str]] = None,
+    windows: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Build a simple hazard feature dict for one location (and optional bbox for fires).
+
+    start/end   : 'YYYY-MM-DD'
+    firms_days  : how many days back to look for fires
+    chirps_mode : 'point' (CHIRPS at lat/lon) or 'area' (reduced over
+                  polygon / bbox, adds chirps_precip_p10_mean/p90_mean)
+    progress    : optional per-source callback, see iter_hazard_sources
+    sources     : subset of 'power' / 'chirps' / 'firms' to fetch (default
+                  all); groups of sources not fetched come back empty
+    anomalies   : add climatology anomaly / percentile features to the
+                  climate and drought groups (utils/climatology.py)
+    firms_sources : FIRMS sensors (default VIIRS_SNPP_NRT); several are
+                  fetched in parallel and fused, adding fires_unique etc.
+    windows     : trailing window lengths in days; adds 'windows', the
+                  climate / drought groups of each window ending at end,
+                  from the same fetch (see window_features)
+
+    POWER, CHIRPS and FIRMS are fetched concurrently. A source that fails or
+    times out leaves its group empty and is listed under 'errors'; if every
+    requested source fails, a RuntimeError is raised.
+
+    Point-mode requests for a standard window inside the precomputed feature
+    grid (utils/feature_grid.py) take climate and drought from the grid and
+    only fetch FIRMS. Single-sensor fire stats inside the hotspot index
+    (utils/firms_index.py) come from the index, without a FIRMS fetch.
+    """
+    wanted = list(sources) if sources is not None else ["power", "chirps", "firms"]
+    fire_stats = None
+    if "firms" in wanted and bbox is not None and (not firms_sources or len(firms_sources) == 1):
+        fire_stats = indexed_fire_features(
+            bbox, firms_days, source=firms_sources[0] if firms_sources else DEFAULT_FIRMS_SOURCE,
+            polygon=polygon)
+    if fire_stats is not None:
+        wanted = [name for name in wanted if name != "firms"]
+        if progress is not None:
+            progress("firms", "done")
+
+    precomputed = None
+    if feature_grid is not None and chirps_mode == "point" and not windows and (
+            "power" in wanted or "chirps" in wanted):
+        precomputed = feature_grid.lookup(lat, lon, start, end)
+
+    if precomputed is not None:
+        for name in ("power", "chirps"):
+            if progress is not None and name in wanted:
+                progress(name, "done")
+        frames, errors = fetch_hazard_sources(
+            lat, lon, start, end, bbox=bbox, firms_days=firms_days,
+            progress=progress, sources=[name for name in wanted if name == "firms"],
+            firms_sources=firms_sources)
+    else:
+        fetched, errors = fetch_hazard_sources(
+            lat, lon, fetch_start_for_windows(start, end, windows), end, bbox=bbox,
+            firms_days=firms_days, chirps_mode=chirps_mode, polygon=polygon,
+            progress=progress, sources=wanted, firms_sources=firms_sources)
+        if not fetched and fire_stats is None:
+            raise RuntimeError(
+                "; ".join(f"{name}: {msg}" for name, msg in errors.items()))
+        frames = frames_since(fetched, start) if windows else fetched
+
+    if precomputed is not None:
+        climate = precomputed["climate"] if "power" in wanted else {}
+        drought = precomputed["drought"] if "chirps" in wanted else {}
+    else:
+        climate = climate_features(frames["power"]) if "power" in frames else {}
+        drought = drought_features(frames["chirps"]) if "chirps" in frames else {}
+    if fire_stats is None:
+        fire_stats = fire_features(frames["firms"]) if "firms" in frames else {}
+
+    if anomalies:
+        add_anomaly_features({"climate": climate, "drought": drought},
+                             frames, lat, lon, start, end, errors)
+
+    features = {
         "climate": climate,
         "drought": drought,
         "fire": fire_stats,
+        "errors": errors,
     }
+    if windows:
+        features["windows"] = summarize_windows(fetched, lat, lon, end, windows, anomalies, errors)
+    return features
 
 
 def dataframe_to_timeseries(df: pd.DataFrame, value_columns: List[str]) -> List[Dict[str, Any]]:
@@ -371,10 +1488,49 @@ def dataframe_to_timeseries(df: pd.DataFrame, value_columns: List[str]) -> List[
     """
     if df.empty:
         return []
-    records: List[Dict[str, Any]] = []
-    for idx, row in df.iterrows():
-        entry: Dict[str, Any] = {"date": idx.strftime("%Y-%m-%d")}
-        for col in value_columns:
-            entry[col] = row[col] if col in row else None
-        records.append(entry)
-    return records
+    out = pd.DataFrame({"date": pd.DatetimeIndex(df.index).strftime("%Y-%m-%d")})
+    for col in value_columns:
+        out[col] = df[col].to_numpy() if col in df else None
+    return out.to_dict(orient="records")
+
+
+def iter_timeseries_rows(
+    df: pd.DataFrame, value_columns: List[str], chunk_rows: int = 1000
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazy variant of dataframe_to_timeseries: converts chunk_rows rows at a
+    time so only one chunk of dicts is alive at once.
+    """
+    for i in range(0, len(df), chunk_rows):
+        yield from dataframe_to_timeseries(df.iloc[i:i + chunk_rows], value_columns)
+
+
+def iter_records(df: pd.DataFrame, chunk_rows: int = 1000) -> Iterator[Dict[str, Any]]:
+    """Lazy df.to_dict(orient="records"), chunk_rows rows at a time."""
+    for i in range(0, len(df), chunk_rows):
+        yield from df.iloc[i:i + chunk_rows].to_dict(orient="records")
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    # NaN -> None so the payload is valid JSON
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def dataframe_to_columns(df: pd.DataFrame, value_columns: List[str]) -> Dict[str, List[Any]]:
+    """
+    Columnar counterpart of dataframe_to_timeseries:
+    {"date": [...], "<col>": [...], ...}
+    """
+    if df.empty:
+        return {"date": [], **{col: [] for col in value_columns}}
+    columns: Dict[str, List[Any]] = {
+        "date": pd.DatetimeIndex(df.index).strftime("%Y-%m-%d").tolist()
+    }
+    for col in value_columns:
+        columns[col] = _column_values(df[col]) if col in df else [None] * len(df)
+    return columns
+
+
+def records_to_columns(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    """All columns of a plain (non time-indexed) frame, e.g. FIRMS rows."""
+    return {col: _column_values(df[col]) for col in df.columns}
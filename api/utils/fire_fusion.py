@@ -0,0 +1,149 @@
+import itertools
+import os
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+# ================================================================
+# Multi-sensor FIRMS fusion
+# ================================================================
+#
+# VIIRS (S-NPP, NOAA-20/21) and MODIS see the same fire from different
+# overpasses, and one fire spans several adjacent pixels of one sensor. The
+# per-sensor tables are concatenated and detections closer than
+# FIRMS_DEDUPE_DISTANCE_M in space and FIRMS_DEDUPE_HOURS in time are
+# linked; connected detections form one fire (fire_id). Linking is
+# transitive, so a spreading front stays one fire.
+#
+# Candidate pairs come from a spatio-temporal hash: detections are bucketed
+# into cells of the tolerance size, sorted by cell key, and each detection
+# is matched only against the 27 neighbouring cells via searchsorted. The
+# exact distance / time test and the component labelling are array
+# operations too; no Python loop runs over detections.
+
+FIRMS_DEDUPE_DISTANCE_M = float(os.environ.get("FIRMS_DEDUPE_DISTANCE_M", "1000"))
+FIRMS_DEDUPE_HOURS = float(os.environ.get("FIRMS_DEDUPE_HOURS", "3"))
+
+_M_PER_DEG_LAT = 110_574.0
+_M_PER_DEG_LON = 111_320.0
+_OFFSETS = np.array(list(itertools.product((-1, 0, 1), repeat=3)), dtype=np.int64)
+
+
+def detection_minutes(df: pd.DataFrame) -> np.ndarray:
+    """Acquisition time as minutes since the epoch (acq_date + acq_time HHMM)."""
+    day = pd.to_datetime(df["acq_date"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    hhmm = (pd.to_numeric(df["acq_time"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+            if "acq_time" in df else np.zeros(len(df), dtype=np.int64))
+    return day * 1440 + (hhmm // 100) * 60 + hhmm % 100
+
+
+def candidate_pairs(x: np.ndarray, y: np.ndarray, t: np.ndarray,
+                    cell_xy: float, cell_t: float):
+    """
+    (i, j) index pairs, i < j, of detections in the same or adjacent
+    spatio-temporal hash cells. x/y in metres, t in minutes.
+    """
+    n = len(x)
+    cells = np.stack([np.floor(x / cell_xy), np.floor(y / cell_xy), np.floor(t / cell_t)],
+                     axis=1).astype(np.int64)
+    # shift to >= 1 so every neighbour (-1) still has a non-negative coordinate
+    cells -= cells.min(axis=0) - 1
+    dims = cells.max(axis=0) + 2
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    steps = (_OFFSETS[:, 0] * dims[1] + _OFFSETS[:, 1]) * dims[2] + _OFFSETS[:, 2]
+    neighbour = keys[None, :] + steps[:, None]  # [27, n]
+    lo = np.searchsorted(sorted_keys, neighbour, side="left").ravel()
+    hi = np.searchsorted(sorted_keys, neighbour, side="right").ravel()
+    counts = hi - lo
+    src = np.repeat(np.tile(np.arange(n), len(steps)), counts)
+    # position inside each [lo, hi) run, without a loop over runs
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    dst = order[np.repeat(lo, counts) + within]
+    keep = src < dst
+    return src[keep], dst[keep]
+
+
+def connected_labels(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Component label (smallest member index) of each node of an edge list."""
+    labels = np.arange(n)
+    while True:
+        previous = labels.copy()
+        low = np.minimum(labels[i], labels[j])
+        np.minimum.at(labels, i, low)
+        np.minimum.at(labels, j, low)
+        labels = labels[labels]  # pointer jumping
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def dedupe_hotspots(df: pd.DataFrame, distance_m: float = FIRMS_DEDUPE_DISTANCE_M,
+                    hours: float = FIRMS_DEDUPE_HOURS) -> pd.DataFrame:
+    """
+    `df` with a fire_id column (0..k-1) grouping detections of the same fire.
+    Rows are kept; use fire_id to count or aggregate fires.
+    """
+    out = df.reset_index(drop=True).copy()
+    n = len(out)
+    if n == 0:
+        out["fire_id"] = pd.Series(dtype=np.int64)
+        return out
+
+    lat = out["latitude"].to_numpy(dtype=float)
+    lon = out["longitude"].to_numpy(dtype=float)
+    t = detection_minutes(out).astype(float)
+    # local equirectangular metres; FIRMS queries are regional
+    x = lon * _M_PER_DEG_LON * np.cos(np.radians(np.nanmean(lat)))
+    y = lat * _M_PER_DEG_LAT
+    window = hours * 60.0
+
+    i, j = candidate_pairs(x, y, t, distance_m, window)
+    close = ((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 <= distance_m ** 2) & (np.abs(t[i] - t[j]) <= window)
+    labels = connected_labels(n, i[close], j[close])
+    out["fire_id"] = np.unique(labels, return_inverse=True)[1]
+    return out
+
+
+def merge_sources(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    One table from per-sensor FIRMS frames, with a `source` column. MODIS
+    'brightness' is copied into bright_ti4 (both are ~4 um brightness
+    temperatures) so fire_features reads one column.
+    """
+    parts = []
+    for source, df in frames.items():
+        if df is None or df.empty:
+            continue
+        part = df.copy()
+        part["source"] = source
+        if "bright_ti4" not in part and "brightness" in part:
+            part["bright_ti4"] = part["brightness"]
+        parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=["latitude", "longitude", "bright_ti4", "frp", "source"])
+    return pd.concat(parts, ignore_index=True, sort=False)
+
+
+def fused_fire_stats(df: pd.DataFrame) -> Dict[str, Any]:
+    """Per-fire stats of a dedupe_hotspots table: each fire counted once."""
+    if df.empty:
+        return {"fires_unique": 0, "fires_multi_sensor": 0, "fires_frp_sum": 0.0, "fires_frp_max": 0.0}
+    grouped = df.groupby("fire_id")
+    # a fire's power is its strongest detection, not the sum of every view of it
+    frp = grouped["frp"].max() if "frp" in df else pd.Series(dtype=float)
+    sensors = grouped["source"].nunique() if "source" in df else pd.Series(1, index=grouped.size().index)
+    return {
+        "fires_unique": int(grouped.ngroups),
+        "fires_multi_sensor": int((sensors > 1).sum()),
+        "fires_frp_sum": float(frp.sum()) if len(frp) else 0.0,
+        "fires_frp_max": float(frp.max()) if len(frp) else 0.0,
+    }
+
+
+def fuse(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """merge_sources + dedupe_hotspots."""
+    return dedupe_hotspots(merge_sources(frames))
+
@@ -0,0 +1,212 @@
+import datetime
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.geometry import points_in_polygon
+
+# ================================================================
+# In-memory FIRMS hotspot tables with a grid index
+# ================================================================
+#
+# Instead of one FIRMS area call per AOI, one table per source is loaded for
+# a whole region and refreshed in the background. Per-bbox / per-polygon
+# selections and stats are then answered from memory.
+#
+# Configuration (disabled unless FIRMS_INDEX_BBOX is set):
+#   FIRMS_INDEX_BBOX       west,south,east,north covered by the table; only
+#                          queries fully inside it are answered from memory
+#   FIRMS_INDEX_COUNTRY    optional ISO3 code; load via fetch_firms_country
+#                          instead of an area call over FIRMS_INDEX_BBOX
+#   FIRMS_INDEX_SOURCES    comma-separated sources (default VIIRS_SNPP_NRT)
+#   FIRMS_INDEX_DAYS       lookback loaded per refresh (default 7)
+#   FIRMS_INDEX_REFRESH_S  refresh interval (default 600)
+
+INDEX_CELL_DEG = 0.25
+
+
+def _brightness_column(df: pd.DataFrame) -> Optional[str]:
+    # VIIRS reports bright_ti4, MODIS reports brightness
+    for col in ("bright_ti4", "brightness"):
+        if col in df:
+            return col
+    return None
+
+
+class HotspotIndex:
+    """Immutable hotspot table sorted by grid cell for fast spatial selection."""
+
+    def __init__(self, df: pd.DataFrame, cell_deg: float = INDEX_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.ncols = int(math.ceil(360 / cell_deg))
+
+        lat = df["latitude"].to_numpy(dtype=float) if len(df) else np.empty(0)
+        lon = df["longitude"].to_numpy(dtype=float) if len(df) else np.empty(0)
+        keys = self._cell_rows(lat) * self.ncols + self._cell_cols(lon)
+        order = np.argsort(keys, kind="stable")
+
+        self.df = df.iloc[order].reset_index(drop=True)
+        self.keys = keys[order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+
+        bright_col = _brightness_column(df)
+        self.bright = (df[bright_col].to_numpy(dtype=float)[order]
+                       if bright_col else np.full(len(order), np.nan))
+        self.frp = (df["frp"].to_numpy(dtype=float)[order]
+                    if "frp" in df else np.full(len(order), np.nan))
+        if "acq_date" in df and len(df):
+            days = pd.to_datetime(df["acq_date"]).to_numpy(dtype="datetime64[D]")
+            self.acq_day = days.astype(np.int64)[order]
+        else:
+            self.acq_day = np.zeros(len(order), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _cell_rows(self, lat):
+        return np.floor((np.asarray(lat) + 90) / self.cell_deg).astype(np.int64)
+
+    def _cell_cols(self, lon):
+        return np.floor((np.asarray(lon) + 180) / self.cell_deg).astype(np.int64)
+
+    def select(self, bbox, polygon: Optional[List[List[float]]] = None,
+               days: Optional[int] = None) -> np.ndarray:
+        """
+        Positions of hotspots inside bbox (and polygon, if given), optionally
+        limited to the last `days` acquisition days (UTC, today inclusive).
+        """
+        west, south, east, north = bbox
+        r0, r1 = self._cell_rows([south, north])
+        c0, c1 = self._cell_cols([west, east])
+
+        # keys are sorted, so each grid row of the bbox is one contiguous slice
+        row_keys = np.arange(r0, r1 + 1, dtype=np.int64) * self.ncols
+        lo = np.searchsorted(self.keys, row_keys + c0, side="left")
+        hi = np.searchsorted(self.keys, row_keys + c1, side="right")
+        if not len(lo) or not (hi > lo).any():
+            return np.empty(0, dtype=np.int64)
+        cand = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi) if b > a])
+
+        lat = self.lat[cand]
+        lon = self.lon[cand]
+        mask = (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)
+        if days is not None:
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            cutoff = np.datetime64(today, "D").astype(np.int64) - (days - 1)
+            mask &= self.acq_day[cand] >= cutoff
+        if polygon is not None:
+            mask[mask] = points_in_polygon(lon[mask], lat[mask], polygon)
+        return cand[mask]
+
+    def rows(self, bbox, polygon=None, days=None) -> pd.DataFrame:
+        return self.df.iloc[self.select(bbox, polygon, days)].reset_index(drop=True)
+
+    def stats(self, bbox, polygon=None, days=None) -> Dict[str, Any]:
+        """Same fields as fetch_hazard_data.fire_features, without a DataFrame."""
+        pos = self.select(bbox, polygon, days)
+        if not len(pos):
+            return {"fires_count": 0, "fires_mean_brightness": 0.0, "fires_mean_frp": 0.0}
+        return {
+            "fires_count": int(len(pos)),
+            "fires_mean_brightness": float(np.nanmean(self.bright[pos])),
+            "fires_mean_frp": float(np.nanmean(self.frp[pos])),
+        }
+
+
+def _parse_bbox(value: Optional[str]):
+    if not value:
+        return None
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("FIRMS_INDEX_BBOX must be west,south,east,north")
+    return tuple(parts)
+
+
+class HotspotTables:
+    """Per-source HotspotIndex kept fresh by a background thread."""
+
+    def __init__(self, region_bbox, sources: List[str], country: Optional[str] = None,
+                 days: int = 7, refresh_s: float = 600):
+        self.region_bbox = region_bbox
+        self.sources = sources
+        self.country = country
+        self.days = days
+        self.refresh_s = refresh_s
+        self._tables: Dict[str, HotspotIndex] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- loading ----
+
+    def refresh(self, source: str):
+        # imported here to avoid a cycle: fetch_hazard_data consults this module
+        from utils.fetch_hazard_data import fetch_firms_area, fetch_firms_country
+
+        t0 = time.monotonic()
+        if self.country:
+            df = fetch_firms_country(self.country, source=source, day_range=self.days)
+        else:
+            df = fetch_firms_area(self.region_bbox, source=source, day_range=self.days)
+        self._tables[source] = HotspotIndex(df)
+        self._loaded_at[source] = time.time()
+        logging.info("FIRMS index %s: %d hotspots loaded in %.2fs",
+                     source, len(df), time.monotonic() - t0)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for source in self.sources:
+                try:
+                    self.refresh(source)
+                except Exception as e:
+                    logging.warning("FIRMS index refresh failed for %s: %s", source, e)
+            self._stop.wait(self.refresh_s)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="firms-index", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ---- queries ----
+
+    def covers(self, source: str, bbox, days: int) -> bool:
+        if source not in self._tables or days > self.days:
+            return False
+        # a table that missed two refreshes is too stale to answer from
+        if time.time() - self._loaded_at[source] > 2 * self.refresh_s:
+            return False
+        west, south, east, north = bbox
+        rw, rs, re_, rn = self.region_bbox
+        return west >= rw and south >= rs and east <= re_ and north <= rn
+
+    def get(self, source: str, bbox, days: int) -> Optional[HotspotIndex]:
+        """The index for `source` if it can answer this query, else None."""
+        return self._tables[source] if self.covers(source, bbox, days) else None
+
+
+def tables_from_env() -> Optional[HotspotTables]:
+    region = _parse_bbox(os.environ.get("FIRMS_INDEX_BBOX"))
+    if region is None:
+        return None
+    return HotspotTables(
+        region_bbox=region,
+        sources=[s.strip() for s in os.environ.get(
+            "FIRMS_INDEX_SOURCES", "VIIRS_SNPP_NRT").split(",") if s.strip()],
+        country=os.environ.get("FIRMS_INDEX_COUNTRY") or None,
+        days=int(os.environ.get("FIRMS_INDEX_DAYS", "7")),
+        refresh_s=float(os.environ.get("FIRMS_INDEX_REFRESH_S", "600")),
+    )
+
+
+hotspot_tables = tables_from_env()
@@ -0,0 +1,173 @@
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# ================================================================
+# Vectorized geometry helpers (lon/lat degrees)
+# ================================================================
+#
+# Areas and centroids are computed on the WGS84 ellipsoid through Lambert's
+# cylindrical equal-area projection (x = lon, y = authalic q(lat)): a shoelace
+# sum there is the ellipsoidal area of the polygon whose edges are straight in
+# that projection, which is exact for lat/lon boxes and within a fraction of
+# a percent of the geodesic-edge area for AOI-sized polygons. Polygons are
+# assumed not to cross the antimeridian.
+
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+_E2 = WGS84_F * (2 - WGS84_F)
+_E = math.sqrt(_E2)
+
+
+def _authalic_q(lat_deg: np.ndarray) -> np.ndarray:
+    """q(lat) of the equal-area projection; area element is a^2/2 dlon dq."""
+    s = np.sin(np.radians(lat_deg))
+    return (1 - _E2) * (s / (1 - _E2 * s * s)
+                        - np.log((1 - _E * s) / (1 + _E * s)) / (2 * _E))
+
+
+_Q_POLE = float(_authalic_q(np.array(90.0)))
+
+
+def _lat_from_q(q: float) -> float:
+    """Inverse of _authalic_q (authalic latitude series, Snyder 3-18)."""
+    beta = math.asin(max(-1.0, min(1.0, q / _Q_POLE)))
+    e4, e6 = _E2 * _E2, _E2 * _E2 * _E2
+    return math.degrees(
+        beta
+        + (_E2 / 3 + 31 * e4 / 180 + 517 * e6 / 5040) * math.sin(2 * beta)
+        + (23 * e4 / 360 + 251 * e6 / 3780) * math.sin(4 * beta)
+        + (761 * e6 / 45360) * math.sin(6 * beta)
+    )
+
+
+def _ring(polygon) -> np.ndarray:
+    """[n, 2] lon/lat vertices without a repeated closing vertex."""
+    poly = np.asarray(polygon, dtype=float)
+    if len(poly) > 1 and np.array_equal(poly[0], poly[-1]):
+        poly = poly[:-1]
+    return poly
+
+
+def bbox_polygon(bbox: Sequence[float]) -> List[List[float]]:
+    west, south, east, north = bbox
+    return [[west, south], [east, south], [east, north], [west, north]]
+
+
+def polygon_area_km2(polygon: List[List[float]]) -> float:
+    """Ellipsoidal area of a [[lon, lat], ...] ring, either orientation."""
+    poly = _ring(polygon)
+    if len(poly) < 3:
+        return 0.0
+    x = np.radians(poly[:, 0])
+    y = _authalic_q(poly[:, 1])
+    twice = np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)
+    return float(abs(twice) / 2 * WGS84_A_KM ** 2 / 2)
+
+
+def bbox_area_km2(bbox: Sequence[float]) -> float:
+    """Ellipsoidal area of a (west, south, east, north) box."""
+    west, south, east, north = bbox
+    if east <= west or north <= south:
+        return 0.0
+    dq = _authalic_q(np.array(north)) - _authalic_q(np.array(south))
+    return float(math.radians(east - west) * dq * WGS84_A_KM ** 2 / 2)
+
+
+def polygon_centroid(polygon: List[List[float]]) -> Tuple[float, float]:
+    """
+    (lon, lat) of the area-weighted centroid, taken in the equal-area
+    projection so every km^2 weighs the same. May fall outside a concave
+    polygon. Degenerate (zero-area) rings fall back to the vertex mean.
+    """
+    poly = _ring(polygon)
+    x = poly[:, 0]
+    y = _authalic_q(poly[:, 1])
+    x_next, y_next = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y_next - x_next * y
+    twice = cross.sum()
+    if len(poly) < 3 or abs(twice) < 1e-15:
+        return float(poly[:, 0].mean()), float(poly[:, 1].mean())
+    cx = float(((x + x_next) * cross).sum() / (3 * twice))
+    cq = float(((y + y_next) * cross).sum() / (3 * twice))
+    return cx, _lat_from_q(cq)
+
+
+# ---------- point in polygon ----------
+
+# Below this many vertices a plain loop over edges beats building the slab table
+SLAB_MIN_VERTICES = 32
+
+def points_in_polygon(lons, lats, polygon: List[List[float]]) -> np.ndarray:
+    """
+    Even-odd ray casting test for many points against one polygon.
+
+    lons, lats : array-likes of equal length
+    polygon    : [[lon, lat], ...]; closing vertex optional
+    Returns a boolean array.
+
+    Small polygons loop over their edges with all points tested together.
+    Larger ones are cut into horizontal slabs at the vertex latitudes; the
+    edges crossing each slab are tabulated once and each point is tested
+    only against the few edges of its own slab, so the cost no longer grows
+    with n_points * n_edges. The two paths round the edge crossing
+    differently, so a point lying on an edge may come out either way.
+    """
+    shape = np.shape(lons)
+    x = np.asarray(lons, dtype=float).ravel()
+    y = np.asarray(lats, dtype=float).ravel()
+    inside = np.zeros(shape, dtype=bool)
+    poly = _ring(polygon)
+    if len(poly) < 3 or x.size == 0:
+        return inside
+
+    if len(poly) < SLAB_MIN_VERTICES:
+        flat = inside.reshape(-1)
+        xj, yj = poly[-1]
+        for xi, yi in poly:
+            if yi != yj:
+                crosses = (yi > y) != (yj > y)
+                x_cross = (xj - xi) * (y - yi) / (yj - yi) + xi
+                flat ^= crosses & (x < x_cross)
+            xj, yj = xi, yi
+        return inside
+
+    xi, yi = poly[:, 0], poly[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    levels = np.unique(yi)
+    n_slabs = len(levels) - 1
+    if n_slabs < 1:
+        return inside
+
+    # edge e spans slabs [lo[e], hi[e]); horizontal edges span none
+    lo = np.searchsorted(levels, np.minimum(yi, yj))
+    hi = np.searchsorted(levels, np.maximum(yi, yj))
+    span = hi - lo
+    edge = np.repeat(np.arange(len(poly)), span)
+    slab = np.repeat(lo, span) + (np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span))
+    order = np.argsort(slab, kind="stable")
+    edge, slab = edge[order], slab[order]
+    slab_count = np.bincount(slab, minlength=n_slabs)
+    column = np.arange(len(slab)) - np.repeat(np.cumsum(slab_count) - slab_count, slab_count)
+
+    # [slab, k] table of the slab's edges as x = x0 + (y - y0) * dxdy; padding
+    # has x0 = -inf so it never counts as a crossing
+    width = int(slab_count.max())
+    x0 = np.full((n_slabs, width), -np.inf)
+    y0 = np.zeros((n_slabs, width))
+    dxdy = np.zeros((n_slabs, width))
+    x0[slab, column] = xi[edge]
+    y0[slab, column] = yi[edge]
+    dxdy[slab, column] = (xj[edge] - xi[edge]) / (yj[edge] - yi[edge])
+
+    # slab of each point; points on or beyond the outer levels are outside
+    point_slab = np.searchsorted(levels, y, side="right") - 1
+    candidates = np.flatnonzero((point_slab >= 0) & (point_slab < n_slabs))
+    if candidates.size == 0:
+        return inside
+    s = point_slab[candidates]
+    x_cross = x0[s] + (y[candidates, None] - y0[s]) * dxdy[s]
+    crossings = np.count_nonzero(x[candidates, None] < x_cross, axis=1)
+    inside.reshape(-1)[candidates] = crossings % 2 == 1
+    return inside
@@ -0,0 +1,132 @@
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.metrics import UPSTREAM_BYTES, UPSTREAM_REQUESTS, count
+
+# ================================================================
+# Shared HTTP client for upstream fetchers (NASA POWER, FIRMS)
+# ================================================================
+#
+# One pooled keep-alive session for the whole process:
+#   * connect/read timeouts so a hung upstream cannot hang a worker
+#   * exponential backoff on 429/5xx (honouring Retry-After)
+#   * a per-host concurrency cap so batch workloads stay under NASA's
+#     rate limits
+#   * an optional per-fetch deadline (fetch_deadline): timeouts shrink to
+#     the time left, so a fetch past its budget stops instead of holding a
+#     worker until the upstream answers
+
+HTTP_CONNECT_TIMEOUT_S = float(os.environ.get("HTTP_CONNECT_TIMEOUT_S", "5"))
+HTTP_READ_TIMEOUT_S = float(os.environ.get("HTTP_READ_TIMEOUT_S", "60"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_S = float(os.environ.get("HTTP_BACKOFF_S", "0.5"))
+HTTP_MAX_PER_HOST = int(os.environ.get("HTTP_MAX_PER_HOST", "4"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_S,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the last response to raise_for_status()
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = _build_session()
+
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_host_limits_lock = threading.Lock()
+
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("http_deadline", default=None)
+
+
+@contextlib.contextmanager
+def fetch_deadline(at: Optional[float]):
+    """Bound every http_get in this context to time.monotonic() deadline `at`."""
+    current = _deadline.get()
+    if at is not None and current is not None:
+        at = min(at, current)
+    token = _deadline.set(at if at is not None else current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _time_left() -> Optional[float]:
+    at = _deadline.get()
+    if at is None:
+        return None
+    left = at - time.monotonic()
+    if left <= 0:
+        raise requests.Timeout("fetch deadline exceeded")
+    return left
+
+
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc
+    with _host_limits_lock:
+        sem = _host_limits.get(host)
+        if sem is None:
+            sem = _host_limits[host] = threading.BoundedSemaphore(HTTP_MAX_PER_HOST)
+        return sem
+
+
+def http_get(url: str, params=None, timeout=None, **kwargs) -> requests.Response:
+    """
+    GET through the shared session, bounded per host. Raises for non-2xx
+    responses after retries are exhausted, and requests.Timeout once the
+    fetch_deadline of the context has passed.
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT_S, HTTP_READ_TIMEOUT_S)
+    host = urlsplit(url).netloc
+    limit = _host_limit(url)
+    left = _time_left()
+    if left is None:
+        limit.acquire()  # no budget: queue for a slot
+    elif not limit.acquire(timeout=left):
+        raise requests.Timeout(f"fetch deadline exceeded waiting for a {host} slot")
+    try:
+        left = _time_left()
+        if left is not None:
+            # the read timeout applies per socket read and per retry, so a
+            # trickling or retried response can overrun by that much
+            connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+            timeout = (min(connect, left), min(read, left))
+        resp = session.get(url, params=params, timeout=timeout, **kwargs)
+    finally:
+        limit.release()
+    UPSTREAM_REQUESTS.inc(host=host, status=resp.status_code)
+    UPSTREAM_BYTES.observe(len(resp.content), host=host)
+    count("http_calls")
+    if resp.status_code >= 400:
+        logging.warning("GET %s -> %s", host, resp.status_code)
+    resp.raise_for_status()
+    return resp
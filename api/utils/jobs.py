@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# ================================================================
+# Asynchronous hazard jobs
+# ================================================================
+#
+# POST /jobs stores the request and hands it to a small worker pool; clients
+# poll GET /jobs/{id} for status, per-source progress and the result. Jobs
+# are persisted in SQLite (JOBS_DB_PATH) so results survive the request that
+# created them and can be read by any worker sharing the file.
+#
+# status   : queued -> running -> done | failed
+# progress : {"power": "pending|running|done|failed", "chirps": ..., "firms": ...}
+
+JOBS_DB_PATH = os.environ.get(
+    "JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "hazard_jobs.db"))
+JOBS_MAX_WORKERS = int(os.environ.get("JOBS_MAX_WORKERS", "2"))
+JOBS_MAX_PENDING = int(os.environ.get("JOBS_MAX_PENDING", "50"))
+JOBS_RETENTION_S = float(os.environ.get("JOBS_RETENTION_S", str(7 * 86400)))
+# A queued/running job with no update for this long belongs to a worker that
+# died (restart, scale-down); it is reported as failed.
+JOBS_STALE_S = float(os.environ.get("JOBS_STALE_S", "3600"))
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when JOBS_MAX_PENDING jobs are already queued or running."""
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL,"
+                " request TEXT NOT NULL, progress TEXT NOT NULL,"
+                " result TEXT, error TEXT)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, request: Dict[str, Any], sources) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        progress = {name: "pending" for name in sources}
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at, request, progress)"
+                " VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, now, now, json.dumps(request), json.dumps(progress)),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._conn() as conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def set_source(self, job_id: str, source: str, state: str):
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            progress = json.loads(row[0])
+            progress[source] = state
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT id, status, created_at, updated_at, progress, result, error"
+            " FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row[0],
+            "status": row[1],
+            "created_at": row[2],
+            "updated_at": row[3],
+            "progress": json.loads(row[4]),
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+        }
+        if job["status"] in ("queued", "running") and time.time() - job["updated_at"] > JOBS_STALE_S:
+            job["status"] = "failed"
+            job["error"] = "job was abandoned by its worker"
+        return job
+
+    def count_active(self) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            " AND updated_at >= ?", (time.time() - JOBS_STALE_S,)
+        ).fetchone()[0]
+
+    def purge(self, older_than_s: float):
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - older_than_s,),
+            )
+
+
+class JobRunner:
+    """
+    Runs jobs on a bounded pool. run_fn(request, progress) must return a
+    JSON-serializable result; progress(source, state) records per-source state.
+    """
+
+    def __init__(self, store: JobStore, run_fn: Callable, sources,
+                 max_workers: int = JOBS_MAX_WORKERS, max_pending: int = JOBS_MAX_PENDING):
+        self.store = store
+        self.run_fn = run_fn
+        self.sources = list(sources)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hazard-job")
+
+    def submit(self, request: Dict[str, Any]) -> str:
+        if self.store.count_active() >= self.max_pending:
+            raise JobQueueFull(f"{self.max_pending} jobs already pending")
+        job_id = self.store.create(request, self.sources)
+        self._executor.submit(self._run, job_id, request)
+        return job_id
+
+    def _run(self, job_id: str, request: Dict[str, Any]):
+        self.store.update(job_id, status="running")
+
+        def progress(source: str, state: str):
+            self.store.set_source(job_id, source, state)
+
+        try:
+            result = self.run_fn(request, progress)
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logging.warning("Job %s failed: %s", job_id, detail)
+            self.store.update(job_id, status="failed", error=str(detail))
+            return
+        self.store.update(job_id, status="done", result=result)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,205 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ================================================================
+# Lightweight metrics: Prometheus text exposition + per-request timings
+# ================================================================
+#
+# Counters and histograms live in a process-wide registry rendered by
+# GET /metrics. Spans additionally record into the current request's timing
+# breakdown (a ContextVar set by the HTTP middleware), which becomes the
+# Server-Timing header. Work handed to thread pools must be submitted via
+# contextvars.copy_context().run so spans find their request.
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+                    for k, v in items)
+    return "{" + body + "}"
+
+
+def _format_value(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # per label set: (bucket counts, sum, count)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, n = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(counts):
+                counts[i] += 1
+            self._values[key] = (counts, total + value, n + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, n) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+class GaugeFunc:
+    """Gauge whose value is read from a callable at scrape time."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(self.fn())}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text) -> Counter:
+        return self.register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, buckets))
+
+    def gauge_func(self, name, help_text, fn) -> GaugeFunc:
+        return self.register(GaugeFunc(name, help_text, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+FETCH_SECONDS = registry.histogram(
+    "hazard_fetch_seconds", "Upstream fetch duration by source")
+FETCH_ERRORS = registry.counter(
+    "hazard_fetch_errors_total", "Failed or timed-out source fetches")
+UPSTREAM_REQUESTS = registry.counter(
+    "hazard_upstream_requests_total", "HTTP requests to upstream APIs")
+UPSTREAM_BYTES = registry.histogram(
+    "hazard_upstream_response_bytes", "Upstream HTTP response payload size", BYTES_BUCKETS)
+EE_ROUND_TRIPS = registry.counter(
+    "hazard_ee_round_trips_total", "Blocking Earth Engine getInfo() calls")
+CACHE_REQUESTS = registry.counter(
+    "hazard_cache_requests_total", "Result cache lookups by source and outcome")
+COALESCED = registry.counter(
+    "hazard_coalesced_total", "Calls that joined an identical in-flight computation")
+REQUEST_SECONDS = registry.histogram(
+    "hazard_http_request_seconds", "API request duration by route")
+WATCHLIST_REFRESHES = registry.counter(
+    "hazard_watchlist_refreshes_total", "Watchlist cache refreshes by source group and outcome")
+
+
+# ---------- per-request breakdown ----------
+
+# {"spans": {name: seconds}, "counts": {name: n}} for the current request
+request_timings: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def new_request_timings() -> dict:
+    timings = {"spans": {}, "counts": {}, "lock": threading.Lock()}
+    request_timings.set(timings)
+    return timings
+
+
+def count(name: str, amount: int = 1):
+    """Add to a per-request counter (shown in Server-Timing)."""
+    timings = request_timings.get()
+    if timings is not None:
+        with timings["lock"]:
+            timings["counts"][name] = timings["counts"].get(name, 0) + amount
+
+
+@contextmanager
+def span(source: str):
+    """Time a block into hazard_fetch_seconds and the request breakdown."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        FETCH_SECONDS.observe(elapsed, source=source)
+        timings = request_timings.get()
+        if timings is not None:
+            with timings["lock"]:
+                timings["spans"][source] = timings["spans"].get(source, 0.0) + elapsed
+
+
+def timed(source: str):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(source):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing_header(timings: dict, total_s: float) -> str:
+    parts = [f"{name};dur={secs * 1000:.1f}" for name, secs in timings["spans"].items()]
+    parts += [f'{name};desc="{n}"' for name, n in timings["counts"].items()]
+    parts.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,211 @@
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import Executor, TimeoutError as FuturesTimeout, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import snap_point
+from utils.fetch_hazard_data import (
+    POWER_PARAMETERS,
+    _run_until,
+    fetch_nasa_power_regional,
+    load_power,
+)
+from utils.timeseries_store import SOURCE_GRIDS, cell_center, grid_cell
+
+# ================================================================
+# NASA POWER for many locations as one [cell, day, parameter] block
+# ================================================================
+#
+# Batch workloads ask POWER for many locations that mostly share a handful
+# of 0.5 x 0.625 deg grid cells. The locations are reduced to distinct
+# cells, and the cell series are held in one float32 array
+# [cell, day, parameter]; per-location DataFrames are zero-copy views of a
+# cell's slice.
+#
+# The block is filled in one of two ways:
+#   regional : POWER's regional endpoint, one call per parameter for all
+#              cells, when there are at least POWER_REGIONAL_MIN_CELLS cells
+#              within the endpoint's 10 x 10 deg limit
+#   per cell : load_power per distinct cell (result cache, per-day store and
+#              coalescing apply), also the fallback for cells the regional
+#              answer left empty or when the regional call fails
+#
+# POWER_REGIONAL=0 disables the regional path.
+
+POWER_REGIONAL = os.environ.get("POWER_REGIONAL", "1") != "0"
+POWER_REGIONAL_MIN_CELLS = int(os.environ.get("POWER_REGIONAL_MIN_CELLS", "8"))
+# Side limits of the regional endpoint (degrees)
+POWER_REGIONAL_MIN_SPAN = 2.0
+POWER_REGIONAL_MAX_SPAN = 10.0
+
+
+def _submit(executor: Executor, deadline: Optional[float], fn: Callable[..., Any], **kwargs):
+    """Run fn on executor in a copy of this context, under fetch_deadline(deadline)."""
+    return executor.submit(contextvars.copy_context().run, _run_until, deadline, fn, kwargs)
+
+
+class PowerBlock:
+    """float32 POWER values [cell, day, parameter] for the cells of a set of points."""
+
+    def __init__(self, points: Sequence[Tuple[float, float]], start: str, end: str,
+                 parameters: Sequence[str] = POWER_PARAMETERS):
+        self.start = start
+        self.end = end
+        self.parameters = list(parameters)
+        self.dates = pd.date_range(start, end, freq="D")
+
+        cell_of: Dict[str, int] = {}
+        self.point_cell: List[int] = []  # point index -> cell index
+        self.cell_points: List[Tuple[float, float]] = []  # first point of each cell
+        for lat, lon in points:
+            # the cell load_power fetches, i.e. that of the cache-snapped point
+            cell = grid_cell("power", *snap_point(lat, lon))
+            if cell not in cell_of:
+                cell_of[cell] = len(self.cell_points)
+                self.cell_points.append((lat, lon))
+            self.point_cell.append(cell_of[cell])
+        self.cell_index = cell_of
+
+        self.values = np.full((len(self.cell_points), len(self.dates), len(self.parameters)),
+                              np.nan, dtype=np.float32)
+        self._filled = np.zeros(len(self.cell_points), dtype=bool)
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.cell_points)
+
+    def frame(self, cell: int) -> pd.DataFrame:
+        """The cell's series as a DataFrame sharing memory with the block."""
+        return pd.DataFrame(self.values[cell], index=self.dates, columns=self.parameters, copy=False)
+
+    def point_frame(self, point: int) -> pd.DataFrame:
+        return self.frame(self.point_cell[point])
+
+    def fill(self, cell: int, df: pd.DataFrame):
+        aligned = df.reindex(self.dates)
+        for k, name in enumerate(self.parameters):
+            if name in aligned:
+                self.values[cell, :, k] = aligned[name].to_numpy(dtype=float)
+        self._filled[cell] = True
+
+    # ---------- regional path ----------
+
+    def regional_bbox(self) -> Optional[Tuple[float, float, float, float]]:
+        """Bbox for one regional call covering every cell, or None if too large."""
+        dlat, dlon = SOURCE_GRIDS["power"]
+        lats = [lat for lat, _ in self.cell_points]
+        lons = [lon for _, lon in self.cell_points]
+        # pad by half a cell so nodes of the edge cells are inside
+        south, north = min(lats) - dlat / 2, max(lats) + dlat / 2
+        west, east = min(lons) - dlon / 2, max(lons) + dlon / 2
+        if north - south > POWER_REGIONAL_MAX_SPAN or east - west > POWER_REGIONAL_MAX_SPAN:
+            return None
+        # grow small boxes around their centre up to the endpoint minimum
+        if north - south < POWER_REGIONAL_MIN_SPAN:
+            mid = (north + south) / 2
+            south, north = mid - POWER_REGIONAL_MIN_SPAN / 2, mid + POWER_REGIONAL_MIN_SPAN / 2
+        if east - west < POWER_REGIONAL_MIN_SPAN:
+            mid = (east + west) / 2
+            west, east = mid - POWER_REGIONAL_MIN_SPAN / 2, mid + POWER_REGIONAL_MIN_SPAN / 2
+        return (round(max(west, -180.0), 4), round(max(south, -90.0), 4),
+                round(min(east, 180.0), 4), round(min(north, 90.0), 4))
+
+    def fill_regional(self, bbox, executor: Executor, timeout: Optional[float] = None):
+        """
+        Fill every cell with a regional node; one call per parameter. Raises
+        concurrent.futures.TimeoutError if the calls take longer than timeout.
+        """
+        first, last = self.start.replace("-", ""), self.end.replace("-", "")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        futures = {_submit(executor, deadline, fetch_nasa_power_regional,
+                           bbox=bbox, start_date=first, end_date=last, parameter=name): k
+                   for k, name in enumerate(self.parameters)}
+        day_pos = {label: i for i, label in enumerate(self.dates.strftime("%Y%m%d"))}
+        covered = np.zeros(self.n_cells, dtype=bool)
+        for fut in as_completed(futures, timeout=timeout):
+            k = futures[fut]
+            nodes, labels, values = fut.result()
+            cols = np.array([day_pos.get(label, -1) for label in labels], dtype=int)
+            keep = cols >= 0
+            node_of = self.nearest_nodes(nodes)
+            hit = node_of >= 0
+            cells = np.flatnonzero(hit)
+            self.values[cells[:, None], cols[keep][None, :], k] = values[node_of[hit]][:, keep]
+            covered |= hit
+        self._filled |= covered
+
+    def nearest_nodes(self, nodes: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """
+        Index into `nodes` of each cell's own node, i.e. the node nearest to
+        the point load_power would fetch; -1 where the answer has no node
+        within half a grid step (the cell then falls back to load_power).
+        """
+        dlat, dlon = SOURCE_GRIDS["power"]
+        if not len(nodes):
+            return np.full(self.n_cells, -1, dtype=int)
+        node_lat = np.array([lat for lat, _ in nodes])
+        node_lon = np.array([lon for _, lon in nodes])
+        centers = np.array([cell_center("power", *snap_point(lat, lon))
+                            for lat, lon in self.cell_points])
+        # distances in grid steps
+        d_lat = np.abs(centers[:, 0, None] - node_lat[None, :]) / dlat
+        d_lon = np.abs(centers[:, 1, None] - node_lon[None, :]) / dlon
+        d_lon = np.minimum(d_lon, 360 / dlon - d_lon)
+        dist = np.maximum(d_lat, d_lon)
+        nearest = dist.argmin(axis=1)
+        return np.where(dist[np.arange(self.n_cells), nearest] < 0.5, nearest, -1)
+
+    # ---------- filling ----------
+
+    def iter_fill(self, executor: Executor, timeout: Optional[float] = None
+                  ) -> Iterator[Tuple[int, Optional[str]]]:
+        """
+        Fill the block, yielding (cell, error) as each cell is ready; error
+        is None on success. Cells come from the regional endpoint when it
+        applies and from load_power otherwise. timeout bounds the whole fill,
+        HTTP calls included (fetch_deadline); cells still missing then are
+        yielded with a timeout error.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+        if POWER_REGIONAL and self.n_cells >= POWER_REGIONAL_MIN_CELLS:
+            bbox = self.regional_bbox()
+            if bbox is not None:
+                try:
+                    self.fill_regional(bbox, executor, timeout=remaining())
+                except Exception as e:
+                    logging.warning("POWER regional fetch failed, fetching per cell: %s", e)
+                    self.values[:] = np.nan
+                    self._filled[:] = False
+                logging.info("POWER regional: %d of %d cells filled in %d calls",
+                             int(self._filled.sum()), self.n_cells, len(self.parameters))
+                for cell in np.flatnonzero(self._filled):
+                    yield int(cell), None
+
+        futures = {_submit(executor, deadline, load_power,
+                           lat=lat, lon=lon, start=self.start, end=self.end): cell
+                   for cell, (lat, lon) in enumerate(self.cell_points) if not self._filled[cell]}
+        done = set()
+        try:
+            for fut in as_completed(futures, timeout=remaining()):
+                done.add(fut)
+                cell = futures[fut]
+                try:
+                    self.fill(cell, fut.result())
+                except Exception as e:
+                    yield cell, str(e) or type(e).__name__
+                else:
+                    yield cell, None
+        except FuturesTimeout:
+            logging.warning("POWER block timed out after %gs", timeout)
+            for fut, cell in futures.items():
+                if fut not in done:
+                    yield cell, f"timed out after {timeout:g}s"
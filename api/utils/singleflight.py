@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+from utils.metrics import COALESCED, count
+
+# ================================================================
+# Single-flight: coalesce identical in-flight computations
+# ================================================================
+#
+# The first caller for a key runs the computation; callers arriving while it
+# is in flight wait for and share its result (or exception). Nothing is kept
+# once it finishes; caching is the result cache's job. Keys are the same
+# "<source>|..." strings used by the result cache, so the metric label is the
+# key prefix. Coalescing is per process.
+
+
+def _label(key: str) -> str:
+    return key.split("|", 1)[0]
+
+
+class SingleFlight:
+    """Thread flavour, used by the blocking source loaders."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._calls[key] = Future()
+
+        if not leader:
+            COALESCED.inc(source=_label(key))
+            count("coalesced")
+            return fut.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """asyncio flavour, used to coalesce whole API requests."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, make: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            COALESCED.inc(source=_label(key))
+            count("coalesced")
+        # shielded: one caller disconnecting must not cancel the shared work
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter went away
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,391 @@
+import datetime
+import hashlib
+import logging
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import HISTORICAL_CACHE_TTL_S, LRUCache, source_ttl
+from utils.fetch_hazard_data import CHIRPS_COLLECTION, FIRMS_SOURCES, ee, ensure_ee, load_firms
+from utils.http_client import http_get
+from utils.metrics import EE_ROUND_TRIPS, count
+from utils.singleflight import SingleFlight
+
+# ================================================================
+# Map tiles for hazard layers
+# ================================================================
+#
+# /tiles/{layer}/{z}/{x}/{y} serves web-mercator (XYZ) tiles for the map:
+#
+#   fires  : FIRMS hotspots as Mapbox Vector Tiles (one "fires" point layer),
+#            built from load_firms for the tile bbox, so the hotspot index and
+#            result cache apply
+#   chirps : CHIRPS precipitation accumulated over [start, end) as PNG. Earth
+#            Engine renders it: one getMapId per window and colour scale, then
+#            one plain HTTP tile fetch per tile
+#
+# Rendered tiles are kept on disk under TILE_CACHE_DIR/<layer>/<variant>/z/x/y
+# until the source TTL (utils/cache.py) runs out; the API adds an ETag and
+# Cache-Control so browsers and a CDN revalidate instead of refetching.
+#
+# Every variant costs disk space and, for CHIRPS, a getMapId call, so the
+# variants a client can ask for are bounded: CHIRPS windows must be one of
+# CHIRPS_TILE_WINDOWS days, max_mm is rounded up to a 1-2-5 step and fires
+# take a known FIRMS source. A sweep every TILE_CACHE_SWEEP_S removes
+# expired tiles and then the oldest ones beyond TILE_CACHE_MAX_MB.
+
+TILE_CACHE_DIR = os.environ.get(
+    "TILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "hazard_tiles"))
+TILE_MAX_ZOOM = int(os.environ.get("TILE_MAX_ZOOM", "18"))
+# Below this zoom a fires tile would need a continent-sized FIRMS query;
+# empty tiles are served instead
+FIRES_TILE_MIN_ZOOM = int(os.environ.get("FIRES_TILE_MIN_ZOOM", "5"))
+# Earth Engine map ids stay valid for hours; reuse them well within that
+CHIRPS_MAPID_TTL_S = float(os.environ.get("CHIRPS_MAPID_TTL_S", "3600"))
+# Accumulation windows (days) served as CHIRPS tiles
+CHIRPS_TILE_WINDOWS = [int(v) for v in os.environ.get("CHIRPS_TILE_WINDOWS", "1,7,30,90,365").split(",")]
+TILE_CACHE_MAX_MB = float(os.environ.get("TILE_CACHE_MAX_MB", "1024"))
+TILE_CACHE_SWEEP_S = float(os.environ.get("TILE_CACHE_SWEEP_S", "600"))
+
+MVT_EXTENT = 4096
+# Points this far (tile units) outside the tile are kept so symbols drawn
+# across a tile edge are not cut off
+MVT_BUFFER = 64
+
+FIRE_TILE_PROPERTIES = ["acq_date", "acq_time", "confidence", "frp", "bright_ti4", "daynight"]
+CHIRPS_PALETTE = ["ffffcc", "a1dab4", "41b6c4", "2c7fb8", "253494"]
+
+TILE_LAYERS: Dict[str, Dict[str, str]] = {
+    "fires": {"media_type": "application/vnd.mapbox-vector-tile", "ext": "mvt"},
+    "chirps": {"media_type": "image/png", "ext": "png"},
+}
+
+
+# ---------- tile math ----------
+
+def tile_bbox(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) in degrees of XYZ tile z/x/y."""
+    n = 2 ** z
+
+    def lat(row: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tile_pixels(lon: np.ndarray, lat: np.ndarray, z: int, x: int, y: int,
+                extent: int = MVT_EXTENT) -> Tuple[np.ndarray, np.ndarray]:
+    """Tile-local coordinates (0..extent, y down) of lon/lat arrays."""
+    n = 2 ** z
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    fx = (lon + 180.0) / 360.0 * n
+    fy = (1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n
+    return np.round((fx - x) * extent).astype(int), np.round((fy - y) * extent).astype(int)
+
+
+def check_tile(z: int, x: int, y: int):
+    if not 0 <= z <= TILE_MAX_ZOOM:
+        raise ValueError(f"zoom must be within 0..{TILE_MAX_ZOOM}")
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError(f"tile {z}/{x}/{y} does not exist")
+
+
+# ---------- Mapbox Vector Tile encoding ----------
+# The few protobuf messages a point layer needs, written by hand so the
+# endpoint needs no extra dependency (spec: github.com/mapbox/vector-tile-spec).
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number: int, wire_type: int) -> bytes:
+    return _varint((number << 3) | wire_type)
+
+
+def _bytes_field(number: int, payload: bytes) -> bytes:
+    return _field(number, 2) + _varint(len(payload)) + payload
+
+
+def _packed(number: int, values: List[int]) -> bytes:
+    return _bytes_field(number, b"".join(_varint(v) for v in values))
+
+
+def _mvt_value(value: Any) -> bytes:
+    if isinstance(value, (bool, np.bool_)):
+        return _field(7, 0) + _varint(int(value))
+    if isinstance(value, (int, np.integer)):
+        return _field(6, 0) + _varint(_zigzag(int(value)))  # sint_value
+    if isinstance(value, (float, np.floating)):
+        return _field(3, 1) + struct.pack("<d", float(value))  # double_value
+    return _bytes_field(1, str(value).encode("utf-8"))  # string_value
+
+
+def encode_point_layer(name: str, px: np.ndarray, py: np.ndarray,
+                       properties: List[Dict[str, Any]], extent: int = MVT_EXTENT) -> bytes:
+    """One-layer MVT with a Point feature per (px, py) in tile coordinates."""
+    keys: Dict[str, int] = {}
+    values: Dict[Tuple[type, Any], int] = {}
+    features = []
+    for fid, (x, y, props) in enumerate(zip(px.tolist(), py.tolist(), properties), start=1):
+        tags: List[int] = []
+        for key, value in props.items():
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        geometry = [(1 << 3) | 1, _zigzag(x), _zigzag(y)]  # MoveTo(1)
+        features.append(_bytes_field(2, (
+            _field(1, 0) + _varint(fid)
+            + (_packed(2, tags) if tags else b"")
+            + _field(3, 0) + _varint(1)  # POINT
+            + _packed(4, geometry)
+        )))
+
+    layer = (
+        _field(15, 0) + _varint(2)
+        + _bytes_field(1, name.encode("utf-8"))
+        + b"".join(features)
+        + b"".join(_bytes_field(3, k.encode("utf-8")) for k in keys)
+        + b"".join(_bytes_field(4, _mvt_value(v)) for _, v in values)
+        + _field(5, 0) + _varint(extent)
+    )
+    return _bytes_field(3, layer)
+
+
+# ---------- on-disk tile cache ----------
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def quantize_max_mm(max_mm: float) -> float:
+    """Round up to the next 1-2-5 step (..., 10, 20, 50, 100, ...), at least 1."""
+    if max_mm <= 1:
+        return 1.0
+    decade = 10 ** math.floor(math.log10(max_mm))
+    for step in (1, 2, 5, 10):
+        if step * decade >= max_mm * (1 - 1e-9):
+            return float(step * decade)
+    return float(10 * decade)
+
+
+class TileCache:
+    def __init__(self, root: str, max_bytes: float = TILE_CACHE_MAX_MB * 1e6,
+                 max_age_s: float = HISTORICAL_CACHE_TTL_S, sweep_every_s: float = TILE_CACHE_SWEEP_S):
+        self.root = root
+        self.max_bytes = max_bytes
+        # no tile outlives the longest source TTL
+        self.max_age_s = max_age_s
+        self.sweep_every_s = sweep_every_s
+        self._last_sweep = 0.0
+        self._sweeping = threading.Lock()
+
+    def _path(self, layer: str, variant: str, z: int, x: int, y: int) -> str:
+        return os.path.join(self.root, layer, variant, str(z), str(x),
+                            f"{y}.{TILE_LAYERS[layer]['ext']}")
+
+    def get(self, layer: str, variant: str, z: int, x: int, y: int, ttl: float) -> Optional[bytes]:
+        path = self._path(layer, variant, z, x, y)
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return None
+            with open(path, "rb") as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def put(self, layer: str, variant: str, z: int, x: int, y: int, body: bytes):
+        path = self._path(layer, variant, z, x, y)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(body)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning("Tile cache write failed for %s: %s", path, e)
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep < self.sweep_every_s:
+            return
+        if not self._sweeping.acquire(blocking=False):
+            return
+        self._last_sweep = time.monotonic()
+        threading.Thread(target=self._sweep_and_release, name="tile-sweep", daemon=True).start()
+
+    def _sweep_and_release(self):
+        try:
+            self.sweep()
+        except Exception as e:
+            logging.warning("Tile cache sweep failed: %s", e)
+        finally:
+            self._sweeping.release()
+
+    def sweep(self) -> int:
+        """
+        Delete tiles older than max_age_s, then the least recently written
+        ones until the cache is under max_bytes. Returns the files removed.
+        """
+        now = time.time()
+        tiles = []  # (mtime, size, path)
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.max_age_s:
+                    removed += _unlink(path)
+                else:
+                    tiles.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in tiles)
+        if total > self.max_bytes:
+            # down to 90% so the next writes do not trigger another purge
+            for _, size, path in sorted(tiles):
+                if total <= 0.9 * self.max_bytes:
+                    break
+                removed += _unlink(path)
+                total -= size
+
+        for dirpath, dirnames, filenames in os.walk(self.root, topdown=False):
+            if dirpath != self.root and not dirnames and not filenames:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+        if removed:
+            logging.info("Tile cache sweep: %d files removed, %.1f MB kept", removed, total / 1e6)
+        return removed
+
+
+def _unlink(path: str) -> int:
+    try:
+        os.remove(path)
+        return 1
+    except OSError:
+        return 0
+
+
+tile_cache = TileCache(TILE_CACHE_DIR)
+_inflight = SingleFlight()
+_map_ids = LRUCache(max_entries=64)
+
+
+# ---------- renderers ----------
+
+def render_fires_tile(z: int, x: int, y: int, days: int, source: str) -> bytes:
+    if z < FIRES_TILE_MIN_ZOOM:
+        return b""
+    west, south, east, north = tile_bbox(z, x, y)
+    pad_x = (east - west) * MVT_BUFFER / MVT_EXTENT
+    pad_y = (north - south) * MVT_BUFFER / MVT_EXTENT
+    df = load_firms((west - pad_x, max(south - pad_y, -85.0511), east + pad_x,
+                     min(north + pad_y, 85.0511)), firms_days=days, source=source)
+    if df.empty:
+        return b""
+
+    px, py = tile_pixels(df["longitude"].to_numpy(dtype=float),
+                         df["latitude"].to_numpy(dtype=float), z, x, y)
+    columns = [c for c in FIRE_TILE_PROPERTIES if c in df.columns]
+    properties = df[columns].astype(object).where(pd.notna(df[columns]), None).to_dict("records")
+    return encode_point_layer("fires", px, py, properties)
+
+
+def _chirps_map_id(start: str, end: str, max_mm: float) -> Dict[str, Any]:
+    key = f"chirps_mapid|{start}|{end}|{max_mm}"
+    map_id = _map_ids.get(key)
+    if map_id is not None:
+        return map_id
+
+    def create():
+        ensure_ee()
+        image = (
+            ee.ImageCollection(CHIRPS_COLLECTION)
+            .filterDate(start, end)
+            .select("precipitation")
+            .sum()
+        )
+        EE_ROUND_TRIPS.inc(source="chirps_tiles")
+        count("ee_calls")
+        created = image.getMapId({"min": 0, "max": max_mm, "palette": CHIRPS_PALETTE})
+        _map_ids.set(key, created, CHIRPS_MAPID_TTL_S)
+        return created
+
+    return _inflight.do(key, create)
+
+
+def render_chirps_tile(z: int, x: int, y: int, start: str, end: str, max_mm: float) -> bytes:
+    map_id = _chirps_map_id(start, end, max_mm)
+    return http_get(map_id["tile_fetcher"].format_tile_url(x, y, z)).content
+
+
+def default_chirps_window(today: Optional[datetime.date] = None) -> Tuple[str, str]:
+    """Last 30 days, [start, end) as accepted by filterDate."""
+    end = today or datetime.datetime.now(datetime.timezone.utc).date()
+    return (end - datetime.timedelta(days=30)).isoformat(), end.isoformat()
+
+
+def get_tile(layer: str, z: int, x: int, y: int, **options) -> Tuple[bytes, float]:
+    """
+    (body, ttl) of one tile, from the disk cache or freshly rendered.
+
+    fires  options: days, source
+    chirps options: start, end ('YYYY-MM-DD', end exclusive, end - start in
+                    CHIRPS_TILE_WINDOWS days), max_mm (rounded up to a 1-2-5 step)
+    Raises ValueError for unknown layers or out-of-range tiles.
+    """
+    if layer not in TILE_LAYERS:
+        raise ValueError(f"unknown layer '{layer}', expected one of {sorted(TILE_LAYERS)}")
+    check_tile(z, x, y)
+
+    if layer == "fires":
+        if options["source"] not in FIRMS_SOURCES:
+            raise ValueError(f"unknown FIRMS source '{options['source']}', expected one of {FIRMS_SOURCES}")
+        variant = f"{options['source']}-{options['days']}d"
+        ttl = source_ttl("firms")
+        render = lambda: render_fires_tile(z, x, y, options["days"], options["source"])  # noqa: E731
+    else:
+        days = (datetime.date.fromisoformat(options["end"])
+                - datetime.date.fromisoformat(options["start"])).days
+        if days not in CHIRPS_TILE_WINDOWS:
+            raise ValueError(f"CHIRPS tile windows must be one of {CHIRPS_TILE_WINDOWS} days, got {days}")
+        options["max_mm"] = quantize_max_mm(options["max_mm"])
+        variant = f"{options['start']}_{options['end']}_{options['max_mm']:g}"
+        last = (datetime.date.fromisoformat(options["end"]) - datetime.timedelta(days=1)).isoformat()
+        ttl = source_ttl("chirps", last)
+        render = lambda: render_chirps_tile(  # noqa: E731
+            z, x, y, options["start"], options["end"], options["max_mm"])
+
+    body = tile_cache.get(layer, variant, z, x, y, ttl)
+    count(f"tile_cache_{'miss' if body is None else 'hit'}")
+    if body is None:
+        def render_and_store():
+            rendered = render()
+            tile_cache.put(layer, variant, z, x, y, rendered)
+            return rendered
+
+        body = _inflight.do(f"tiles|{layer}|{variant}|{z}/{x}/{y}", render_and_store)
+    return body, ttl
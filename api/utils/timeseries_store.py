@@ -0,0 +1,180 @@
+import datetime
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.cache import SETTLE_DAYS
+
+# ================================================================
+# Incremental per-day store for POWER / CHIRPS
+# ================================================================
+#
+# Settled daily values (older than SETTLE_DAYS for the source) never change,
+# so they are kept in a local SQLite file keyed by (source, grid cell, date).
+# A request only goes upstream for the days that are missing; extending a
+# range by one day costs one day of fetching. Days inside the settle window
+# are always fetched fresh and never stored.
+#
+# Enable with TIMESERIES_STORE_PATH=/path/to/timeseries.db
+
+# Native grid of each source, (lat step, lon step) in degrees
+SOURCE_GRIDS: Dict[str, Tuple[float, float]] = {
+    "power": (0.5, 0.625),
+    "chirps": (0.05, 0.05),
+}
+# Sources whose values belong to grid nodes: POWER (MERRA-2) nodes sit on
+# the multiples of the steps and a cell spans half a step around its node.
+# CHIRPS pixel edges sit on the 0.05 deg lines instead.
+NODE_CENTERED = {"power"}
+
+# Missing runs separated by fewer stored days than this are fetched as one
+# range, trading a few redundant days for fewer upstream calls.
+GAP_MERGE_DAYS = int(os.environ.get("STORE_GAP_MERGE_DAYS", "30"))
+
+
+def cell_indices(source: str, lat: float, lon: float) -> Tuple[int, int]:
+    """(row, column) of the source cell containing (lat, lon)."""
+    dlat, dlon = SOURCE_GRIDS[source]
+    if source in NODE_CENTERED:
+        # nearest node; node 180E is node 180W
+        i = math.floor((lat + 90) / dlat + 0.5)
+        j = math.floor((lon + 180) / dlon + 0.5) % int(round(360 / dlon))
+        return i, j
+    return math.floor((lat + 90) / dlat), math.floor((lon + 180) / dlon)
+
+
+def grid_cell(source: str, lat: float, lon: float) -> str:
+    i, j = cell_indices(source, lat, lon)
+    return f"{i}_{j}"
+
+
+def cell_center(source: str, lat: float, lon: float) -> Tuple[float, float]:
+    """Center of the source cell containing (lat, lon); the node itself for POWER."""
+    dlat, dlon = SOURCE_GRIDS[source]
+    i, j = cell_indices(source, lat, lon)
+    offset = 0.0 if source in NODE_CENTERED else 0.5
+    return round(-90 + (i + offset) * dlat, 6), round(-180 + (j + offset) * dlon, 6)
+
+
+def _day_range(first: datetime.date, last: datetime.date) -> List[datetime.date]:
+    return [first + datetime.timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def missing_runs(
+    days: List[datetime.date], have: set, merge_days: int = GAP_MERGE_DAYS
+) -> List[Tuple[datetime.date, datetime.date]]:
+    """
+    Group the days not in `have` into (first, last) inclusive runs, merging
+    runs separated by fewer than merge_days stored days.
+    """
+    runs: List[Tuple[datetime.date, datetime.date]] = []
+    for d in days:
+        if d.isoformat() in have:
+            continue
+        if runs and (d - runs[-1][1]).days <= merge_days:
+            runs[-1] = (runs[-1][0], d)
+        else:
+            runs.append((d, d))
+    return runs
+
+
+class DailyStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily ("
+                " source TEXT NOT NULL, cell TEXT NOT NULL, date TEXT NOT NULL,"
+                " payload TEXT,"  # JSON object of column -> value; NULL = no data upstream
+                " PRIMARY KEY (source, cell, date))"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def read(self, source: str, cell: str, first: str, last: str) -> Dict[str, Optional[dict]]:
+        rows = self._conn().execute(
+            "SELECT date, payload FROM daily"
+            " WHERE source = ? AND cell = ? AND date BETWEEN ? AND ?",
+            (source, cell, first, last),
+        ).fetchall()
+        return {d: (json.loads(p) if p is not None else None) for d, p in rows}
+
+    def write(self, source: str, cell: str, rows: Dict[str, Optional[dict]]):
+        if not rows:
+            return
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily (source, cell, date, payload) VALUES (?, ?, ?, ?)",
+                [(source, cell, d, json.dumps(p) if p is not None else None)
+                 for d, p in rows.items()],
+            )
+
+    def fetch_range(
+        self,
+        source: str,
+        cell: str,
+        first: str,
+        last: str,
+        fetch_fn: Callable[[str, str], pd.DataFrame],
+        index_name: Optional[str] = None,
+        empty_columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Return the daily frame for [first, last] (inclusive, 'YYYY-MM-DD'),
+        calling fetch_fn(run_first, run_last) only for the missing runs.
+        """
+        first_d = datetime.date.fromisoformat(first)
+        last_d = datetime.date.fromisoformat(last)
+        if last_d < first_d:
+            return pd.DataFrame(columns=empty_columns or [])
+
+        settled_until = datetime.date.today() - datetime.timedelta(
+            days=SETTLE_DAYS.get(source, 7))
+        days = _day_range(first_d, last_d)
+        stored = self.read(source, cell, first, last)
+
+        runs = missing_runs(days, set(stored))
+        fetched: Dict[str, Optional[dict]] = {}
+        for run_first, run_last in runs:
+            df = fetch_fn(run_first.isoformat(), run_last.isoformat())
+            for idx, values in zip(df.index, df.to_dict(orient="records")):
+                fetched[pd.Timestamp(idx).date().isoformat()] = values
+            # remember settled days that upstream had no value for as well,
+            # so they are not re-requested every time
+            to_store = {}
+            for d in _day_range(run_first, min(run_last, settled_until)):
+                key = d.isoformat()
+                if key not in stored:
+                    to_store[key] = fetched.get(key)
+            self.write(source, cell, to_store)
+
+        if runs:
+            logging.info(
+                "%s store %s: %d/%d days cached, fetched %d run(s)",
+                source, cell, sum(d.isoformat() in stored for d in days), len(days), len(runs))
+
+        merged = {**stored, **fetched}
+        records = [(d, merged[d.isoformat()]) for d in days
+                   if merged.get(d.isoformat()) is not None]
+        if not records:
+            return pd.DataFrame(columns=empty_columns or [])
+
+        index = pd.DatetimeIndex([pd.Timestamp(d) for d, _ in records], name=index_name)
+        return pd.DataFrame([v for _, v in records], index=index)
+
+
+_store_path = os.environ.get("TIMESERIES_STORE_PATH")
+daily_store: Optional[DailyStore] = DailyStore(_store_path) if _store_path else None
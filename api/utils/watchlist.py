@@ -0,0 +1,278 @@
+import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.compute_pool import compute_pool
+from utils.fetch_hazard_data import warm_hazard_sources, warming
+from utils.metrics import WATCHLIST_REFRESHES
+
+# ================================================================
+# Watchlist: keep the cache warm for AOIs users look at every day
+# ================================================================
+#
+# Watched AOIs (with their trailing windows and request options) are
+# re-fetched in the background before their cache entries expire, so
+# /hazards/compute, /hazards and /hazards/raw for a watched AOI and window
+# are cache hits. A window of n days is the request start = end - n days,
+# end = today (UTC) - end_lag_days (window_start, as for trailing windows and
+# the feature grid).
+#
+# Each source group has its own cadence:
+#   firms  : every WATCHLIST_FIRMS_INTERVAL_S (default 300 s)
+#   series : POWER + CHIRPS, every WATCHLIST_SERIES_INTERVAL_S (default one
+#            day) and as soon as the windows roll over to a new end date
+# Warmed entries are kept for two intervals, so one missed refresh still
+# leaves them cached.
+#
+# Upstream load stays bounded. Each source is fetched once per entry, for
+# the longest window; shorter windows are cached as slices of it, and a
+# cache key shared by several entries is fetched once per pass. Entries are
+# warmed one at a time, WATCHLIST_PAUSE_S apart, on top of the per-host HTTP
+# cap. The warmer waits while the compute pool is saturated, and a failed
+# refresh is retried after WATCHLIST_RETRY_S.
+#
+# Entries are kept in WATCHLIST_PATH (a JSON list) and managed through
+# GET / PUT / DELETE /watchlist. WATCHLIST_ENABLED=0 turns the warmer off.
+
+WATCHLIST_ENABLED = os.environ.get("WATCHLIST_ENABLED", "1") != "0"
+WATCHLIST_PATH = os.environ.get(
+    "WATCHLIST_PATH", os.path.join(tempfile.gettempdir(), "hazard_watchlist.json"))
+WATCHLIST_MAX_ENTRIES = int(os.environ.get("WATCHLIST_MAX_ENTRIES", "200"))
+WATCHLIST_FIRMS_INTERVAL_S = float(os.environ.get("WATCHLIST_FIRMS_INTERVAL_S", "300"))
+WATCHLIST_SERIES_INTERVAL_S = float(os.environ.get("WATCHLIST_SERIES_INTERVAL_S", "86400"))
+WATCHLIST_RETRY_S = float(os.environ.get("WATCHLIST_RETRY_S", "300"))
+WATCHLIST_PAUSE_S = float(os.environ.get("WATCHLIST_PAUSE_S", "1"))
+WATCHLIST_TICK_S = float(os.environ.get("WATCHLIST_TICK_S", "30"))
+# Per-source budget of a refresh; warming is not latency-bound
+WATCHLIST_FETCH_TIMEOUT_S = float(os.environ.get("WATCHLIST_FETCH_TIMEOUT_S", "600"))
+
+SOURCE_GROUPS: Dict[str, List[str]] = {"firms": ["firms"], "series": ["power", "chirps"]}
+GROUP_INTERVALS: Dict[str, float] = {
+    "firms": WATCHLIST_FIRMS_INTERVAL_S,
+    "series": WATCHLIST_SERIES_INTERVAL_S,
+}
+# Cache TTL of warmed entries, by cache key prefix
+WARM_TTLS: Dict[str, float] = {
+    "firms": 2 * WATCHLIST_FIRMS_INTERVAL_S,
+    "power": 2 * WATCHLIST_SERIES_INTERVAL_S,
+    "chirps": 2 * WATCHLIST_SERIES_INTERVAL_S,
+    "chirps_area": 2 * WATCHLIST_SERIES_INTERVAL_S,
+}
+
+
+class WatchlistFull(RuntimeError):
+    """Raised when adding an entry beyond WATCHLIST_MAX_ENTRIES."""
+
+
+class Watchlist:
+    """Watched AOI entries by id, persisted as a JSON list."""
+
+    def __init__(self, path: Optional[str], max_entries: int = WATCHLIST_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as fh:
+                entries = json.load(fh)
+        except (OSError, ValueError) as e:
+            logging.warning("Could not read watchlist %s: %s", self.path, e)
+            return
+        with self._lock:
+            self._entries = {str(e["id"]): e for e in entries if isinstance(e, dict) and "id" in e}
+        logging.info("Watchlist: %d entries loaded from %s", len(self._entries), self.path)
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump(list(self._entries.values()), fh, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning("Could not write watchlist %s: %s", self.path, e)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(entry_id)
+
+    def put(self, entry: Dict[str, Any]):
+        with self._lock:
+            if entry["id"] not in self._entries and len(self._entries) >= self.max_entries:
+                raise WatchlistFull(f"watchlist is limited to {self.max_entries} entries")
+            self._entries[entry["id"]] = entry
+            self._save()
+
+    def remove(self, entry_id: str) -> bool:
+        with self._lock:
+            if self._entries.pop(entry_id, None) is None:
+                return False
+            self._save()
+            return True
+
+
+class CacheWarmer:
+    """
+    Background thread refreshing the watchlist's cache entries.
+    resolve(entry) returns the warm_hazard_sources arguments of an entry
+    (lat, lon, bbox, polygon, windows, request options) plus end_lag_days;
+    it raises for invalid entries.
+    """
+
+    def __init__(self, watchlist: Watchlist, resolve: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self.watchlist = watchlist
+        self.resolve = resolve
+        # entry id -> group -> {"refreshed_at", "end", "retry_at", "error"}
+        self._state: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._invalid: Dict[str, Dict[str, Any]] = {}
+        # guards _state/_invalid against a PUT replacing an entry mid-refresh
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _due(self, entry_id: str, group: str, end: str, now: float) -> bool:
+        state = self._state.get(entry_id, {}).get(group)
+        if state is None:
+            return True
+        if state["error"] is not None:
+            return now >= state["retry_at"]
+        if group == "series" and state["end"] != end:
+            return True
+        return now - state["refreshed_at"] >= GROUP_INTERVALS[group]
+
+    def warm_entry(self, entry: Dict[str, Any],
+                   groups: Optional[List[str]] = None) -> Optional[Dict[str, str]]:
+        """
+        Refresh the due (or given) source groups of one entry. Returns the
+        errors by source, or None if nothing was due.
+        """
+        entry_id = entry["id"]
+        if groups is None and self._invalid.get(entry_id) is entry:
+            return None
+        try:
+            target = dict(self.resolve(entry))
+        except Exception as e:
+            # not retried until the entry is replaced
+            logging.warning("Watchlist entry %s is invalid: %s", entry_id, e)
+            with self._lock:
+                if self._current(entry):
+                    self._invalid[entry_id] = entry
+                    self._state[entry_id] = {
+                        group: {"refreshed_at": None, "end": None, "error": str(e), "retry_at": None}
+                        for group in SOURCE_GROUPS}
+            return {"entry": str(e)}
+
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        end = (today - datetime.timedelta(days=target.pop("end_lag_days"))).isoformat()
+        now = time.time()
+        if groups is None:
+            groups = [g for g in SOURCE_GROUPS if self._due(entry_id, g, end, now)]
+        if not groups:
+            return None
+
+        sources = [name for group in groups for name in SOURCE_GROUPS[group]]
+        t0 = time.monotonic()
+        try:
+            errors = warm_hazard_sources(end=end, sources=sources, ttls=WARM_TTLS,
+                                         timeout_s=WATCHLIST_FETCH_TIMEOUT_S, **target)
+        except Exception as e:
+            errors = {name: str(e) for name in sources}
+
+        with self._lock:
+            # a replaced or removed entry keeps no state from this refresh, so
+            # its replacement is warmed on the next pass
+            states = self._state.setdefault(entry_id, {}) if self._current(entry) else {}
+            for group in groups:
+                failed = [f"{name}: {errors[name]}" for name in SOURCE_GROUPS[group] if name in errors]
+                previous = states.get(group, {})
+                states[group] = {
+                    "refreshed_at": previous.get("refreshed_at") if failed else now,
+                    "end": previous.get("end") if failed else end,
+                    "error": "; ".join(failed) or None,
+                    "retry_at": now + WATCHLIST_RETRY_S,
+                }
+                WATCHLIST_REFRESHES.inc(group=group, result="error" if failed else "ok")
+        logging.info("Watchlist %s: refreshed %s in %.2fs%s", entry_id, "/".join(groups),
+                     time.monotonic() - t0, f" ({errors})" if errors else "")
+        return errors
+
+    def _current(self, entry: Dict[str, Any]) -> bool:
+        return self.watchlist.get(entry["id"]) is entry
+
+    def run_pass(self) -> int:
+        """Warm every entry with a due source group; returns how many were warmed."""
+        warmed = 0
+        # one warming block per pass: a key shared by entries is fetched once
+        with warming(WARM_TTLS):
+            for entry in self.watchlist.entries():
+                while compute_pool.saturated and not self._stop.is_set():
+                    self._stop.wait(WATCHLIST_PAUSE_S)  # user traffic first
+                if self._stop.is_set():
+                    break
+                if self.warm_entry(entry) is not None:
+                    warmed += 1
+                    self._stop.wait(WATCHLIST_PAUSE_S)
+        return warmed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pass()
+            except Exception as e:
+                logging.warning("Watchlist pass failed: %s", e)
+            self._wake.wait(WATCHLIST_TICK_S)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="watchlist-warmer", daemon=True)
+            self._thread.start()
+
+    def nudge(self):
+        """Run the next pass now, e.g. after an entry was added."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def forget(self, entry_id: str):
+        """Drop an entry's refresh state, so a replaced entry is warmed afresh."""
+        with self._lock:
+            self._state.pop(entry_id, None)
+            self._invalid.pop(entry_id, None)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Entries with the time (UTC ISO) and error of each group's last refresh."""
+        out = []
+        for entry in self.watchlist.entries():
+            groups = {}
+            with self._lock:
+                states = list(self._state.get(entry["id"], {}).items())
+            for group, state in states:
+                at = state["refreshed_at"]
+                groups[group] = {
+                    "refreshed_at": datetime.datetime.fromtimestamp(
+                        at, datetime.timezone.utc).isoformat(timespec="seconds") if at else None,
+                    "end": state["end"],
+                    "error": state["error"],
+                }
+            out.append({**entry, "refresh": groups})
+        return out